@@ -0,0 +1,307 @@
+#!/usr/bin/env python3
+"""
+Benchmark do fluxo de apostas - carga mista com latência por rota
+Sobe a API no próprio processo contra SQLite (arquivo temporário) ou um
+Postgres local e roda clientes concorrentes misturando cadastro/login,
+depósito, criar/aceitar/finalizar aposta, ranking e histórico de transações.
+Ao final confere que nenhum dinheiro sumiu ou apareceu no ledger e roda a
+verificação de concorrência de wallet_concurrency.py
+
+Uso: python benchmarks/betting_flow.py [--db auto|sqlite|postgres] [--clients 8] [--duration 20]
+       [--output resultado.json] [--compare base.json] [--threshold 20]
+Postgres: BENCH_POSTGRES_URL (padrão postgresql://postgres@localhost:5432/sinuca_bench)
+Com --compare, sai com código 1 se p95 ou vazão de alguma rota piorar além de --threshold %
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime
+from decimal import Decimal
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+POSTGRES_URL = os.environ.get('BENCH_POSTGRES_URL', 'postgresql://postgres@localhost:5432/sinuca_bench')
+
+DEPOSIT = Decimal('1000.00')
+BET_AMOUNT = Decimal('10.00')
+SERVICE_TOKEN = 'token-de-servico-do-benchmark'
+
+# Peso de cada operação na carga mista
+WORKLOAD = {
+    'ranking': 30,
+    'transactions': 20,
+    'available': 15,
+    'bet_cycle': 25,
+    'deposit': 5,
+    'login': 5
+}
+
+def postgres_available():
+    try:
+        import psycopg2
+        psycopg2.connect(POSTGRES_URL, connect_timeout=1).close()
+        return True
+    except Exception:
+        return False
+
+def configure_database(choice):
+    """Definir DATABASE_URL antes de importar a aplicação"""
+    if choice == 'postgres' or (choice == 'auto' and postgres_available()):
+        os.environ['DATABASE_URL'] = POSTGRES_URL
+        return 'postgresql'
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'bench.db')
+    return 'sqlite'
+
+class Recorder:
+    """Latências por rota (thread-safe)"""
+
+    def __init__(self):
+        self.samples = defaultdict(list)
+        self.errors = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def call(self, label, send, expected):
+        start = time.perf_counter()
+        response = send()
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self.samples[label].append(elapsed)
+            if response.status_code not in expected:
+                self.errors[label] += 1
+        return response
+
+def percentile(ordered, p):
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p))]
+
+def summarize(recorder, elapsed):
+    endpoints = {}
+    for label, samples in sorted(recorder.samples.items()):
+        ordered = sorted(samples)
+        endpoints[label] = {
+            'requests': len(ordered),
+            'errors': recorder.errors[label],
+            'rps': round(len(ordered) / elapsed, 2),
+            'p50_ms': round(percentile(ordered, 0.50) * 1000, 3),
+            'p95_ms': round(percentile(ordered, 0.95) * 1000, 3),
+            'p99_ms': round(percentile(ordered, 0.99) * 1000, 3)
+        }
+    total = sum(e['requests'] for e in endpoints.values())
+    return endpoints, round(total / elapsed, 2)
+
+class Client:
+    """Um jogador virtual com o próprio test_client"""
+
+    def __init__(self, app, recorder, index, run_id):
+        self.http = app.test_client()
+        self.recorder = recorder
+        self.email = f'bench{run_id}-{index}@exemplo.com'
+        self.password = 'senha-de-benchmark'
+        response = recorder.call('POST /api/auth/register', lambda: self.http.post('/api/auth/register', json={
+            'nome_completo': f'Jogador {index}',
+            'nome_usuario': f'bench{run_id}-{index}',
+            'email': self.email,
+            'senha': self.password
+        }), (201,))
+        self.user_id = response.json['user']['id']
+        self.http.environ_base['HTTP_AUTHORIZATION'] = f"Bearer {response.json['token']}"
+        self.deposit()
+
+    def deposit(self):
+        self.recorder.call('POST /api/users/<user_id>/deposit', lambda: self.http.post(
+            f'/api/users/{self.user_id}/deposit', json={'amount': str(DEPOSIT), 'payment_method': 'pix'}
+        ), (200,))
+
+    def login(self):
+        self.recorder.call('POST /api/auth/login', lambda: self.http.post('/api/auth/login', json={
+            'email': self.email, 'senha': self.password
+        }), (200,))
+
+    def ranking(self):
+        self.recorder.call('GET /api/ranking', lambda: self.http.get('/api/ranking'), (200,))
+
+    def transactions(self):
+        self.recorder.call('GET /api/users/<user_id>/transactions', lambda: self.http.get(
+            f'/api/users/{self.user_id}/transactions'
+        ), (200,))
+
+    def available(self):
+        self.recorder.call('GET /api/bets/available', lambda: self.http.get(
+            f'/api/bets/available?user_id={self.user_id}'
+        ), (200,))
+
+    def bet_cycle(self, opponent):
+        created = self.recorder.call('POST /api/bets', lambda: self.http.post('/api/bets', json={
+            'bet_amount': str(BET_AMOUNT)
+        }), (201, 400))
+        if created.status_code != 201:
+            return
+        bet_id = created.json['bet']['id']
+        # 400 aqui é saldo insuficiente do adversário, resultado legítimo da carga
+        accepted = self.recorder.call('POST /api/bets/<bet_id>/accept', lambda: opponent.http.post(
+            f'/api/bets/{bet_id}/accept', json={}
+        ), (200, 400))
+        if accepted.status_code != 200:
+            return
+        winner = random.choice([self.user_id, opponent.user_id])
+        # Resultado informado pelo servidor de partidas (token de serviço)
+        self.recorder.call('POST /api/bets/<bet_id>/complete', lambda: self.http.post(
+            f'/api/bets/{bet_id}/complete', json={'winner_id': winner, 'game_data': {'bench': True}},
+            headers={'Authorization': f'Bearer {SERVICE_TOKEN}'}
+        ), (200, 400))
+
+def ledger_check(app, deposited):
+    """Depósitos = carteiras + apostas pendentes + escrow ativo + taxas arrecadadas"""
+    from sqlalchemy import func
+    from src.models.betting import db, User, Bet, PlatformRevenue
+
+    with app.app_context():
+        wallets = db.session.query(func.coalesce(func.sum(User.wallet_balance), 0)).scalar()
+        pending = db.session.query(func.coalesce(func.sum(Bet.bet_amount), 0))\
+            .filter(Bet.status == 'pending').scalar()
+        active = db.session.query(func.coalesce(func.sum(Bet.bet_amount * 2), 0))\
+            .filter(Bet.status == 'active').scalar()
+        fees = db.session.query(func.coalesce(func.sum(PlatformRevenue.amount), 0)).scalar()
+        negative = User.query.filter(User.wallet_balance < 0).count()
+
+    accounted = Decimal(wallets) + Decimal(pending) + Decimal(active) + Decimal(fees)
+    return {
+        'deposited': str(deposited),
+        'accounted': str(accounted),
+        'negative_wallets': negative,
+        'ok': accounted == deposited and negative == 0
+    }
+
+def compare(results, baseline, threshold):
+    """Imprimir variação por rota e devolver a lista de regressões"""
+    regressions = []
+    print(f"\n{'rota':<40} {'p95 base':>9} {'p95 agora':>9} {'Δ%':>7} {'req/s Δ%':>9}")
+    for label, current in results['endpoints'].items():
+        base = baseline.get('endpoints', {}).get(label)
+        if not base:
+            continue
+        p95_delta = (current['p95_ms'] - base['p95_ms']) / base['p95_ms'] * 100 if base['p95_ms'] else 0
+        rps_delta = (current['rps'] - base['rps']) / base['rps'] * 100 if base['rps'] else 0
+        flag = ''
+        if p95_delta > threshold or rps_delta < -threshold:
+            regressions.append(label)
+            flag = '  <- regressão'
+        print(f"{label:<40} {base['p95_ms']:>9.2f} {current['p95_ms']:>9.2f} {p95_delta:>+7.1f} {rps_delta:>+9.1f}{flag}")
+    return regressions
+
+def git_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=BACKEND_DIR,
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except Exception:
+        return None
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--db', choices=['auto', 'sqlite', 'postgres'], default='auto')
+    parser.add_argument('--clients', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=20)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help='Gravar o resultado em JSON')
+    parser.add_argument('--compare', help='Resultado JSON anterior para comparação')
+    parser.add_argument('--threshold', type=float, default=20, help='Piora tolerada em %% (p95 e req/s)')
+    parser.add_argument('--wallet-threads', type=int, default=32)
+    parser.add_argument('--wallet-attempts', type=int, default=400)
+    args = parser.parse_args()
+
+    dialect = configure_database(args.db)
+    # Sem dependências externas: cache e eventos locais; N+1 vira erro 500 na rota (conta em erros)
+    for name in ('CACHE_BACKEND', 'EVENTS_BACKEND'):
+        os.environ.setdefault(name, 'memory')
+    os.environ.setdefault('QUERY_GUARD', 'raise')
+    os.environ['SERVICE_API_TOKEN'] = SERVICE_TOKEN
+    # Esperas de lock do SQLite sob carga não poluem a saída
+    os.environ.setdefault('SLOW_QUERY_MS', '1000')
+
+    from src.main import app
+    import wallet_concurrency
+
+    random.seed(args.seed)
+    recorder = Recorder()
+    run_id = int(time.time())
+    clients = [Client(app, recorder, i, run_id) for i in range(max(args.clients, 2))]
+    deposited = DEPOSIT * len(clients)
+    deposit_lock = threading.Lock()
+
+    operations, weights = zip(*WORKLOAD.items())
+    stop = time.monotonic() + args.duration
+
+    def drive(client, rng):
+        nonlocal deposited
+        while time.monotonic() < stop:
+            operation = rng.choices(operations, weights)[0]
+            if operation == 'bet_cycle':
+                client.bet_cycle(rng.choice([c for c in clients if c is not client]))
+            elif operation == 'deposit':
+                client.deposit()
+                with deposit_lock:
+                    deposited += DEPOSIT
+            else:
+                getattr(client, operation)()
+
+    print(f'banco: {dialect}  clientes: {len(clients)}  duração: {args.duration:.0f}s')
+    started = time.perf_counter()
+    threads = [threading.Thread(target=drive, args=(client, random.Random(args.seed + i)))
+               for i, client in enumerate(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    endpoints, throughput = summarize(recorder, elapsed)
+    results = {
+        'timestamp': datetime.utcnow().isoformat(),
+        'revision': git_revision(),
+        'python': platform.python_version(),
+        'database': dialect,
+        'clients': len(clients),
+        'duration_s': round(elapsed, 2),
+        'throughput_rps': throughput,
+        'endpoints': endpoints,
+        'ledger_check': ledger_check(app, deposited),
+        'wallet_check': wallet_concurrency.run_check(args.wallet_threads, args.wallet_attempts, '100.00', '7.00')
+    }
+
+    print(f"\n{'rota':<40} {'reqs':>7} {'erros':>6} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for label, e in endpoints.items():
+        print(f"{label:<40} {e['requests']:>7} {e['errors']:>6} {e['rps']:>8.1f} "
+              f"{e['p50_ms']:>8.2f} {e['p95_ms']:>8.2f} {e['p99_ms']:>8.2f}")
+    print(f'\nvazão total: {throughput:.1f} req/s')
+    ledger, wallet = results['ledger_check'], results['wallet_check']
+    print(f"ledger: depositado {ledger['deposited']}, contabilizado {ledger['accounted']} "
+          f"-> {'OK' if ledger['ok'] else 'FALHA'}")
+    print(f"carteira concorrente: saldo {wallet['balance']}, esperado {wallet['expected_balance']} "
+          f"-> {'OK' if wallet['ok'] else 'FALHA'}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f'resultado gravado em {args.output}')
+
+    failed = not (ledger['ok'] and wallet['ok'])
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        if regressions:
+            print(f"\nregressões acima de {args.threshold:.0f}%: {', '.join(regressions)}")
+            failed = True
+
+    sys.exit(1 if failed else 0)
+
+if __name__ == '__main__':
+    main()
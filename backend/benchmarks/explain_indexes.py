@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Verificação de planos - as consultas quentes das apostas usam índice?
+Roda EXPLAIN nas consultas que as rotas /bets/available e /users/<id>/transactions
+montam (os mesmos construtores de src/routes/betting.py) e falha se alguma delas
+fizer varredura completa da tabela. /platform/revenue lê platform_stats pela
+chave primária e não entra aqui. tests/test_indexes.py roda a mesma verificação
+
+Uso: python benchmarks/explain_indexes.py
+Sem DATABASE_URL usa um arquivo SQLite temporário; em PostgreSQL a varredura
+sequencial é desabilitada na sessão para que tabelas vazias não mascarem o plano
+"""
+
+import os
+import sys
+import tempfile
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+if not os.environ.get('DATABASE_URL'):
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'explain.db')
+
+from sqlalchemy import text
+
+from src.main import app
+from src.models.betting import db
+from src.routes.betting import available_bets_query, transactions_page_query
+
+USER_ID = '00000000-0000-0000-0000-000000000000'
+
+def hot_queries():
+    return {
+        'bets_available': available_bets_query(),
+        'bets_available_for_user': available_bets_query(USER_ID, 10, 500),
+        'user_transactions': transactions_page_query(USER_ID, 20),
+        'user_transactions_cursor': transactions_page_query(USER_ID, 20, (datetime.utcnow(), USER_ID)),
+    }
+
+def explain(query):
+    dialect = db.engine.dialect
+    sql = str(query.statement.compile(dialect=dialect, compile_kwargs={'literal_binds': True}))
+    if dialect.name == 'sqlite':
+        rows = db.session.execute(text('EXPLAIN QUERY PLAN ' + sql)).all()
+        plan = '\n'.join(row[-1] for row in rows)
+        uses_index = 'USING INDEX' in plan or 'USING COVERING INDEX' in plan
+        full_scan = any(line.startswith('SCAN') and 'INDEX' not in line for line in plan.splitlines())
+    else:
+        db.session.execute(text('SET LOCAL enable_seqscan = off'))
+        plan = '\n'.join(row[0] for row in db.session.execute(text('EXPLAIN ' + sql)))
+        uses_index = 'Index' in plan
+        full_scan = 'Seq Scan' in plan
+    return plan, uses_index and not full_scan
+
+def main():
+    failures = []
+    with app.app_context():
+        for name, query in hot_queries().items():
+            plan, ok = explain(query)
+            print(f"{'OK   ' if ok else 'FALHA'} {name}\n    " + plan.replace('\n', '\n    '))
+            if not ok:
+                failures.append(name)
+        db.session.rollback()
+
+    sys.exit(1 if failures else 0)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Teste de carga - req/s por modo de servidor
+Sobe a API em cada modo (dev = servidor do Werkzeug, wsgi = gunicorn gthread,
+asgi = gunicorn + uvicorn) e dispara requisições concorrentes por um tempo fixo
+contra uma mistura de rotas de leitura e escrita
+
+Uso: python benchmarks/loadtest.py [--modes dev,wsgi,asgi] [--clients 32] [--duration 10]
+Alternativamente --url http://host:porta mede um servidor já em execução
+Workers/threads seguem WEB_CONCURRENCY, GUNICORN_THREADS e ASGI_THREADS
+"""
+
+import argparse
+import os
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+import requests
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def start_server(mode, port):
+    env = dict(os.environ, PORT=str(port), SERVER_MODE=mode, GUNICORN_ACCESS_LOG='', LOG_LEVEL='warning')
+    if mode == 'dev':
+        command = [sys.executable, 'src/main.py']
+    else:
+        command = [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py']
+    return subprocess.Popen(command, cwd=BACKEND_DIR, env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+def wait_ready(url, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if requests.get(f'{url}/api/health', timeout=1).ok:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f'servidor não respondeu em {url}')
+
+def setup_user(url):
+    """Usuário único por execução; o token vale para todos os clientes"""
+    suffix = f'{os.getpid()}{random.randrange(10 ** 6)}'
+    response = requests.post(f'{url}/api/auth/register', json={
+        'nome_completo': 'Carga',
+        'nome_usuario': f'carga{suffix}',
+        'email': f'carga{suffix}@exemplo.com',
+        'senha': 'senha-de-carga'
+    })
+    response.raise_for_status()
+    return response.json()['token']
+
+def percentile(samples, p):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p))]
+
+def run(url, token, clients, duration, write_ratio):
+    headers = {'Authorization': f'Bearer {token}'}
+    reads = ['/api/health', '/api/ranking', '/api/profile', '/api/games']
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    stop = time.monotonic() + duration
+
+    def worker():
+        session = requests.Session()
+        local, failed = [], 0
+        rng = random.Random()
+        while time.monotonic() < stop:
+            start = time.perf_counter()
+            try:
+                if rng.random() < write_ratio:
+                    response = session.post(f'{url}/api/games', json={'type': 'practice'}, headers=headers)
+                else:
+                    response = session.get(url + rng.choice(reads), headers=headers)
+                if response.status_code >= 400:
+                    failed += 1
+            except requests.RequestException:
+                failed += 1
+            local.append(time.perf_counter() - start)
+        with lock:
+            latencies.extend(local)
+            errors[0] += failed
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker) for _ in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    return {
+        'requests': len(latencies),
+        'rps': len(latencies) / elapsed,
+        'p50': percentile(latencies, 0.50) * 1000,
+        'p99': percentile(latencies, 0.99) * 1000,
+        'errors': errors[0]
+    }
+
+def report(label, result):
+    print(f"{label:<6} {result['requests']:>8} {result['rps']:>9.0f} "
+          f"{result['p50']:>8.1f} {result['p99']:>8.1f} {result['errors']:>7}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--modes', default='dev,wsgi,asgi')
+    parser.add_argument('--url', help='Medir um servidor já em execução em vez de subir um')
+    parser.add_argument('--clients', type=int, default=32)
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--write-ratio', type=float, default=0.1, help='Fração de POST /api/games')
+    args = parser.parse_args()
+
+    print(f"{'modo':<6} {'reqs':>8} {'req/s':>9} {'p50 ms':>8} {'p99 ms':>8} {'erros':>7}")
+
+    if args.url:
+        url = args.url.rstrip('/')
+        report('url', run(url, setup_user(url), args.clients, args.duration, args.write_ratio))
+        return
+
+    for mode in args.modes.split(','):
+        port = free_port()
+        url = f'http://127.0.0.1:{port}'
+        server = start_server(mode, port)
+        try:
+            wait_ready(url)
+            report(mode, run(url, setup_user(url), args.clients, args.duration, args.write_ratio))
+        finally:
+            server.terminate()
+            server.wait(timeout=30)
+
+if __name__ == '__main__':
+    main()
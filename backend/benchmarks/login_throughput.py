@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Benchmark - vazão de login sob concorrência
+Dispara logins simultâneos contra /api/auth/login e mede logins/s e latência,
+junto com a latência de uma rota leve (/api/ranking) durante a rajada
+
+Uso: python benchmarks/login_throughput.py [--clients 1,4,16] [--logins 200]
+Custos da KDF e limite de hashes simultâneos vêm das mesmas variáveis de ambiente da API
+(PASSWORD_HASH_ALGORITHM, SCRYPT_N, PBKDF2_ITERATIONS, PASSWORD_HASH_MAX_CONCURRENT...)
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.main import app
+
+PASSWORD = 'senha-de-benchmark'
+
+def register_users(client, count):
+    emails = []
+    for i in range(count):
+        email = f'bench{i}@exemplo.com'
+        client.post('/api/auth/register', json={
+            'nome_completo': f'Jogador {i}',
+            'nome_usuario': f'bench{i}',
+            'email': email,
+            'senha': PASSWORD
+        })
+        emails.append(email)
+    return emails
+
+def percentile(samples, p):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p))]
+
+def run(clients, emails, logins):
+    local = threading.local()
+
+    def login(i):
+        if not hasattr(local, 'client'):
+            local.client = app.test_client()
+        start = time.perf_counter()
+        response = local.client.post('/api/auth/login', json={
+            'email': emails[i % len(emails)],
+            'senha': PASSWORD
+        })
+        return time.perf_counter() - start, response.status_code
+
+    # Rota leve medida em paralelo para ver se a rajada a prejudica
+    light_latencies = []
+    stop = threading.Event()
+
+    def probe():
+        client = app.test_client()
+        while not stop.is_set():
+            start = time.perf_counter()
+            client.get('/api/ranking')
+            light_latencies.append(time.perf_counter() - start)
+
+    prober = threading.Thread(target=probe)
+    prober.start()
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as executor:
+        results = list(executor.map(login, range(logins)))
+    elapsed = time.perf_counter() - start
+
+    stop.set()
+    prober.join()
+
+    latencies = [latency for latency, status in results if status == 200]
+    busy = sum(1 for _, status in results if status == 503)
+    return {
+        'throughput': len(latencies) / elapsed,
+        'p50': statistics.median(latencies) if latencies else 0,
+        'p95': percentile(latencies, 0.95) if latencies else 0,
+        'busy': busy,
+        'light_p95': percentile(light_latencies, 0.95) if light_latencies else 0
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--clients', default='1,4,16')
+    parser.add_argument('--logins', type=int, default=200)
+    parser.add_argument('--users', type=int, default=50)
+    args = parser.parse_args()
+
+    emails = register_users(app.test_client(), args.users)
+
+    print(f"{'clientes':>8} {'logins/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'503':>5} {'ranking p95 ms':>15}")
+    for clients in (int(c) for c in args.clients.split(',')):
+        r = run(clients, emails, args.logins)
+        print(f"{clients:>8} {r['throughput']:>9.1f} {r['p50'] * 1000:>8.1f} "
+              f"{r['p95'] * 1000:>8.1f} {r['busy']:>5} {r['light_p95'] * 1000:>15.2f}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+Benchmark - replays de partida: game_data com as tacadas em JSON (bets.game_data)
+vs colunas compactadas em match_replays
+Mede bytes gravados por partida, custo de codificar/decodificar, listagem de
+apostas finalizadas e busca do replay de uma partida nos dois formatos
+
+Uso: python benchmarks/replay_storage.py [--matches 500] [--shots 150]
+Sem DATABASE_URL usa um arquivo SQLite temporário
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import uuid
+import zlib
+from datetime import datetime
+from decimal import Decimal
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+if not os.environ.get('DATABASE_URL'):
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'replays.db')
+
+from sqlalchemy import func
+from sqlalchemy.orm import undefer
+
+from src.main import app
+from src.models.betting import db, User, Bet, MatchReplay
+from src.serialization import dumps
+from src.services import replay
+
+LIST_SIZE = 100
+REPEAT = 20
+
+def make_shots(count, rng):
+    t = 0
+    shots = []
+    for i in range(count):
+        t += rng.randint(3000, 25000)
+        shots.append({
+            't': t,
+            'player': i % 2 + 1,
+            'ball': rng.randint(0, 15),
+            'x': round(rng.uniform(0, 2540), 1),
+            'y': round(rng.uniform(0, 1270), 1),
+            'angle': round(rng.uniform(0, 360), 2),
+            'power': round(rng.random(), 4),
+            'potted': rng.sample(range(1, 16), rng.choice((0, 0, 0, 1, 1, 2))),
+            'foul': rng.random() < 0.08
+        })
+    return shots
+
+def per_call(fn, items, repeat=3):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for item in items:
+            fn(item)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best / len(items) * 1e6
+
+def timed(fn, repeat=REPEAT):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best * 1e3
+
+def populate(matches):
+    """Mesmas partidas nos dois formatos; retorna (ids antes, ids depois)"""
+    with app.app_context():
+        players = [User(username=f'replay-{uuid.uuid4().hex[:8]}', email=f'{uuid.uuid4().hex}@exemplo.com',
+                        password_hash='-') for _ in range(2)]
+        db.session.add_all(players)
+        db.session.commit()
+
+        now = datetime.utcnow()
+        before, after, bets, replays = [], [], [], []
+        for game_data in matches:
+            for ids, with_replay in ((before, False), (after, True)):
+                bet_id = str(uuid.uuid4())
+                ids.append(bet_id)
+                if with_replay:
+                    text, columns = replay.split_game_data(game_data)
+                    replays.append(replay.replay_row(bet_id, columns, now))
+                else:
+                    text = json.dumps(game_data)
+                bets.append({
+                    'id': bet_id, 'player1_id': players[0].id, 'player2_id': players[1].id,
+                    'bet_amount': Decimal('10'), 'platform_fee': Decimal('1'), 'total_prize': Decimal('19'),
+                    'winner_id': players[0].id, 'status': 'completed', 'game_data': text,
+                    'created_at': now, 'started_at': now, 'completed_at': now
+                })
+        db.session.execute(db.insert(Bet), bets)
+        db.session.execute(db.insert(MatchReplay), replays)
+        db.session.commit()
+        return before, after
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--matches', type=int, default=500)
+    parser.add_argument('--shots', type=int, default=150, help='Tacadas por partida')
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    matches = [{'duration': rng.randint(300, 1800), 'shots': make_shots(args.shots, rng)}
+               for _ in range(args.matches)]
+
+    # Tamanho e custo de CPU por partida
+    encoded_json = [json.dumps(m).encode() for m in matches]
+    columns = [replay.parse_shots(m['shots']) for m in matches]
+    blobs = [replay.encode(c) for c in columns]
+    sizes = {
+        'JSON (bets.game_data)': sum(map(len, encoded_json)),
+        'JSON + zlib': sum(len(zlib.compress(data, replay.COMPRESSION_LEVEL)) for data in encoded_json),
+        'colunas + zlib (match_replays)': sum(map(len, blobs)),
+    }
+    print(f'{args.matches} partidas x {args.shots} tacadas')
+    print('\nBytes por partida')
+    for name, total in sizes.items():
+        print(f'  {name:<32} {total / args.matches:9.0f}')
+
+    print('\nCPU por partida')
+    print(f"  {'codificar (validação + colunas)':<32} "
+          f"{per_call(lambda m: replay.encode(replay.parse_shots(m['shots'])), matches):9.0f} µs")
+    print(f"  {'decodificar todas as tacadas':<32} {per_call(lambda b: list(replay.decode(b)), blobs):9.0f} µs")
+    print(f"  {'json.loads do game_data':<32} {per_call(json.loads, encoded_json):9.0f} µs")
+
+    before, after = populate(matches)
+    sample = random.Random(args.seed).sample(range(args.matches), min(50, args.matches))
+
+    with app.app_context():
+        stored = {
+            'bets.game_data antes': db.session.query(func.sum(func.length(Bet.game_data)))
+                .filter(Bet.id.in_(before)).scalar(),
+            'bets.game_data depois': db.session.query(func.sum(func.length(Bet.game_data)))
+                .filter(Bet.id.in_(after)).scalar(),
+            'match_replays.data': db.session.query(func.sum(MatchReplay.stored_size)).scalar(),
+        }
+        print(f"\nGravado no banco ({db.engine.dialect.name}), bytes por partida")
+        for name, total in stored.items():
+            print(f'  {name:<32} {total / args.matches:9.0f}')
+
+        listing = {
+            'antes (game_data com tacadas)': lambda: [
+                b.to_dict() for b in Bet.query.options(undefer(Bet.game_data))
+                .filter(Bet.id.in_(before[:LIST_SIZE])).all()],
+            'depois (game_data adiado)': lambda: [
+                b.to_dict() for b in Bet.query.filter(Bet.id.in_(after[:LIST_SIZE])).all()],
+        }
+        print(f'\nListar {LIST_SIZE} apostas finalizadas')
+        for name, fn in listing.items():
+            print(f'  {name:<32} {timed(lambda: (db.session.expunge_all(), fn())):9.2f} ms')
+
+        def fetch_before(i):
+            db.session.expunge_all()
+            bet = db.session.get(Bet, before[i], options=[undefer(Bet.game_data)])
+            return dumps(json.loads(bet.game_data)['shots'])
+
+        def fetch_after(i):
+            db.session.expunge_all()
+            match_replay = db.session.get(MatchReplay, after[i], options=[undefer(MatchReplay.data)])
+            return ''.join(replay.stream_ndjson(match_replay))
+
+        print('\nBuscar o replay de uma partida')
+        print(f"  {'antes (bets.game_data + JSON)':<32} {per_call(fetch_before, sample) / 1e3:9.2f} ms")
+        print(f"  {'depois (match_replays + NDJSON)':<32} {per_call(fetch_after, sample) / 1e3:9.2f} ms")
+
+if __name__ == '__main__':
+    main()
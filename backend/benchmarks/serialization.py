@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark - custo de serialização por linha
+Compara o caminho antigo (to_dict com float()/isoformat() por campo + json da
+biblioteca padrão) com o serializador pré-compilado + FastJSONProvider, numa
+lista de apostas como a de /bets/available
+
+Uso: python benchmarks/serialization.py [--rows 10000] [--repeat 20]
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+import uuid
+from datetime import datetime
+from decimal import Decimal
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.main import app
+from src.models.betting import Bet
+from src import serialization
+
+def legacy_to_dict(bet):
+    """Versão anterior de Bet.to_dict, para comparação"""
+    return {
+        'id': bet.id,
+        'player1_id': bet.player1_id,
+        'player2_id': bet.player2_id,
+        'bet_amount': float(bet.bet_amount),
+        'platform_fee': float(bet.platform_fee),
+        'total_prize': float(bet.total_prize),
+        'winner_id': bet.winner_id,
+        'status': bet.status,
+        'created_at': bet.created_at.isoformat(),
+        'started_at': bet.started_at.isoformat() if bet.started_at else None,
+        'completed_at': bet.completed_at.isoformat() if bet.completed_at else None
+    }
+
+def make_bets(rows):
+    now = datetime.utcnow()
+    return [
+        # Todos os campos preenchidos, como numa linha carregada do banco
+        Bet(id=str(uuid.uuid4()), player1_id=str(uuid.uuid4()), player2_id=None,
+            bet_amount=Decimal('25.00'), platform_fee=Decimal('2.50'), total_prize=Decimal('47.50'),
+            winner_id=None, status='pending', created_at=now, started_at=None, completed_at=None)
+        for _ in range(rows)
+    ]
+
+def per_row(fn, rows, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best / rows * 1e6
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    bets = make_bets(args.rows)
+
+    with app.app_context():
+        provider = app.json
+        results = {
+            'antigo (to_dict + json stdlib)': lambda: json.dumps(
+                {'available_bets': [legacy_to_dict(b) for b in bets]}, sort_keys=True),
+            'pré-compilado + provider': lambda: provider.response(
+                {'available_bets': list(map(Bet.to_dict, bets))}),
+        }
+
+        print(f"orjson: {'sim' if serialization.orjson else 'não (json da biblioteca padrão)'}")
+        for name, fn in results.items():
+            print(f'{name:<34} {per_row(fn, args.rows, args.repeat):7.2f} µs/linha')
+
+if __name__ == '__main__':
+    main()
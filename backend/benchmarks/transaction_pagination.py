@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Benchmark - histórico de transações: OFFSET (?page=N) vs cursor (?cursor=...)
+Popula um usuário com muitas transações e mede a latência de páginas cada vez
+mais profundas nos dois modos de /users/<id>/transactions
+
+Uso: python benchmarks/transaction_pagination.py [--rows 50000] [--per-page 50]
+Sem DATABASE_URL usa um arquivo SQLite temporário
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+if not os.environ.get('DATABASE_URL'):
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'pagination.db')
+
+from src.auth import generate_token
+from src.main import app
+from src.models.betting import db, User, Transaction
+
+REPEAT = 5
+
+def populate(rows):
+    with app.app_context():
+        user = User(username=f'historico-{uuid.uuid4().hex[:8]}', email=f'{uuid.uuid4().hex}@exemplo.com',
+                    password_hash='-')
+        db.session.add(user)
+        db.session.commit()
+
+        start = datetime.utcnow() - timedelta(seconds=rows)
+        db.session.execute(db.insert(Transaction), [
+            {
+                'id': str(uuid.uuid4()),
+                'user_id': user.id,
+                'type': 'deposit',
+                'amount': 1,
+                'status': 'completed',
+                'created_at': start + timedelta(seconds=i)
+            }
+            for i in range(rows)
+        ])
+        db.session.commit()
+        return user.id
+
+def timed(client, url):
+    best = None
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        response = client.get(url)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, response.json
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=50000)
+    parser.add_argument('--per-page', type=int, default=50)
+    args = parser.parse_args()
+
+    user_id = populate(args.rows)
+    client = app.test_client()
+    client.environ_base['HTTP_AUTHORIZATION'] = f'Bearer {generate_token(user_id)}'
+    base = f'/api/users/{user_id}/transactions?per_page={args.per_page}'
+
+    pages = args.rows // args.per_page
+    depths = sorted({1, pages // 100 or 1, pages // 10 or 1, pages // 2 or 1, pages})
+
+    # Percorrer os cursores uma vez para saber o cursor de cada profundidade
+    cursors, cursor = {1: None}, None
+    for page in range(2, pages + 1):
+        cursor = client.get(base + (f'&cursor={cursor}' if cursor else '')).json['next_cursor']
+        if page in depths:
+            cursors[page] = cursor
+
+    print(f"{'página':>8} {'offset (ms)':>12} {'cursor (ms)':>12}")
+    for page in depths:
+        offset_time, _ = timed(client, f'{base}&page={page}')
+        cursor_url = base + (f'&cursor={cursors[page]}' if cursors.get(page) else '')
+        cursor_time, _ = timed(client, cursor_url)
+        print(f'{page:>8} {offset_time * 1000:>12.2f} {cursor_time * 1000:>12.2f}')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+Benchmark - buscas no repositório de usuários em memória
+Mede a latência das buscas por email, id e nome de usuário de 1k a 1M usuários
+
+Uso: python benchmarks/user_lookup.py [--sizes 1000,10000,100000,1000000]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.storage.memory import UserRepository
+
+LOOKUPS = 100_000
+
+def build_repository(size):
+    """Popular um repositório com usuários sintéticos"""
+    repo = UserRepository()
+    for user_id in range(1, size + 1):
+        repo.add({
+            'id': user_id,
+            'nome_usuario': f'jogador{user_id}',
+            'email': f'jogador{user_id}@exemplo.com'
+        })
+    return repo
+
+def measure(lookup, keys):
+    """Latência média por busca em nanossegundos"""
+    start = time.perf_counter_ns()
+    for key in keys:
+        lookup(key)
+    return (time.perf_counter_ns() - start) / len(keys)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', default='1000,10000,100000,1000000')
+    args = parser.parse_args()
+
+    print(f"{'usuários':>10} {'email (ns)':>12} {'id (ns)':>12} {'username (ns)':>14}")
+    for size in (int(s) for s in args.sizes.split(',')):
+        repo = build_repository(size)
+        ids = [random.randint(1, size) for _ in range(LOOKUPS)]
+
+        by_email = measure(repo.get_by_email, [f'jogador{i}@exemplo.com' for i in ids])
+        by_id = measure(repo.get_by_id, ids)
+        by_username = measure(repo.get_by_username, [f'jogador{i}' for i in ids])
+
+        print(f'{size:>10} {by_email:>12.0f} {by_id:>12.0f} {by_username:>14.0f}')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Verificação de concorrência - muitas threads debitando a mesma carteira
+Cria apostas em paralelo para um único jogador e confere que o saldo nunca
+fica negativo e que bate com a soma dos débitos aceitos (tests/test_ledger.py
+faz a mesma conferência no pytest)
+
+Uso: python benchmarks/wallet_concurrency.py [--threads 32] [--attempts 400]
+Sem DATABASE_URL usa um arquivo SQLite temporário
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+if not os.environ.get('DATABASE_URL'):
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'wallet.db')
+
+from src.main import app
+from src.models.betting import db, User, Transaction
+
+def run_check(threads, attempts, balance, amount):
+    """Disparar as apostas em paralelo e conferir o saldo; também usado por betting_flow.py"""
+    client = app.test_client()
+    suffix = int(time.time() * 1000)
+    registered = client.post('/api/auth/register', json={
+        'nome_completo': 'Carteira',
+        'nome_usuario': f'carteira{suffix}',
+        'email': f'carteira{suffix}@exemplo.com',
+        'senha': 'senha-de-carteira'
+    }).json
+    user = registered['user']
+    headers = {'Authorization': f"Bearer {registered['token']}"}
+    client.post(f"/api/users/{user['id']}/deposit", json={'amount': balance}, headers=headers)
+
+    def create_bet(_):
+        return app.test_client().post('/api/bets', json={
+            'bet_amount': amount
+        }, headers=headers).status_code
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        statuses = list(executor.map(create_bet, range(attempts)))
+    elapsed = time.perf_counter() - start
+
+    with app.app_context():
+        final_balance = db.session.get(User, user['id']).wallet_balance
+        debits = Transaction.query.filter_by(user_id=user['id'], type='bet_debit').count()
+
+    accepted = statuses.count(201)
+    expected = Decimal(balance) - accepted * Decimal(amount)
+    return {
+        'threads': threads,
+        'attempts': attempts,
+        'seconds': round(elapsed, 3),
+        'accepted': accepted,
+        'insufficient_funds': statuses.count(400),
+        'errors': statuses.count(500),
+        'balance': str(final_balance),
+        'expected_balance': str(expected),
+        'debits': debits,
+        'ok': final_balance >= 0 and final_balance == expected and debits == accepted
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--threads', type=int, default=32)
+    parser.add_argument('--attempts', type=int, default=400)
+    parser.add_argument('--balance', default='100.00')
+    parser.add_argument('--amount', default='7.00')
+    args = parser.parse_args()
+
+    result = run_check(args.threads, args.attempts, args.balance, args.amount)
+
+    print(f"tentativas: {result['attempts']} em {result['threads']} threads ({result['seconds']:.2f}s)")
+    print(f"aceitas: {result['accepted']}  saldo insuficiente: {result['insufficient_funds']}  erros: {result['errors']}")
+    print(f"saldo final: {result['balance']}  esperado: {result['expected_balance']}  débitos registrados: {result['debits']}")
+
+    print('OK' if result['ok'] else 'FALHA: saldo inconsistente')
+    sys.exit(0 if result['ok'] else 1)
+
+if __name__ == '__main__':
+    main()
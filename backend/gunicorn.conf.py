@@ -0,0 +1,53 @@
+"""
+Configuração do gunicorn para produção
+Uso: gunicorn -c gunicorn.conf.py
+
+Variáveis de ambiente:
+  SERVER_MODE       wsgi (padrão, workers gthread) ou asgi (workers uvicorn + src/asgi.py;
+                    necessário para /api/events, servido no loop sem ocupar threads)
+  WEB_CONCURRENCY   número de processos; padrão 2 x CPUs + 1 com banco externo
+                    e 1 sem DATABASE_URL (store em memória não é compartilhado)
+  GUNICORN_THREADS  threads por worker no modo wsgi (padrão 4)
+  ASGI_THREADS      threads do adaptador WSGI->ASGI no modo asgi (padrão 10)
+  GUNICORN_TIMEOUT, GUNICORN_KEEPALIVE, GUNICORN_MAX_REQUESTS, GUNICORN_ACCESS_LOG, LOG_LEVEL
+"""
+
+import multiprocessing
+import os
+
+def _env_int(name, default):
+    return int(os.environ.get(name, default))
+
+server_mode = os.environ.get('SERVER_MODE', 'wsgi').lower()
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '5001')}"
+
+# Sem DATABASE_URL cada processo teria os próprios usuários/partidas em memória
+_default_workers = multiprocessing.cpu_count() * 2 + 1 if os.environ.get('DATABASE_URL') else 1
+workers = _env_int('WEB_CONCURRENCY', _default_workers)
+# Herdado pelos workers: o app avisa quando algo é por processo (ex.: cache em memória)
+os.environ['WEB_CONCURRENCY'] = str(workers)
+
+if server_mode == 'asgi':
+    wsgi_app = 'src.asgi:app'
+    worker_class = 'uvicorn.workers.UvicornWorker'
+elif server_mode == 'wsgi':
+    wsgi_app = 'src.main:app'
+    threads = _env_int('GUNICORN_THREADS', 4)
+    worker_class = 'gthread' if threads > 1 else 'sync'
+else:
+    raise RuntimeError(f"SERVER_MODE inválido: {server_mode} (use 'wsgi' ou 'asgi')")
+
+timeout = _env_int('GUNICORN_TIMEOUT', 30)
+graceful_timeout = timeout
+keepalive = _env_int('GUNICORN_KEEPALIVE', 5)
+
+# Recicla workers periodicamente para conter vazamentos de memória; desligado
+# sem DATABASE_URL, pois reiniciar o worker apagaria o store em memória
+max_requests = _env_int('GUNICORN_MAX_REQUESTS', 1000 if os.environ.get('DATABASE_URL') else 0)
+max_requests_jitter = max_requests // 10
+
+# GUNICORN_ACCESS_LOG vazio desliga o log de acesso (útil em testes de carga)
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG', '-') or None
+errorlog = '-'
+loglevel = os.environ.get('LOG_LEVEL', 'info')
@@ -0,0 +1,104 @@
+"""
+Entrada ASGI da API (SERVER_MODE=asgi no gunicorn.conf.py)
+
+As rotas Flask e o SQLAlchemy continuam síncronos; o adaptador executa cada
+requisição num pool de threads (ASGI_THREADS, padrão 10) enquanto o loop de
+eventos do uvicorn segue aceitando conexões e servindo keep-alive.
+
+GET /api/events (SSE) não passa pelo adaptador: é servido direto no loop,
+então conexões abertas não ocupam threads do pool das rotas Flask.
+"""
+
+import asyncio
+import json
+import os
+from urllib.parse import parse_qs
+
+from a2wsgi import WSGIMiddleware
+
+from src.auth import verify_token
+from src.events import event_bus, TooManySubscribers
+from src.main import app as flask_app
+from src.routes.events import HEADERS, HEARTBEAT_SECONDS, format_event, parse_types
+
+EVENTS_PATH = '/api/events'
+
+wsgi = WSGIMiddleware(flask_app, workers=int(os.environ.get('ASGI_THREADS', 10)))
+
+async def _send_json(send, status, body, headers=()):
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [(b'content-type', b'application/json'), *headers]
+    })
+    await send({'type': 'http.response.body', 'body': json.dumps(body).encode()})
+
+async def _wait_disconnect(receive):
+    while (await receive())['type'] != 'http.disconnect':
+        pass
+
+async def _stream(subscription, wakeup, send):
+    await send({'type': 'http.response.body', 'body': b'retry: 3000\n\n', 'more_body': True})
+    while True:
+        event = subscription.get_nowait()
+        if event is None:
+            # Limpar antes de conferir de novo: um evento publicado no meio não se perde
+            wakeup.clear()
+            event = subscription.get_nowait()
+        if event is None:
+            try:
+                await asyncio.wait_for(wakeup.wait(), HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                await send({'type': 'http.response.body', 'body': b': keepalive\n\n', 'more_body': True})
+            continue
+        await send({'type': 'http.response.body', 'body': format_event(event).encode(), 'more_body': True})
+
+async def events(scope, receive, send):
+    """SSE com as mesmas regras da rota Flask (ver src/routes/events.py)"""
+    query = parse_qs(scope.get('query_string', b'').decode())
+    header = dict(scope['headers']).get(b'authorization', b'').decode()
+    token = header[len('Bearer '):] if header.startswith('Bearer ') else header
+    user_id = verify_token(token or query.get('token', [None])[0])
+    if not user_id:
+        await _send_json(send, 401, {'error': 'Token inválido'})
+        return
+
+    loop = asyncio.get_running_loop()
+    wakeup = asyncio.Event()
+
+    def notify():
+        # Quem publica roda em threads do pool (ou do Redis): acordar o loop por call_soon_threadsafe
+        try:
+            loop.call_soon_threadsafe(wakeup.set)
+        except RuntimeError:
+            pass  # loop já encerrado (worker saindo)
+
+    try:
+        subscription = event_bus.subscribe(user_id, parse_types(query.get('types', [''])[0]), notify=notify)
+    except TooManySubscribers:
+        await _send_json(send, 503, {'error': 'Muitas conexões de eventos, tente novamente'},
+                         [(b'retry-after', b'5')])
+        return
+
+    try:
+        await send({
+            'type': 'http.response.start',
+            'status': 200,
+            'headers': [(b'content-type', b'text/event-stream; charset=utf-8'),
+                        *((k.lower().encode(), v.encode()) for k, v in HEADERS.items())]
+        })
+        tasks = [asyncio.ensure_future(_stream(subscription, wakeup, send)),
+                 asyncio.ensure_future(_wait_disconnect(receive))]
+        done, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        for task in pending:
+            task.cancel()
+        for task in done:
+            task.result()
+    finally:
+        subscription.close()
+
+async def app(scope, receive, send):
+    if scope['type'] == 'http' and scope['path'] == EVENTS_PATH and scope['method'] == 'GET':
+        await events(scope, receive, send)
+    else:
+        await wsgi(scope, receive, send)
@@ -0,0 +1,135 @@
+"""
+Autenticação por JWT com cache de tokens já verificados
+"""
+
+import hmac
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from functools import wraps
+
+import jwt
+from flask import g, request, jsonify
+
+SECRET_KEY = os.environ.get('SECRET_KEY', 'sinuca-real-secret-key-2024')
+TOKEN_TTL = timedelta(hours=24)
+# Token de serviço para rotas administrativas e do servidor de partidas (exportação,
+# finalizar apostas, receita); sem ele essas rotas ficam desligadas
+SERVICE_API_TOKEN = os.environ.get('SERVICE_API_TOKEN')
+
+class TokenCache:
+    """
+    Cache LRU de tokens já verificados (token -> user_id)
+
+    Cada entrada vale até o menor entre o TTL do cache e o "exp" do próprio
+    token, então um token expirado nunca é aceito pelo cache.
+    """
+
+    def __init__(self, maxsize=10000, ttl=300):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, token):
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is None:
+                self.misses += 1
+                return None
+            user_id, expires_at = entry
+            if expires_at <= now:
+                del self._entries[token]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(token)
+            self.hits += 1
+            return user_id
+
+    def put(self, token, user_id, exp):
+        expires_at = min(time.time() + self.ttl, exp)
+        with self._lock:
+            self._entries[token] = (user_id, expires_at)
+            self._entries.move_to_end(token)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0
+            }
+
+token_cache = TokenCache(
+    maxsize=int(os.environ.get('TOKEN_CACHE_SIZE', 10000)),
+    ttl=int(os.environ.get('TOKEN_CACHE_TTL', 300))
+)
+
+def generate_token(user_id):
+    """Gerar JWT token"""
+    payload = {
+        'user_id': user_id,
+        'exp': datetime.utcnow() + TOKEN_TTL
+    }
+    return jwt.encode(payload, SECRET_KEY, algorithm='HS256')
+
+def verify_token(token):
+    """Verificar JWT token (decodifica só na primeira vez que o token aparece)"""
+    if not token:
+        return None
+
+    user_id = token_cache.get(token)
+    if user_id is not None:
+        return user_id
+
+    try:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=['HS256'],
+                             options={'require': ['exp']})
+        user_id = payload['user_id']
+    except (jwt.InvalidTokenError, KeyError):
+        return None
+
+    token_cache.put(token, user_id, payload['exp'])
+    return user_id
+
+def bearer_token():
+    """Token do cabeçalho Authorization"""
+    header = request.headers.get('Authorization', '')
+    if header.startswith('Bearer '):
+        return header[len('Bearer '):]
+    return header
+
+def require_auth(view):
+    """Exigir token válido; o id do usuário fica em g.user_id"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        user_id = verify_token(bearer_token())
+        if not user_id:
+            return jsonify({'error': 'Token inválido'}), 401
+        g.user_id = user_id
+        return view(*args, **kwargs)
+    return wrapper
+
+def require_service_token(view):
+    """Exigir o SERVICE_API_TOKEN no cabeçalho Authorization (rotas administrativas)"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if not SERVICE_API_TOKEN:
+            return jsonify({'error': 'Rota administrativa desabilitada (defina SERVICE_API_TOKEN)'}), 403
+        if not hmac.compare_digest(bearer_token().encode(), SERVICE_API_TOKEN.encode()):
+            return jsonify({'error': 'Token inválido'}), 401
+        return view(*args, **kwargs)
+    return wrapper
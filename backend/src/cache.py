@@ -0,0 +1,213 @@
+"""
+Cache de respostas das rotas de leitura mais acessadas
+
+- @cached('ranking', ttl=30): guarda o corpo das respostas 200 por rota +
+  query string e responde com ETag; If-None-Match igual devolve 304 sem corpo
+- response_cache.invalidate('ranking', ...): chamado pelas rotas de escrita
+  depois do commit para descartar o namespace inteiro
+- memory: LRU por processo com TTL; invalidar só afeta o próprio worker
+  (aviso no log se houver mais de um worker)
+- redis: compartilhado entre workers e réplicas (padrão com REDIS_URL)
+
+Nos dois backends a chave inclui a geração do namespace e invalidar só
+incrementa a geração: uma resposta calculada antes da invalidação e gravada
+depois fica numa geração que ninguém mais lê.
+
+O backend vem de config.cache_backend() (CACHE_BACKEND / REDIS_URL).
+"""
+
+import hashlib
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from functools import wraps
+
+from flask import current_app, request
+
+from src import config
+
+logger = logging.getLogger(__name__)
+
+class MemoryCacheBackend:
+    """LRU com TTL; invalidar incrementa a geração do namespace (O(1))"""
+
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._generations = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def version(self, namespace):
+        with self._lock:
+            return self._generations[namespace]
+
+    def get(self, namespace, key, version):
+        now = time.time()
+        with self._lock:
+            full_key = (namespace, version, key)
+            entry = self._entries.get(full_key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at <= now:
+                del self._entries[full_key]
+                return None
+            self._entries.move_to_end(full_key)
+            return value
+
+    def set(self, namespace, key, value, ttl, version):
+        # Gravada na geração lida antes da rota rodar: se houve invalidação
+        # no meio, a resposta (possivelmente velha) nunca é servida
+        with self._lock:
+            full_key = (namespace, version, key)
+            self._entries[full_key] = (time.time() + ttl, value)
+            self._entries.move_to_end(full_key)
+            # Entradas de gerações antigas saem por aqui ou pelo TTL
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, namespace):
+        with self._lock:
+            self._generations[namespace] += 1
+
+    def size(self):
+        return len(self._entries)
+
+class RedisCacheBackend:
+    """Entradas no Redis com SETEX; a geração de cada namespace é um contador (INCR)"""
+
+    def __init__(self, url, prefix='sinuca:cache:'):
+        import redis  # dependência só necessária com CACHE_BACKEND=redis
+
+        self._redis = redis.Redis.from_url(url)
+        self.prefix = prefix
+
+    def _key(self, namespace, version, key):
+        return f'{self.prefix}{namespace}:{version}:{key}'
+
+    def _generation_key(self, namespace):
+        return f'{self.prefix}{namespace}:generation'
+
+    def version(self, namespace):
+        return int(self._redis.get(self._generation_key(namespace)) or 0)
+
+    def get(self, namespace, key, version):
+        raw = self._redis.get(self._key(namespace, version, key))
+        if raw is None:
+            return None
+        etag, mimetype, body = raw.split(b'\n', 2)
+        return etag.decode(), mimetype.decode(), body
+
+    def set(self, namespace, key, value, ttl, version):
+        # Gerações antigas não são apagadas: saem pelo TTL
+        etag, mimetype, body = value
+        self._redis.setex(self._key(namespace, version, key), ttl,
+                          b'\n'.join([etag.encode(), mimetype.encode(), body]))
+
+    def invalidate(self, namespace):
+        self._redis.incr(self._generation_key(namespace))
+
+    def size(self):
+        return None
+
+class ResponseCache:
+    """Cache de respostas com contadores de acerto por namespace"""
+
+    def __init__(self, backend):
+        self.backend = backend
+        self._counters = defaultdict(lambda: {'hits': 0, 'misses': 0, 'not_modified': 0})
+        self._lock = threading.Lock()
+
+    def _count(self, namespace, field):
+        with self._lock:
+            self._counters[namespace][field] += 1
+
+    def invalidate(self, *namespaces):
+        """Descartar as respostas dos namespaces; erros do backend são só registrados"""
+        for namespace in namespaces:
+            try:
+                self.backend.invalidate(namespace)
+            except Exception:
+                logger.exception('Falha ao invalidar o cache %s', namespace)
+
+    def stats(self):
+        with self._lock:
+            namespaces = {}
+            for namespace, counters in self._counters.items():
+                lookups = counters['hits'] + counters['misses']
+                namespaces[namespace] = dict(
+                    counters, hit_ratio=round(counters['hits'] / lookups, 4) if lookups else 0.0
+                )
+        hits = sum(n['hits'] for n in namespaces.values())
+        lookups = hits + sum(n['misses'] for n in namespaces.values())
+        return {
+            'backend': type(self.backend).__name__,
+            'size': self.backend.size(),
+            'hit_ratio': round(hits / lookups, 4) if lookups else 0.0,
+            'namespaces': namespaces
+        }
+
+    def _lookup(self, namespace, key):
+        """(versão do namespace, entrada ou None)"""
+        try:
+            version = self.backend.version(namespace)
+            return version, self.backend.get(namespace, key, version)
+        except Exception:
+            logger.exception('Falha ao ler o cache %s', namespace)
+            return None, None
+
+    def _store(self, namespace, key, value, ttl, version):
+        try:
+            self.backend.set(namespace, key, value, ttl, version)
+        except Exception:
+            logger.exception('Falha ao gravar o cache %s', namespace)
+
+    def cached(self, namespace, ttl=30):
+        """Decorador de rota GET; a chave é o caminho mais a query string ordenada"""
+        def decorator(view):
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                key = request.path + '?' + '&'.join(
+                    f'{k}={v}' for k, v in sorted(request.args.items(multi=True))
+                )
+                version, entry = self._lookup(namespace, key)
+                if entry is not None:
+                    self._count(namespace, 'hits')
+                    etag, mimetype, body = entry
+                    response = current_app.response_class(body, mimetype=mimetype)
+                    response.headers['X-Cache'] = 'HIT'
+                else:
+                    self._count(namespace, 'misses')
+                    response = current_app.make_response(view(*args, **kwargs))
+                    if response.status_code != 200 or response.is_streamed:
+                        return response
+                    body = response.get_data()
+                    etag = hashlib.blake2b(body, digest_size=16).hexdigest()
+                    self._store(namespace, key, (etag, response.mimetype, body), ttl, version)
+                    response.headers['X-Cache'] = 'MISS'
+
+                response.set_etag(etag)
+                response.headers['Cache-Control'] = 'no-cache'
+                response.make_conditional(request)
+                if response.status_code == 304:
+                    self._count(namespace, 'not_modified')
+                return response
+            return wrapper
+        return decorator
+
+def create_response_cache(backend):
+    """Criar o cache configurado ('memory' ou 'redis')"""
+    if backend == 'redis':
+        return ResponseCache(RedisCacheBackend(os.environ['REDIS_URL']))
+    if backend == 'memory':
+        if config.web_workers() > 1:
+            logger.warning('CACHE_BACKEND=memory com %d workers: invalidações só valem no próprio '
+                           'worker e os outros servem respostas velhas até o TTL; use redis',
+                           config.web_workers())
+        return ResponseCache(MemoryCacheBackend(int(os.environ.get('CACHE_MAX_ENTRIES', 1024))))
+    raise ValueError(f'CACHE_BACKEND inválido: {backend}')
+
+response_cache = create_response_cache(config.cache_backend())
+cached = response_cache.cached
@@ -0,0 +1,88 @@
+"""
+Configuração do banco de dados e do pool de conexões
+Todos os parâmetros podem ser ajustados por variáveis de ambiente
+"""
+
+import os
+
+def _env_int(name, default):
+    return int(os.environ.get(name, default))
+
+def _env_bool(name, default):
+    return os.environ.get(name, str(default)).lower() in ('1', 'true', 'yes', 'on')
+
+def database_uri():
+    """URL do banco; sem DATABASE_URL usa SQLite em memória (desenvolvimento)"""
+    url = os.environ.get('DATABASE_URL')
+    if not url:
+        return 'sqlite:///:memory:'
+    # Railway/Heroku ainda fornecem o esquema antigo "postgres://"
+    if url.startswith('postgres://'):
+        url = 'postgresql://' + url[len('postgres://'):]
+    return url
+
+def engine_options(uri):
+    """
+    Opções do pool do SQLAlchemy
+
+    Cada worker do gunicorn mantém o próprio pool, então o total de conexões
+    abertas é workers x (DB_POOL_SIZE + DB_MAX_OVERFLOW) por réplica.
+    """
+    options = {'pool_pre_ping': _env_bool('DB_POOL_PRE_PING', True)}
+
+    # SQLite usa pools próprios (StaticPool/SingletonThreadPool) sem esses parâmetros
+    if uri.startswith('sqlite'):
+        return options
+
+    options.update({
+        'pool_size': _env_int('DB_POOL_SIZE', 5),
+        'max_overflow': _env_int('DB_MAX_OVERFLOW', 10),
+        'pool_timeout': _env_int('DB_POOL_TIMEOUT', 30),
+        'pool_recycle': _env_int('DB_POOL_RECYCLE', 1800),
+    })
+    return options
+
+def store_backend():
+    """Backend das rotas /api: 'sql' quando há DATABASE_URL, senão 'memory'"""
+    default = 'sql' if os.environ.get('DATABASE_URL') else 'memory'
+    return os.environ.get('STORE_BACKEND', default)
+
+def events_backend():
+    """Pub/sub dos eventos em tempo real: 'redis' quando há REDIS_URL, senão 'memory'"""
+    default = 'redis' if os.environ.get('REDIS_URL') else 'memory'
+    return os.environ.get('EVENTS_BACKEND', default)
+
+def cache_backend():
+    """Cache de respostas: 'redis' quando há REDIS_URL, senão 'memory'"""
+    default = 'redis' if os.environ.get('REDIS_URL') else 'memory'
+    return os.environ.get('CACHE_BACKEND', default)
+
+def debug_enabled():
+    """Modo debug do servidor de desenvolvimento (FLASK_DEBUG), desligado por padrão"""
+    return _env_bool('FLASK_DEBUG', False)
+
+def reaper_enabled():
+    """Expirar apostas paradas numa thread do próprio processo (REAPER_ENABLED)"""
+    return _env_bool('REAPER_ENABLED', False)
+
+def request_threads():
+    """Threads que atendem requisições em cada worker (GUNICORN_THREADS ou ASGI_THREADS)"""
+    if os.environ.get('SERVER_MODE', 'wsgi').lower() == 'asgi':
+        return _env_int('ASGI_THREADS', 10)
+    return _env_int('GUNICORN_THREADS', 4)
+
+def events_max_subscribers():
+    """Conexões SSE por worker (EVENTS_MAX_SUBSCRIBERS); cada uma custa só uma fila no loop ASGI"""
+    return _env_int('EVENTS_MAX_SUBSCRIBERS', 1000)
+
+def password_hash_max_concurrent():
+    """Hashes de senha simultâneos por worker (PASSWORD_HASH_MAX_CONCURRENT); padrão todas as threads"""
+    return max(_env_int('PASSWORD_HASH_MAX_CONCURRENT', request_threads()), 1)
+
+def web_workers():
+    """Processos do gunicorn (WEB_CONCURRENCY, exportado pelo gunicorn.conf.py); 1 fora dele"""
+    return _env_int('WEB_CONCURRENCY', 1)
+
+def matchmaking_source():
+    """Origem das candidatas de /bets/match (MATCHMAKING_SOURCE): db ou queue (fila local, um worker só)"""
+    return os.environ.get('MATCHMAKING_SOURCE', 'db').lower()
@@ -0,0 +1,219 @@
+"""
+Eventos em tempo real de apostas e partidas (entregues via SSE em /api/events)
+
+O SSE de produção é servido pelo loop de eventos do modo ASGI (src/asgi.py):
+uma conexão aberta é só uma corrotina esperando a fila, sem prender thread
+do pool que atende a API.
+
+- EventBus: fan-out local; cada assinante tem uma fila limitada e, se ficar
+  para trás, perde os eventos mais antigos e recebe um 'resync' para recarregar
+  o estado pelas rotas normais. Quem publica nunca bloqueia.
+- RedisEventBus: publica no canal do Redis e uma thread por processo repassa
+  o que chega para o fan-out local, de modo que todos os workers e réplicas
+  recebem os eventos uns dos outros.
+
+O backend vem de config.events_backend() (EVENTS_BACKEND / REDIS_URL).
+"""
+
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from collections import namedtuple
+
+from src import config
+from src.serialization import dumps
+
+logger = logging.getLogger(__name__)
+
+# data já serializado: o JSON é gerado uma vez por evento, não por assinante
+Event = namedtuple('Event', 'id type audience data')
+
+RESYNC = Event(None, 'resync', None, '{}')
+
+class TooManySubscribers(Exception):
+    """Limite de conexões de eventos atingido neste processo"""
+
+class Subscription:
+    """Fila de eventos de um cliente conectado"""
+
+    def __init__(self, bus, user_id, types, maxsize, notify=None):
+        self._bus = bus
+        self._queue = queue.Queue(maxsize)
+        # Chamado (na thread de quem publica) a cada evento enfileirado; usado pelo SSE assíncrono
+        self._notify = notify
+        self.user_id = user_id
+        self.types = frozenset(types) if types else None
+        self.lagged = False
+        self.dropped = 0
+
+    def wants(self, event):
+        if self.types is not None and event.type not in self.types:
+            return False
+        return event.audience is None or self.user_id in event.audience
+
+    def offer(self, event):
+        """Enfileirar sem bloquear; com a fila cheia descarta o evento mais antigo"""
+        while True:
+            try:
+                self._queue.put_nowait(event)
+                break
+            except queue.Full:
+                try:
+                    self._queue.get_nowait()
+                except queue.Empty:
+                    pass
+                self.lagged = True
+                self.dropped += 1
+        if self._notify is not None:
+            self._notify()
+
+    def get_nowait(self):
+        """Como get(), sem esperar: None se a fila estiver vazia"""
+        if self.lagged:
+            self.lagged = False
+            return RESYNC
+        try:
+            return self._queue.get_nowait()
+        except queue.Empty:
+            return None
+
+    def get(self, timeout):
+        """Próximo evento, RESYNC se houve descarte, ou None após o timeout"""
+        if self.lagged:
+            self.lagged = False
+            return RESYNC
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def close(self):
+        self._bus.unsubscribe(self)
+
+class EventBus:
+    """Pub/sub em memória com uma fila limitada por assinante"""
+
+    backend = 'memory'
+
+    def __init__(self, queue_size=100, max_subscribers=1000):
+        self.queue_size = queue_size
+        self.max_subscribers = max_subscribers
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._next_id = 0
+        self.published = 0
+        self.dropped = 0
+
+    def subscribe(self, user_id=None, types=None, notify=None):
+        subscription = Subscription(self, user_id, types, self.queue_size, notify)
+        with self._lock:
+            if len(self._subscribers) >= self.max_subscribers:
+                raise TooManySubscribers()
+            self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            if subscription in self._subscribers:
+                self._subscribers.discard(subscription)
+                self.dropped += subscription.dropped
+
+    def publish(self, event_type, data, audience=None):
+        """
+        Publicar um evento; audience limita a entrega a esses user_ids.
+        Falhas são só registradas: o evento nunca derruba a escrita que o gerou.
+        """
+        try:
+            self._publish(event_type, dumps(data), audience)
+        except Exception:
+            logger.exception('Falha ao publicar evento %s', event_type)
+
+    def _publish(self, event_type, payload, audience):
+        self._dispatch(event_type, payload, audience)
+
+    def _dispatch(self, event_type, payload, audience):
+        with self._lock:
+            self._next_id += 1
+            self.published += 1
+            event = Event(self._next_id, event_type,
+                          frozenset(audience) if audience else None, payload)
+            subscribers = list(self._subscribers)
+        for subscription in subscribers:
+            if subscription.wants(event):
+                subscription.offer(event)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'backend': self.backend,
+                'subscribers': len(self._subscribers),
+                'published': self.published,
+                'dropped': self.dropped + sum(s.dropped for s in self._subscribers)
+            }
+
+class RedisEventBus(EventBus):
+    """Eventos compartilhados entre processos pelo pub/sub do Redis"""
+
+    backend = 'redis'
+
+    def __init__(self, url, channel='sinuca:events', **kwargs):
+        import redis  # dependência só necessária com EVENTS_BACKEND=redis
+
+        super().__init__(**kwargs)
+        self._redis = redis.Redis.from_url(url)
+        self._errors = redis.RedisError
+        self.channel = channel
+        self._listener = None
+
+    def subscribe(self, user_id=None, types=None, notify=None):
+        # A thread só sobe no primeiro assinante (depois do fork do gunicorn)
+        self._ensure_listener()
+        return super().subscribe(user_id, types, notify)
+
+    def _publish(self, event_type, payload, audience):
+        message = json.dumps({
+            'type': event_type,
+            'audience': sorted(audience) if audience else None,
+            'data': payload
+        })
+        try:
+            self._redis.publish(self.channel, message)
+        except self._errors:
+            # Sem Redis ao menos os clientes deste processo recebem o evento
+            logger.exception('Redis indisponível; evento %s entregue só localmente', event_type)
+            self._dispatch(event_type, payload, audience)
+
+    def _ensure_listener(self):
+        with self._lock:
+            if self._listener is None or not self._listener.is_alive():
+                self._listener = threading.Thread(target=self._listen, name='event-bus-redis', daemon=True)
+                self._listener.start()
+
+    def _listen(self):
+        while True:
+            try:
+                pubsub = self._redis.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(self.channel)
+                for message in pubsub.listen():
+                    event = json.loads(message['data'])
+                    self._dispatch(event['type'], event['data'], event['audience'])
+            except self._errors:
+                logger.exception('Conexão de eventos com o Redis caiu; reconectando')
+                time.sleep(1)
+
+def create_event_bus(backend):
+    """Criar o barramento configurado ('memory' ou 'redis')"""
+    options = {
+        'queue_size': int(os.environ.get('EVENTS_QUEUE_SIZE', 100)),
+        'max_subscribers': config.events_max_subscribers()
+    }
+    if backend == 'redis':
+        return RedisEventBus(os.environ['REDIS_URL'], **options)
+    if backend == 'memory':
+        return EventBus(**options)
+    raise ValueError(f'EVENTS_BACKEND inválido: {backend}')
+
+event_bus = create_event_bus(config.events_backend())
@@ -0,0 +1,152 @@
+"""
+Idempotency-Key para rotas que movimentam dinheiro
+
+Fluxo de uma requisição com o cabeçalho Idempotency-Key:
+
+1. Reivindica a chave com um INSERT (status processing, claimed_at) em
+   transação própria; o índice único (scope, key) decide numa ida ao banco
+   quem processa quando duas cópias chegam juntas
+2. Quem perde lê o registro existente: resposta gravada é reenviada sem tocar
+   na carteira; ainda em processamento devolve 409
+3. Quem vence executa a rota e grava status + corpo da resposta; respostas 5xx
+   liberam a chave para o cliente tentar de novo
+
+Se o processo morrer depois do passo 1 a chave fica em processing: passado
+IDEMPOTENCY_LEASE_SECONDS (padrão 60, acima do timeout do gunicorn) desde
+claimed_at, uma retentativa assume o registro com um UPDATE condicional.
+
+O escopo é a rota mais o usuário do token (require_auth vem antes), então
+usuários diferentes podem gerar a mesma chave. A mesma chave com outro corpo
+ou caminho devolve 422. Registros valem IDEMPOTENCY_TTL_HOURS (padrão 24) e
+são apagados por purge_expired().
+"""
+
+import hashlib
+import os
+from datetime import datetime, timedelta
+from functools import wraps
+
+from flask import current_app, g, jsonify, request
+from sqlalchemy import delete, or_, update
+from sqlalchemy.exc import IntegrityError
+
+from src.models.betting import db, IdempotencyKey
+
+HEADER = 'Idempotency-Key'
+MAX_KEY_LENGTH = 255
+TTL = timedelta(hours=int(os.environ.get('IDEMPOTENCY_TTL_HOURS', 24)))
+LEASE = timedelta(seconds=int(os.environ.get('IDEMPOTENCY_LEASE_SECONDS', 60)))
+
+def _scope():
+    user_id = getattr(g, 'user_id', None)
+    return f'{request.endpoint}:{user_id}' if user_id else request.endpoint
+
+def _fingerprint():
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(f'{request.method} {request.path}\n'.encode())
+    digest.update(request.get_data())
+    return digest.hexdigest()
+
+def _claim(scope, key, fingerprint):
+    """
+    Tentar reivindicar a chave; devolve (claimed_at, None) se esta requisição
+    processa ou (None, registro) se outra requisição já tem a chave
+    """
+    while True:
+        now = datetime.utcnow()
+        try:
+            # Chave expirada pode ser reutilizada
+            db.session.execute(
+                delete(IdempotencyKey)
+                .where(IdempotencyKey.scope == scope, IdempotencyKey.key == key,
+                       IdempotencyKey.expires_at < now)
+            )
+            db.session.add(IdempotencyKey(scope=scope, key=key, fingerprint=fingerprint,
+                                          created_at=now, claimed_at=now, expires_at=now + TTL))
+            db.session.commit()
+            return now, None
+        except IntegrityError:
+            db.session.rollback()
+        if _take_over(scope, key, fingerprint, now):
+            return now, None
+        existing = IdempotencyKey.query.filter_by(scope=scope, key=key).first()
+        if existing is not None:
+            return None, existing
+        # A outra requisição falhou (5xx) e liberou a chave: tentar de novo
+
+def _take_over(scope, key, fingerprint, now):
+    """Assumir uma chave em processing com lease vencido (requisição que morreu no meio)"""
+    taken = db.session.execute(
+        update(IdempotencyKey)
+        .where(IdempotencyKey.scope == scope, IdempotencyKey.key == key,
+               IdempotencyKey.fingerprint == fingerprint,
+               IdempotencyKey.status == 'processing',
+               or_(IdempotencyKey.claimed_at.is_(None), IdempotencyKey.claimed_at < now - LEASE))
+        .values(claimed_at=now)
+    )
+    db.session.commit()
+    return taken.rowcount == 1
+
+def _replay(record, fingerprint):
+    if record.fingerprint != fingerprint:
+        return jsonify({'error': f'{HEADER} já usado com outra requisição'}), 422
+    if record.status != 'completed':
+        response = jsonify({'error': 'Requisição com esta chave ainda em processamento'})
+        response.headers['Retry-After'] = '1'
+        return response, 409
+    response = current_app.response_class(record.response_body, status=record.response_status,
+                                          mimetype='application/json')
+    response.headers['Idempotent-Replayed'] = 'true'
+    return response
+
+def _finish(scope, key, claimed_at, response):
+    db.session.rollback()  # descarta o que a rota tenha deixado pendente na sessão
+    # Só o dono do lease atual grava: se outra retentativa assumiu a chave, ela decide
+    where = (IdempotencyKey.scope == scope, IdempotencyKey.key == key,
+             IdempotencyKey.claimed_at == claimed_at)
+    if response.status_code >= 500:
+        db.session.execute(delete(IdempotencyKey).where(*where))
+    else:
+        db.session.execute(
+            update(IdempotencyKey).where(*where)
+            .values(status='completed', response_status=response.status_code,
+                    response_body=response.get_data())
+        )
+    db.session.commit()
+
+def idempotent(view):
+    """Decorador de rota: retentativas com o mesmo Idempotency-Key recebem a resposta original"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        key = request.headers.get(HEADER)
+        if not key:
+            return view(*args, **kwargs)
+        if len(key) > MAX_KEY_LENGTH:
+            return jsonify({'error': f'{HEADER} deve ter no máximo {MAX_KEY_LENGTH} caracteres'}), 400
+        
+        scope = _scope()
+        fingerprint = _fingerprint()
+        claimed_at, existing = _claim(scope, key, fingerprint)
+        if existing is not None:
+            return _replay(existing, fingerprint)
+        
+        try:
+            response = current_app.make_response(view(*args, **kwargs))
+        except Exception:
+            _finish(scope, key, claimed_at, current_app.response_class(status=500))
+            raise
+        _finish(scope, key, claimed_at, response)
+        return response
+    return wrapper
+
+def purge_expired(batch_size=1000):
+    """Apagar registros vencidos em lotes; retorna quantos foram removidos"""
+    removed = 0
+    while True:
+        ids = [row.id for row in db.session.query(IdempotencyKey.id)
+               .filter(IdempotencyKey.expires_at < datetime.utcnow()).limit(batch_size)]
+        if not ids:
+            return removed
+        db.session.execute(delete(IdempotencyKey).where(IdempotencyKey.id.in_(ids)))
+        db.session.commit()
+        removed += len(ids)
@@ -5,51 +5,194 @@ Inclui todas as rotas necessárias para funcionamento completo
 """
 
 import os
-import hashlib
-import jwt
+import sys
 import json
-from datetime import datetime, timedelta
-from flask import Flask, request, jsonify
+import time
+import click
+from datetime import datetime
+from flask import Flask, Response, request, jsonify, g
 from flask_cors import CORS
 
+# Permite rodar tanto com "python src/main.py" quanto com "gunicorn src.main:app"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src import config, idempotency, migrations
+from src.auth import generate_token, require_auth, token_cache
+from src.cache import cached, response_cache
+from src.events import event_bus
+from src.metrics import metrics
+from src.query_guard import query_guard
+from src.passwords import password_hasher, HashingBusy
+from src.serialization import FastJSONProvider
+from src.models.betting import db
+from src.routes.betting import betting_bp
+from src.routes.events import events_bp
+from src.routes.export import export_bp
+from src.services import export, rating, reaper, revenue, settlement
+from src.storage import create_store, DuplicateUser, GameAlreadyFinished
+from src.utils import parse_date
+
 # Configuração da aplicação
 app = Flask(__name__)
+app.json = FastJSONProvider(app)
 CORS(app, origins=["*"])
+metrics.init_app(app)
+query_guard.init_app(app)
 
 # Configurações
-SECRET_KEY = os.environ.get('SECRET_KEY', 'sinuca-real-secret-key-2024')
 DATABASE_URL = os.environ.get('DATABASE_URL')
 
-# Simulação de banco de dados em memória (para desenvolvimento)
-# Em produção, usar PostgreSQL com DATABASE_URL
-users_db = {}
-games_db = {}
-rankings_db = []
+# Banco de dados (pool configurável por variáveis de ambiente, ver src/config.py)
+app.config['SQLALCHEMY_DATABASE_URI'] = config.database_uri()
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = config.engine_options(app.config['SQLALCHEMY_DATABASE_URI'])
+app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+db.init_app(app)
+
+with app.app_context():
+    db.create_all()
+    migrations.upgrade()
+
+@app.cli.command('db-upgrade')
+def db_upgrade():
+    """Aplicar migrações pendentes do banco"""
+    applied = migrations.upgrade()
+    print(f'Migrações aplicadas: {applied}' if applied else 'Banco já está atualizado')
+
+@app.cli.command('backfill-revenue')
+def backfill_revenue():
+    """Recalcular os totais diários de receita (platform_stats)"""
+    days = revenue.backfill()
+    print(f'Totais recalculados para {days} dia(s)')
+
+@app.cli.command('purge-idempotency-keys')
+def purge_idempotency_keys():
+    """Apagar registros de Idempotency-Key vencidos"""
+    print(f'{idempotency.purge_expired()} registro(s) removido(s)')
+
+@app.cli.command('reap-bets')
+@click.option('--loop', is_flag=True, help='Continuar rodando como worker (a cada REAPER_INTERVAL_SECONDS)')
+@click.option('--batch-size', type=click.IntRange(1, 1000), default=reaper.BATCH_SIZE)
+def reap_bets(loop, batch_size):
+    """Cancelar e reembolsar apostas pendentes/ativas vencidas"""
+    while True:
+        counts = reaper.reap_once(batch_size=batch_size)
+        print(f"{counts['pending']} pendente(s) e {counts['active']} ativa(s) canceladas, "
+              f"{counts['idempotency_keys']} Idempotency-Key(s) removida(s)", flush=True)
+        if not loop:
+            return
+        time.sleep(reaper.INTERVAL_SECONDS)
+
+@app.cli.command('recalc-ratings')
+@click.option('--since', type=click.DateTime(), help='Início da temporada (apostas finalizadas a partir desta data)')
+@click.option('--dry-run', is_flag=True, help='Calcular sem gravar')
+@click.option('--check', is_flag=True, help='Só conferir se o replay reproduz os ratings gravados')
+def recalc_ratings(since, dry_run, check):
+    """Recalcular skill_rating reprocessando o histórico de apostas"""
+    start = datetime.utcnow()
+    if check:
+        result = rating.verify_ratings(since=since)
+        for mismatch in result['mismatches']:
+            print(f"{mismatch['user_id']}: gravado {mismatch['stored']}, replay {mismatch['replayed']}")
+        print(f"{result['bets']} apostas, {result['players']} jogadores, "
+              f"{result['mismatched']} divergente(s)")
+        if result['mismatched']:
+            sys.exit(1)
+        return
+    result = rating.recalculate_ratings(since=since, dry_run=dry_run)
+    elapsed = (datetime.utcnow() - start).total_seconds()
+    print(f"{result['bets']} apostas, {result['players']} jogadores em {elapsed:.2f}s"
+          + (' (dry-run)' if dry_run else ''))
+
+@app.cli.command('settle-bets')
+@click.argument('results', type=click.File('r', encoding='utf-8'))
+@click.option('--batch-size', type=click.IntRange(1, settlement.MAX_BATCH_SIZE), default=200)
+def settle_bets(results, batch_size):
+    """Finalizar apostas em lote a partir de um NDJSON ({bet_id, winner_id, game_data} por linha)"""
+    settled = failed = 0
+    batch = []
+    
+    def flush():
+        nonlocal settled, failed
+        outcome = settlement.settle_batch(batch)
+        settlement.announce(outcome['settled'])
+        settled += len(outcome['settled'])
+        failed += len(outcome['errors'])
+        for error in outcome['errors']:
+            print(f"{error['bet_id']}: {error['error']}")
+        batch.clear()
+    
+    for line in results:
+        if line.strip():
+            batch.append(json.loads(line))
+            if len(batch) == batch_size:
+                flush()
+    if batch:
+        flush()
+    print(f'{settled} aposta(s) finalizada(s), {failed} com erro')
+
+@app.cli.command('export')
+@click.argument('kind', type=click.Choice(sorted(export.EXPORTS)))
+@click.option('--format', 'fmt', type=click.Choice(['ndjson', 'csv']), default='ndjson')
+@click.option('--from', 'start', type=click.DateTime(), help='Data inicial (inclusiva)')
+@click.option('--to', 'end', type=click.DateTime(), help='Data final (exclusiva)')
+@click.option('--output', type=click.File('w', encoding='utf-8'), default='-', help='Arquivo de saída (padrão: stdout)')
+def export_command(kind, fmt, start, end, output):
+    """Exportar apostas, transações ou receita em NDJSON/CSV"""
+    for chunk in export.stream(kind, fmt, start, end):
+        output.write(chunk)
+
+app.register_blueprint(betting_bp, url_prefix='/api')
+app.register_blueprint(export_bp, url_prefix='/api')
+app.register_blueprint(events_bp, url_prefix='/api')
+
+# Expiração de apostas no próprio processo; com vários nós é seguro, mas um worker dedicado basta
+if config.reaper_enabled():
+    reaper.Reaper(app).start()
+
+# Usuários, jogos e ranking: em memória (desenvolvimento) ou no banco (produção)
+store = create_store(config.store_backend())
+
+# Paginação do ranking
+RANKING_DEFAULT_PER_PAGE = 10
+RANKING_MAX_PER_PAGE = 100
+
+# Limite de score/balls_potted aceito ao finalizar um jogo (cabe nos INTEGER do banco)
+MAX_GAME_VALUE = 1_000_000
+
+# Histórico de partidas do perfil
+HISTORY_DEFAULT_LIMIT = 20
+HISTORY_DEFAULT_WINDOW = 10
+HISTORY_MAX_LIMIT = 100
 
 # Utilitários
 def hash_password(password):
-    """Hash da senha usando SHA256"""
-    return hashlib.sha256(password.encode()).hexdigest()
+    """Hash da senha com a KDF configurada (ver src/passwords.py)"""
+    return password_hasher.hash(password)
 
 def verify_password(password, hashed):
     """Verificar senha"""
-    return hash_password(password) == hashed
+    return password_hasher.verify(password, hashed)
 
-def generate_token(user_id):
-    """Gerar JWT token"""
-    payload = {
-        'user_id': user_id,
-        'exp': datetime.utcnow() + timedelta(hours=24)
-    }
-    return jwt.encode(payload, SECRET_KEY, algorithm='HS256')
+def busy_response():
+    """Resposta quando não houve vaga de hash de senha dentro do timeout"""
+    response = jsonify({'error': 'Servidor ocupado, tente novamente em instantes'})
+    response.headers['Retry-After'] = '1'
+    return response, 503
 
-def verify_token(token):
-    """Verificar JWT token"""
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=['HS256'])
-        return payload['user_id']
-    except:
-        return None
+def ranking_entry(user, position):
+    """Montar a linha do ranking de um jogador"""
+    win_rate = (user['games_won'] / user['games_played']) * 100
+    avg_score = user['total_score'] / user['games_played']
+
+    return {
+        'position': position,
+        'nome_usuario': user['nome_usuario'],
+        'games_played': user['games_played'],
+        'games_won': user['games_won'],
+        'win_rate': round(win_rate, 1),
+        'total_score': user['total_score'],
+        'avg_score': round(avg_score, 1)
+    }
 
 # ==================== ROTAS DE TESTE ====================
 
@@ -74,7 +217,9 @@ def test_api():
             '/api/auth/login',
             '/api/games',
             '/api/ranking',
-            '/api/profile'
+            '/api/ranking/me',
+            '/api/profile',
+            '/api/profile/history'
         ]
     })
 
@@ -96,25 +241,23 @@ def register():
         nome_usuario = data['nome_usuario']
         
         # Verificar se usuário já existe
-        if email in users_db:
+        if store.get_user_by_email(email):
             return jsonify({'error': 'Email já cadastrado'}), 400
         
-        if any(user['nome_usuario'] == nome_usuario for user in users_db.values()):
+        if store.get_user_by_username(nome_usuario):
             return jsonify({'error': 'Nome de usuário já existe'}), 400
         
         # Criar usuário
-        user_id = len(users_db) + 1
-        users_db[email] = {
-            'id': user_id,
-            'nome_completo': data['nome_completo'],
-            'nome_usuario': nome_usuario,
-            'email': email,
-            'senha': hash_password(data['senha']),
-            'created_at': datetime.utcnow().isoformat(),
-            'games_played': 0,
-            'games_won': 0,
-            'total_score': 0
-        }
+        try:
+            user = store.create_user(
+                nome_completo=data['nome_completo'],
+                nome_usuario=nome_usuario,
+                email=email,
+                password_hash=hash_password(data['senha'])
+            )
+        except DuplicateUser:
+            return jsonify({'error': 'Email ou nome de usuário já cadastrado'}), 400
+        user_id = user['id']
         
         # Gerar token
         token = generate_token(user_id)
@@ -130,6 +273,8 @@ def register():
             }
         }), 201
         
+    except HashingBusy:
+        return busy_response()
     except Exception as e:
         return jsonify({'error': f'Erro interno: {str(e)}'}), 500
 
@@ -146,10 +291,14 @@ def login():
             return jsonify({'error': 'Email e senha são obrigatórios'}), 400
         
         # Verificar usuário
-        user = users_db.get(email)
+        user = store.get_user_by_email(email)
         if not user or not verify_password(senha, user['senha']):
             return jsonify({'error': 'Email ou senha incorretos'}), 401
         
+        # Atualizar hashes antigos ou com custo desatualizado
+        if password_hasher.needs_rehash(user['senha']):
+            store.update_password(user['id'], hash_password(senha))
+        
         # Gerar token
         token = generate_token(user['id'])
         
@@ -164,22 +313,19 @@ def login():
             }
         })
         
+    except HashingBusy:
+        return busy_response()
     except Exception as e:
         return jsonify({'error': f'Erro interno: {str(e)}'}), 500
 
 # ==================== ROTAS DE JOGOS ====================
 
 @app.route('/api/games', methods=['GET'])
+@require_auth
+@cached('games', ttl=3600)
 def get_games():
     """Listar jogos disponíveis"""
     try:
-        # Verificar token
-        token = request.headers.get('Authorization', '').replace('Bearer ', '')
-        user_id = verify_token(token)
-        
-        if not user_id:
-            return jsonify({'error': 'Token inválido'}), 401
-        
         # Retornar jogos disponíveis
         available_games = [
             {
@@ -207,93 +353,58 @@ def get_games():
         return jsonify({'error': f'Erro interno: {str(e)}'}), 500
 
 @app.route('/api/games', methods=['POST'])
+@require_auth
 def create_game():
     """Criar novo jogo"""
     try:
-        # Verificar token
-        token = request.headers.get('Authorization', '').replace('Bearer ', '')
-        user_id = verify_token(token)
-        
-        if not user_id:
-            return jsonify({'error': 'Token inválido'}), 401
+        user_id = g.user_id
         
         data = request.get_json()
         game_type = data.get('type', 'classic')
         
         # Criar jogo
-        game_id = len(games_db) + 1
-        games_db[game_id] = {
-            'id': game_id,
-            'type': game_type,
-            'player_id': user_id,
-            'status': 'waiting',
-            'created_at': datetime.utcnow().isoformat(),
-            'score': 0,
-            'balls_potted': 0
-        }
+        game = store.create_game(user_id, game_type)
         
         return jsonify({
             'message': 'Jogo criado com sucesso!',
-            'game': games_db[game_id]
+            'game': game
         }), 201
         
     except Exception as e:
         return jsonify({'error': f'Erro interno: {str(e)}'}), 500
 
 @app.route('/api/games/<int:game_id>/finish', methods=['POST'])
+@require_auth
 def finish_game(game_id):
     """Finalizar jogo"""
     try:
-        # Verificar token
-        token = request.headers.get('Authorization', '').replace('Bearer ', '')
-        user_id = verify_token(token)
-        
-        if not user_id:
-            return jsonify({'error': 'Token inválido'}), 401
+        user_id = g.user_id
         
         # Verificar se jogo existe
-        game = games_db.get(game_id)
+        game = store.get_game(game_id)
         if not game:
             return jsonify({'error': 'Jogo não encontrado'}), 404
         
         if game['player_id'] != user_id:
             return jsonify({'error': 'Não autorizado'}), 403
         
-        data = request.get_json()
+        data = request.get_json() or {}
         score = data.get('score', 0)
         balls_potted = data.get('balls_potted', 0)
-        won = data.get('won', False)
-        
-        # Atualizar jogo
-        game['status'] = 'finished'
-        game['score'] = score
-        game['balls_potted'] = balls_potted
-        game['won'] = won
-        game['finished_at'] = datetime.utcnow().isoformat()
-        
-        # Atualizar estatísticas do usuário
-        user_email = None
-        for email, user in users_db.items():
-            if user['id'] == user_id:
-                user_email = email
-                break
-        
-        if user_email:
-            user = users_db[user_email]
-            user['games_played'] += 1
-            user['total_score'] += score
-            if won:
-                user['games_won'] += 1
-        
-        # Adicionar ao ranking
-        rankings_db.append({
-            'user_id': user_id,
-            'game_id': game_id,
-            'score': score,
-            'balls_potted': balls_potted,
-            'won': won,
-            'date': datetime.utcnow().isoformat()
-        })
+        won = bool(data.get('won', False))
+        
+        for field, value in (('score', score), ('balls_potted', balls_potted)):
+            if isinstance(value, bool) or not isinstance(value, int) or not 0 <= value <= MAX_GAME_VALUE:
+                return jsonify({'error': f'Campo {field} deve ser um inteiro entre 0 e {MAX_GAME_VALUE}'}), 400
+        
+        # Atualizar jogo, estatísticas do usuário e ranking
+        try:
+            game = store.finish_game(game_id, score, balls_potted, won)
+        except GameAlreadyFinished:
+            return jsonify({'error': 'Jogo já finalizado'}), 400
+        
+        response_cache.invalidate('ranking')
+        event_bus.publish('game.finished', game, audience=[user_id])
         
         return jsonify({
             'message': 'Jogo finalizado com sucesso!',
@@ -306,37 +417,53 @@ def finish_game(game_id):
 # ==================== ROTAS DE RANKING ====================
 
 @app.route('/api/ranking', methods=['GET'])
+@cached('ranking', ttl=30)
 def get_ranking():
     """Obter ranking dos jogadores"""
     try:
-        # Calcular ranking baseado nas estatísticas dos usuários
-        ranking = []
-        
-        for email, user in users_db.items():
-            if user['games_played'] > 0:
-                win_rate = (user['games_won'] / user['games_played']) * 100
-                avg_score = user['total_score'] / user['games_played']
-                
-                ranking.append({
-                    'position': 0,  # Será calculado depois
-                    'nome_usuario': user['nome_usuario'],
-                    'games_played': user['games_played'],
-                    'games_won': user['games_won'],
-                    'win_rate': round(win_rate, 1),
-                    'total_score': user['total_score'],
-                    'avg_score': round(avg_score, 1)
-                })
-        
-        # Ordenar por pontuação total (decrescente)
-        ranking.sort(key=lambda x: x['total_score'], reverse=True)
-        
-        # Adicionar posições
-        for i, player in enumerate(ranking):
-            player['position'] = i + 1
+        page = max(int(request.args.get('page', 1)), 1)
+        per_page = int(request.args.get('per_page', RANKING_DEFAULT_PER_PAGE))
+        per_page = min(max(per_page, 1), RANKING_MAX_PER_PAGE)
+        
+        # Ler apenas a fatia pedida do índice (sem varrer todos os usuários)
+        offset = (page - 1) * per_page
+        ranking = [
+            ranking_entry(user, offset + i + 1)
+            for i, user in enumerate(store.ranking_page(offset, per_page))
+        ]
+        
+        return jsonify({
+            'ranking': ranking,
+            'total_players': store.ranking_count(),
+            'page': page,
+            'per_page': per_page
+        })
+        
+    except ValueError:
+        return jsonify({'error': 'Parâmetros de paginação inválidos'}), 400
+    except Exception as e:
+        return jsonify({'error': f'Erro interno: {str(e)}'}), 500
+
+@app.route('/api/ranking/me', methods=['GET'])
+@require_auth
+def get_my_ranking():
+    """Obter a posição do usuário no ranking"""
+    try:
+        user_id = g.user_id
+        
+        position = store.ranking_position(user_id)
+        if position is None:
+            return jsonify({
+                'position': None,
+                'total_players': store.ranking_count()
+            })
+        
+        user = store.get_user_by_id(user_id)
         
         return jsonify({
-            'ranking': ranking[:10],  # Top 10
-            'total_players': len(ranking)
+            'position': position,
+            'total_players': store.ranking_count(),
+            'player': ranking_entry(user, position)
         })
         
     except Exception as e:
@@ -345,22 +472,14 @@ def get_ranking():
 # ==================== ROTAS DE PERFIL ====================
 
 @app.route('/api/profile', methods=['GET'])
+@require_auth
 def get_profile():
     """Obter perfil do usuário"""
     try:
-        # Verificar token
-        token = request.headers.get('Authorization', '').replace('Bearer ', '')
-        user_id = verify_token(token)
-        
-        if not user_id:
-            return jsonify({'error': 'Token inválido'}), 401
+        user_id = g.user_id
         
         # Encontrar usuário
-        user = None
-        for email, u in users_db.items():
-            if u['id'] == user_id:
-                user = u
-                break
+        user = store.get_user_by_id(user_id)
         
         if not user:
             return jsonify({'error': 'Usuário não encontrado'}), 404
@@ -384,7 +503,10 @@ def get_profile():
                 'games_won': user['games_won'],
                 'win_rate': round(win_rate, 1),
                 'total_score': user['total_score'],
-                'avg_score': round(avg_score, 1)
+                'avg_score': round(avg_score, 1),
+                'best_score': user['best_score'],
+                'current_win_streak': user['current_win_streak'],
+                'best_win_streak': user['best_win_streak']
             }
         }
         
@@ -393,6 +515,45 @@ def get_profile():
     except Exception as e:
         return jsonify({'error': f'Erro interno: {str(e)}'}), 500
 
+@app.route('/api/profile/history', methods=['GET'])
+@require_auth
+def get_profile_history():
+    """Últimas partidas do usuário (?limit, ?from/?to), média móvel (?window) e sequências"""
+    try:
+        user_id = g.user_id
+        
+        user = store.get_user_by_id(user_id)
+        if not user:
+            return jsonify({'error': 'Usuário não encontrado'}), 404
+        
+        try:
+            limit = min(max(int(request.args.get('limit', HISTORY_DEFAULT_LIMIT)), 1), HISTORY_MAX_LIMIT)
+            window = min(max(int(request.args.get('window', HISTORY_DEFAULT_WINDOW)), 1), HISTORY_MAX_LIMIT)
+            start = parse_date(request.args.get('from'))
+            end = parse_date(request.args.get('to'))
+        except ValueError:
+            return jsonify({'error': 'Parâmetros inválidos (limit/window inteiros, datas no formato ISO)'}), 400
+        
+        games = store.game_history(user_id, limit, start, end)
+        rolling_average = store.rolling_average(user_id, window)
+        
+        return jsonify({
+            'games': games,
+            'count': len(games),
+            'rolling_average': {
+                'window': window,
+                'score': round(rolling_average, 1) if rolling_average is not None else None
+            },
+            'streaks': {
+                'current': user['current_win_streak'],
+                'best': user['best_win_streak']
+            },
+            'best_score': user['best_score']
+        })
+        
+    except Exception as e:
+        return jsonify({'error': f'Erro interno: {str(e)}'}), 500
+
 # ==================== ROTAS DE SISTEMA ====================
 
 @app.route('/api/health', methods=['GET'])
@@ -402,25 +563,47 @@ def health_check():
         'status': 'healthy',
         'timestamp': datetime.utcnow().isoformat(),
         'database_url_configured': DATABASE_URL is not None,
-        'users_count': len(users_db),
-        'games_count': len(games_db),
-        'rankings_count': len(rankings_db)
+        'store_backend': config.store_backend(),
+        **store.stats(),
+        'token_cache': token_cache.stats(),
+        'events': event_bus.stats(),
+        'cache': response_cache.stats()
     })
 
+def cache_samples():
+    for namespace, counters in response_cache.stats()['namespaces'].items():
+        for field in ('hits', 'misses', 'not_modified'):
+            yield {'namespace': namespace, 'result': field}, counters[field]
+
+metrics.add_collector('response_cache_requests_total', 'Consultas ao cache de respostas por resultado',
+                      cache_samples, kind='counter')
+metrics.add_collector('response_cache_hit_ratio', 'Taxa de acerto do cache de respostas',
+                      lambda: [({}, response_cache.stats()['hit_ratio'])])
+metrics.add_collector('token_cache_hit_ratio', 'Taxa de acerto do cache de tokens JWT',
+                      lambda: [({}, token_cache.stats()['hit_ratio'])])
+metrics.add_collector('event_subscribers', 'Conexões SSE abertas neste processo',
+                      lambda: [({}, event_bus.stats()['subscribers'])])
+
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    """Métricas no formato texto do Prometheus"""
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
 # ==================== CONFIGURAÇÃO DO SERVIDOR ====================
 
 if __name__ == '__main__':
     print("🎱 Backend de Pagamentos Sinuca Real iniciado na porta 5001!")
     print(f"🔗 DATABASE_URL configurada: {DATABASE_URL is not None}")
-    print(f"🚀 Servidor rodando em modo {'produção' if not app.debug else 'desenvolvimento'}")
+    debug = config.debug_enabled()
+    print(f"🚀 Servidor rodando em modo {'desenvolvimento' if debug else 'produção'}")
     
-    # Configurar porta
+    # Servidor de desenvolvimento; em produção use "gunicorn -c gunicorn.conf.py"
     port = int(os.environ.get('PORT', 5001))
     
     # Rodar servidor
     app.run(
         host='0.0.0.0',
         port=port,
-        debug=True
+        debug=debug
     )
 
@@ -0,0 +1,174 @@
+"""
+Métricas de latência por rota e de consultas SQL, no formato texto do Prometheus
+
+- Histograma de latência e contagem de status por (método, rota); a rota é o
+  padrão do Flask (/api/bets/<bet_id>/accept), nunca a URL crua
+- Consultas SQL contadas e cronometradas pelos eventos do Engine e atribuídas
+  à requisição em andamento; acima de SLOW_QUERY_MS viram log de aviso
+- Custo por requisição: dois perf_counter, um bisect e um lock curto
+
+Os contadores são por processo: com vários workers cada scrape vê o worker
+que atendeu; agregue por instância no Prometheus.
+"""
+
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0)
+
+SLOW_QUERY_MS = float(os.environ.get('SLOW_QUERY_MS', 200))
+
+class Histogram:
+    """Histograma cumulativo de baldes fixos"""
+
+    __slots__ = ('buckets', 'counts', 'sum', 'count')
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def samples(self):
+        """(le, contagem acumulada) incluindo +Inf"""
+        total = 0
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            total += count
+            yield ('+Inf' if bound == float('inf') else repr(bound)), total
+
+class Metrics:
+    """Registro das métricas HTTP e SQL do processo"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latency = defaultdict(lambda: Histogram(LATENCY_BUCKETS))
+        self.statuses = defaultdict(int)
+        self.db_queries = defaultdict(int)
+        self.db_seconds = defaultdict(float)
+        self.query_latency = Histogram(QUERY_BUCKETS)
+        self.slow_queries = 0
+        self.collectors = []
+
+    def init_app(self, app):
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+
+    def add_collector(self, name, help_text, function, kind='gauge'):
+        """Valores lidos na hora do scrape: function() -> [(rótulos, valor), ...]"""
+        self.collectors.append((name, kind, help_text, function))
+
+    def _before_request(self):
+        # [início, consultas, segundos em SQL]: uma lista só no g, pouco acesso ao proxy
+        g.request_metrics = [time.perf_counter(), 0, 0.0]
+
+    def _after_request(self, response):
+        state = g.pop('request_metrics', None)
+        if state is None:
+            return response
+        start, queries, seconds = state
+        elapsed = time.perf_counter() - start
+        rule = request.url_rule
+        key = (request.method, rule.rule if rule is not None else 'unmatched')
+        with self._lock:
+            self.latency[key].observe(elapsed)
+            self.statuses[key + (response.status_code,)] += 1
+            if queries:
+                self.db_queries[key] += queries
+                self.db_seconds[key] += seconds
+        return response
+
+    def record_query(self, statement, elapsed):
+        state = g.get('request_metrics') if has_request_context() else None
+        if state is not None:
+            state[1] += 1
+            state[2] += elapsed
+        with self._lock:
+            self.query_latency.observe(elapsed)
+            if elapsed * 1000 >= SLOW_QUERY_MS:
+                self.slow_queries += 1
+                slow = True
+            else:
+                slow = False
+        if slow:
+            route = request.url_rule.rule if has_request_context() and request.url_rule else '-'
+            logger.warning('Consulta lenta (%.1f ms) em %s: %s', elapsed * 1000, route,
+                           ' '.join(statement.split())[:500])
+
+    def render(self):
+        """Texto de exposição do Prometheus (versão 0.0.4)"""
+        lines = []
+
+        def header(name, kind, help_text):
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+
+        with self._lock:
+            header('http_request_duration_seconds', 'histogram', 'Latência das requisições por rota')
+            for (method, route), histogram in sorted(self.latency.items()):
+                labels = f'method="{method}",route="{route}"'
+                for le, count in histogram.samples():
+                    lines.append(f'http_request_duration_seconds_bucket{{{labels},le="{le}"}} {count}')
+                lines.append(f'http_request_duration_seconds_sum{{{labels}}} {histogram.sum}')
+                lines.append(f'http_request_duration_seconds_count{{{labels}}} {histogram.count}')
+
+            header('http_requests_total', 'counter', 'Requisições por rota e status')
+            for (method, route, status), count in sorted(self.statuses.items()):
+                lines.append(f'http_requests_total{{method="{method}",route="{route}",status="{status}"}} {count}')
+
+            header('http_db_queries_total', 'counter', 'Consultas SQL executadas pelas requisições da rota')
+            for (method, route), count in sorted(self.db_queries.items()):
+                lines.append(f'http_db_queries_total{{method="{method}",route="{route}"}} {count}')
+
+            header('http_db_query_seconds_total', 'counter', 'Tempo em consultas SQL das requisições da rota')
+            for (method, route), seconds in sorted(self.db_seconds.items()):
+                lines.append(f'http_db_query_seconds_total{{method="{method}",route="{route}"}} {seconds}')
+
+            header('db_query_duration_seconds', 'histogram', 'Latência de cada consulta SQL')
+            for le, count in self.query_latency.samples():
+                lines.append(f'db_query_duration_seconds_bucket{{le="{le}"}} {count}')
+            lines.append(f'db_query_duration_seconds_sum {self.query_latency.sum}')
+            lines.append(f'db_query_duration_seconds_count {self.query_latency.count}')
+
+            header('db_slow_queries_total', 'counter', f'Consultas acima de {SLOW_QUERY_MS:g} ms')
+            lines.append(f'db_slow_queries_total {self.slow_queries}')
+
+        for name, kind, help_text, function in self.collectors:
+            header(name, kind, help_text)
+            for labels, value in function():
+                label_text = ','.join(f'{k}="{v}"' for k, v in labels.items())
+                lines.append(f'{name}{{{label_text}}} {value}' if label_text else f'{name} {value}')
+
+        return '\n'.join(lines) + '\n'
+
+metrics = Metrics()
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_start', []).append(time.perf_counter())
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info['query_start'].pop()
+    metrics.record_query(statement, elapsed)
+
+@event.listens_for(Engine, 'handle_error')
+def _handle_error(context):
+    # Consulta que falhou não passa pelo after_cursor_execute
+    if context.connection is not None and context.connection.info.get('query_start'):
+        context.connection.info['query_start'].pop()
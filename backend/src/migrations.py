@@ -0,0 +1,85 @@
+"""
+Migrações de esquema versionadas
+
+db.create_all() só cria tabelas que ainda não existem; colunas e índices novos
+em tabelas já criadas (bancos de produção) são aplicados por aqui. Cada
+migração roda uma única vez e fica registrada em schema_version.
+"""
+
+from datetime import datetime
+
+from sqlalchemy import inspect, text
+
+from src.models.betting import db, User, Bet, Transaction, PlatformRevenue, Game
+
+# Chave do advisory lock que serializa workers subindo ao mesmo tempo
+MIGRATION_LOCK_KEY = 7305001
+
+def _add_column(connection, table, column, ddl):
+    columns = {c['name'] for c in inspect(connection).get_columns(table)}
+    if column not in columns:
+        connection.execute(text(f'ALTER TABLE {table} ADD COLUMN {column} {ddl}'))
+
+def _create_indexes(connection, *models):
+    for model in models:
+        for index in model.__table__.indexes:
+            index.create(connection, checkfirst=True)
+
+def _users_profile_and_ranking(connection):
+    _add_column(connection, 'users', 'full_name', 'VARCHAR(255)')
+    _add_column(connection, 'users', 'total_score', 'INTEGER NOT NULL DEFAULT 0')
+    _create_indexes(connection, User)
+
+def _betting_query_indexes(connection):
+    _create_indexes(connection, Bet, Transaction, PlatformRevenue)
+
+def _expired_bet_indexes(connection):
+    _create_indexes(connection, Bet)
+
+def _game_history(connection):
+    _add_column(connection, 'users', 'best_score', 'INTEGER NOT NULL DEFAULT 0')
+    _add_column(connection, 'users', 'current_win_streak', 'INTEGER NOT NULL DEFAULT 0')
+    _add_column(connection, 'users', 'best_win_streak', 'INTEGER NOT NULL DEFAULT 0')
+    _create_indexes(connection, Game)
+
+def _pool_game_stats(connection):
+    # Contadores próprios das partidas de sinuca; total_games/games_won ficam só com as apostas
+    _add_column(connection, 'users', 'pool_games_played', 'INTEGER NOT NULL DEFAULT 0')
+    _add_column(connection, 'users', 'pool_games_won', 'INTEGER NOT NULL DEFAULT 0')
+
+def _idempotency_claim_lease(connection):
+    _add_column(connection, 'idempotency_keys', 'claimed_at', 'TIMESTAMP')
+
+MIGRATIONS = [
+    (1, 'colunas de perfil e ranking em users', _users_profile_and_ranking),
+    (2, 'índices de apostas pendentes, histórico de transações e receita', _betting_query_indexes),
+    (3, 'índice de apostas ativas por início (expiração)', _expired_bet_indexes),
+    (4, 'histórico de partidas por jogador e agregados de sequência', _game_history),
+    (5, 'colunas de estatísticas de sinuca em users', _pool_game_stats),
+    (6, 'início do processamento em idempotency_keys (lease)', _idempotency_claim_lease),
+]
+
+def upgrade():
+    """Aplicar as migrações pendentes; retorna as versões aplicadas"""
+    applied = []
+    with db.engine.begin() as connection:
+        if connection.dialect.name == 'postgresql':
+            connection.execute(text('SELECT pg_advisory_xact_lock(:key)'), {'key': MIGRATION_LOCK_KEY})
+
+        connection.execute(text(
+            'CREATE TABLE IF NOT EXISTS schema_version ('
+            'version INTEGER PRIMARY KEY, description VARCHAR(255), applied_at TIMESTAMP)'
+        ))
+        current = connection.execute(text('SELECT MAX(version) FROM schema_version')).scalar() or 0
+
+        for version, description, migrate in MIGRATIONS:
+            if version <= current:
+                continue
+            migrate(connection)
+            connection.execute(
+                text('INSERT INTO schema_version (version, description, applied_at) '
+                     'VALUES (:version, :description, :applied_at)'),
+                {'version': version, 'description': description, 'applied_at': datetime.utcnow()}
+            )
+            applied.append(version)
+    return applied
@@ -2,6 +2,7 @@ from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime
 import uuid
 from decimal import Decimal
+from src.serialization import compile_serializer
 
 db = SQLAlchemy()
 
@@ -10,6 +11,7 @@ class User(db.Model):
     
     id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
     username = db.Column(db.String(50), unique=True, nullable=False)
+    full_name = db.Column(db.String(255))
     email = db.Column(db.String(255), unique=True, nullable=False)
     password_hash = db.Column(db.String(255), nullable=False)
     wallet_balance = db.Column(db.Numeric(10, 2), default=0.00)
@@ -17,27 +19,33 @@ class User(db.Model):
     total_games = db.Column(db.Integer, default=0)
     games_won = db.Column(db.Integer, default=0)
     total_earnings = db.Column(db.Numeric(10, 2), default=0.00)
+    # Partidas de sinuca (/api/games); total_games/games_won acima são das apostas
+    pool_games_played = db.Column(db.Integer, default=0, nullable=False)
+    pool_games_won = db.Column(db.Integer, default=0, nullable=False)
+    total_score = db.Column(db.Integer, default=0, nullable=False)
+    # Agregados das partidas mantidos no finish_game (perfil sem varrer o histórico)
+    best_score = db.Column(db.Integer, default=0, nullable=False)
+    current_win_streak = db.Column(db.Integer, default=0, nullable=False)
+    best_win_streak = db.Column(db.Integer, default=0, nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
+    # Ranking: maior pontuação primeiro, empate por ordem de cadastro
+    __table_args__ = (
+        db.Index('ix_users_ranking', total_score.desc(), created_at),
+    )
+    
     # Relacionamentos
     bets_as_player1 = db.relationship('Bet', foreign_keys='Bet.player1_id', backref='player1')
     bets_as_player2 = db.relationship('Bet', foreign_keys='Bet.player2_id', backref='player2')
     transactions = db.relationship('Transaction', backref='user', lazy=True)
     
-    def to_dict(self):
-        return {
-            'id': self.id,
-            'username': self.username,
-            'email': self.email,
-            'wallet_balance': float(self.wallet_balance),
-            'skill_rating': self.skill_rating,
-            'total_games': self.total_games,
-            'games_won': self.games_won,
-            'win_rate': (self.games_won / self.total_games * 100) if self.total_games > 0 else 0,
-            'total_earnings': float(self.total_earnings),
-            'created_at': self.created_at.isoformat()
-        }
+    # Serializador pré-compilado; Decimal e datetime ficam com o provider JSON
+    to_dict = compile_serializer(
+        'id', 'username', 'email', 'wallet_balance', 'skill_rating',
+        'total_games', 'games_won', 'total_earnings', 'created_at',
+        win_rate=lambda u: (u.games_won / u.total_games * 100) if u.total_games > 0 else 0
+    )
 
 class Bet(db.Model):
     __tablename__ = 'bets'
@@ -50,11 +58,23 @@ class Bet(db.Model):
     total_prize = db.Column(db.Numeric(10, 2), nullable=False)
     winner_id = db.Column(db.String(36), db.ForeignKey('users.id'), nullable=True)
     status = db.Column(db.String(20), default='pending')  # pending, active, completed, cancelled
-    game_data = db.Column(db.Text)  # JSON com dados da partida
+    # JSON com dados da partida (sem as tacadas, que vão para match_replays); fora das listagens
+    game_data = db.deferred(db.Column(db.Text))
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     started_at = db.Column(db.DateTime)
     completed_at = db.Column(db.DateTime)
     
+    __table_args__ = (
+        # /bets/available: só pendentes, mais recentes primeiro, filtro por valor
+        db.Index('ix_bets_pending_created_amount', created_at.desc(), bet_amount,
+                 postgresql_where=db.text("status = 'pending'"),
+                 sqlite_where=db.text("status = 'pending'")),
+        db.Index('ix_bets_status_created', status, created_at),
+        db.Index('ix_bets_status_started', status, started_at),
+        db.Index('ix_bets_player1', player1_id),
+        db.Index('ix_bets_player2', player2_id),
+    )
+    
     # Relacionamentos
     winner = db.relationship('User', foreign_keys=[winner_id])
     transactions = db.relationship('Transaction', backref='bet', lazy=True)
@@ -65,27 +85,17 @@ class Bet(db.Model):
         self.platform_fee = total_bet * Decimal('0.05')
         self.total_prize = total_bet - self.platform_fee
         
-    def to_dict(self):
-        return {
-            'id': self.id,
-            'player1_id': self.player1_id,
-            'player2_id': self.player2_id,
-            'bet_amount': float(self.bet_amount),
-            'platform_fee': float(self.platform_fee),
-            'total_prize': float(self.total_prize),
-            'winner_id': self.winner_id,
-            'status': self.status,
-            'created_at': self.created_at.isoformat(),
-            'started_at': self.started_at.isoformat() if self.started_at else None,
-            'completed_at': self.completed_at.isoformat() if self.completed_at else None
-        }
+    to_dict = compile_serializer(
+        'id', 'player1_id', 'player2_id', 'bet_amount', 'platform_fee', 'total_prize',
+        'winner_id', 'status', 'created_at', 'started_at', 'completed_at'
+    )
 
 class Transaction(db.Model):
     __tablename__ = 'transactions'
     
     id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
     user_id = db.Column(db.String(36), db.ForeignKey('users.id'), nullable=False)
-    type = db.Column(db.String(20), nullable=False)  # deposit, withdrawal, bet_debit, bet_credit, platform_fee
+    type = db.Column(db.String(20), nullable=False)  # deposit, withdrawal, bet_debit, bet_credit, bet_refund, platform_fee
     amount = db.Column(db.Numeric(10, 2), nullable=False)
     bet_id = db.Column(db.String(36), db.ForeignKey('bets.id'), nullable=True)
     status = db.Column(db.String(20), default='pending')  # pending, completed, failed, cancelled
@@ -95,19 +105,15 @@ class Transaction(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     processed_at = db.Column(db.DateTime)
     
-    def to_dict(self):
-        return {
-            'id': self.id,
-            'user_id': self.user_id,
-            'type': self.type,
-            'amount': float(self.amount),
-            'bet_id': self.bet_id,
-            'status': self.status,
-            'payment_method': self.payment_method,
-            'description': self.description,
-            'created_at': self.created_at.isoformat(),
-            'processed_at': self.processed_at.isoformat() if self.processed_at else None
-        }
+    __table_args__ = (
+        # Histórico de transações do usuário, mais recentes primeiro
+        db.Index('ix_transactions_user_created', user_id, created_at.desc()),
+    )
+    
+    to_dict = compile_serializer(
+        'id', 'user_id', 'type', 'amount', 'bet_id', 'status', 'payment_method',
+        'description', 'created_at', 'processed_at'
+    )
 
 class EscrowAccount(db.Model):
     __tablename__ = 'escrow_accounts'
@@ -125,18 +131,10 @@ class EscrowAccount(db.Model):
     # Relacionamento
     bet = db.relationship('Bet', backref=db.backref('escrow_account', uselist=False))
     
-    def to_dict(self):
-        return {
-            'id': self.id,
-            'bet_id': self.bet_id,
-            'player1_amount': float(self.player1_amount),
-            'player2_amount': float(self.player2_amount),
-            'platform_fee': float(self.platform_fee),
-            'total_amount': float(self.total_amount),
-            'status': self.status,
-            'created_at': self.created_at.isoformat(),
-            'released_at': self.released_at.isoformat() if self.released_at else None
-        }
+    to_dict = compile_serializer(
+        'id', 'bet_id', 'player1_amount', 'player2_amount', 'platform_fee',
+        'total_amount', 'status', 'created_at', 'released_at'
+    )
 
 class PlatformRevenue(db.Model):
     __tablename__ = 'platform_revenue'
@@ -145,17 +143,88 @@ class PlatformRevenue(db.Model):
     bet_id = db.Column(db.String(36), db.ForeignKey('bets.id'), nullable=False)
     amount = db.Column(db.Numeric(10, 2), nullable=False)
     percentage = db.Column(db.Numeric(5, 2), default=5.00)  # 5%
-    date_collected = db.Column(db.DateTime, default=datetime.utcnow)
+    date_collected = db.Column(db.DateTime, default=datetime.utcnow, index=True)
     
     # Relacionamento
     bet = db.relationship('Bet', backref='platform_revenue')
     
+    to_dict = compile_serializer('id', 'bet_id', 'amount', 'percentage', 'date_collected')
+
+class PlatformStats(db.Model):
+    """Totais diários da plataforma, atualizados a cada aposta finalizada"""
+    __tablename__ = 'platform_stats'
+    
+    date = db.Column(db.Date, primary_key=True)
+    total_bets = db.Column(db.Integer, default=0, nullable=False)
+    total_volume = db.Column(db.Numeric(14, 2), default=0, nullable=False)
+    platform_revenue = db.Column(db.Numeric(14, 2), default=0, nullable=False)
+    active_users = db.Column(db.Integer, default=0)  # preenchido pelo init.sql, não mantido aqui
+    
+    to_dict = compile_serializer('date', 'total_bets', 'total_volume', 'platform_revenue')
+
+class Game(db.Model):
+    __tablename__ = 'games'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    player_id = db.Column(db.String(36), db.ForeignKey('users.id'), nullable=False, index=True)
+    type = db.Column(db.String(20), default='classic')
+    status = db.Column(db.String(20), default='waiting')  # waiting, finished
+    score = db.Column(db.Integer, default=0)
+    balls_potted = db.Column(db.Integer, default=0)
+    won = db.Column(db.Boolean)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    finished_at = db.Column(db.DateTime)
+    
+    # Histórico do jogador: últimas N, média móvel e período
+    __table_args__ = (
+        db.Index('ix_games_player_finished', player_id, finished_at),
+    )
+    
     def to_dict(self):
-        return {
+        data = {
             'id': self.id,
-            'bet_id': self.bet_id,
-            'amount': float(self.amount),
-            'percentage': float(self.percentage),
-            'date_collected': self.date_collected.isoformat()
+            'type': self.type,
+            'player_id': self.player_id,
+            'status': self.status,
+            'created_at': self.created_at.isoformat(),
+            'score': self.score,
+            'balls_potted': self.balls_potted
         }
+        if self.finished_at:
+            data['won'] = self.won
+            data['finished_at'] = self.finished_at.isoformat()
+        return data
+
+class IdempotencyKey(db.Model):
+    """Resposta já enviada para um Idempotency-Key (reenviada nas retentativas)"""
+    __tablename__ = 'idempotency_keys'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    scope = db.Column(db.String(100), nullable=False)  # endpoint do Flask + usuário do token
+    key = db.Column(db.String(255), nullable=False)
+    fingerprint = db.Column(db.String(32), nullable=False)  # hash de método + caminho + corpo
+    status = db.Column(db.String(20), default='processing', nullable=False)  # processing, completed
+    response_status = db.Column(db.Integer)
+    response_body = db.Column(db.LargeBinary)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    claimed_at = db.Column(db.DateTime)  # início do processamento atual (prazo do lease)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+    
+    __table_args__ = (
+        # Duas requisições simultâneas com a mesma chave: só um INSERT vence
+        db.UniqueConstraint('scope', 'key', name='uq_idempotency_scope_key'),
+    )
 
+class MatchReplay(db.Model):
+    """Tacadas da partida codificadas em colunas (src/services/replay.py), fora de bets"""
+    __tablename__ = 'match_replays'
+    
+    bet_id = db.Column(db.String(36), db.ForeignKey('bets.id'), primary_key=True)
+    format_version = db.Column(db.SmallInteger, nullable=False)
+    shot_count = db.Column(db.Integer, nullable=False)
+    stored_size = db.Column(db.Integer, nullable=False)  # bytes de data
+    # Só é lido quando o replay é pedido, nunca junto dos metadados
+    data = db.deferred(db.Column(db.LargeBinary, nullable=False))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    to_dict = compile_serializer('bet_id', 'format_version', 'shot_count', 'stored_size', 'created_at')
@@ -0,0 +1,136 @@
+"""
+Hash de senhas com KDF lenta (scrypt/PBKDF2), com limite de hashes simultâneos
+
+Formato armazenado (versionado pelo prefixo do algoritmo):
+    scrypt$<n>$<r>$<p>$<salt>$<hash>
+    pbkdf2_sha256$<iterações>$<salt>$<hash>
+Hashes antigos (SHA-256 hex sem salt) continuam aceitos e são refeitos no login.
+"""
+
+import base64
+import hashlib
+import hmac
+import os
+import secrets
+import threading
+
+from src import config
+
+SALT_BYTES = 16
+HASH_BYTES = 32
+
+class HashingBusy(Exception):
+    """Nenhuma vaga de hash liberada dentro do timeout; o cliente deve tentar novamente"""
+
+def _b64encode(raw):
+    return base64.b64encode(raw).decode('ascii').rstrip('=')
+
+def _b64decode(text):
+    return base64.b64decode(text + '=' * (-len(text) % 4))
+
+def _is_legacy(encoded):
+    return len(encoded) == 64 and '$' not in encoded
+
+class PasswordHasher:
+    """
+    Serviço de hash de senhas
+
+    A KDF roda na própria thread da requisição: scrypt e pbkdf2_hmac liberam
+    o GIL, então logins simultâneos já rodam em paralelo (um pool à parte não
+    acrescentaria concorrência, a requisição esperaria o resultado do mesmo
+    jeito). max_concurrent limita os hashes simultâneos (memória do scrypt);
+    quem passa do limite espera até timeout segundos por uma vaga e só então
+    recebe HashingBusy, então rajadas normais de login não viram 503.
+    """
+
+    def __init__(self, algorithm='scrypt', scrypt_n=2 ** 14, scrypt_r=8, scrypt_p=1,
+                 pbkdf2_iterations=600000, max_concurrent=4, timeout=10):
+        if algorithm not in ('scrypt', 'pbkdf2_sha256'):
+            raise ValueError(f'Algoritmo de hash inválido: {algorithm}')
+        self.algorithm = algorithm
+        self.scrypt_n = scrypt_n
+        self.scrypt_r = scrypt_r
+        self.scrypt_p = scrypt_p
+        self.pbkdf2_iterations = pbkdf2_iterations
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(max_concurrent)
+
+    # KDFs
+
+    def _scrypt(self, password, salt, n, r, p):
+        return hashlib.scrypt(password.encode(), salt=salt, n=n, r=r, p=p,
+                              maxmem=256 * n * r * p, dklen=HASH_BYTES)
+
+    def _pbkdf2(self, password, salt, iterations):
+        return hashlib.pbkdf2_hmac('sha256', password.encode(), salt, iterations, dklen=HASH_BYTES)
+
+    def _encode(self, password):
+        salt = secrets.token_bytes(SALT_BYTES)
+        if self.algorithm == 'scrypt':
+            n, r, p = self.scrypt_n, self.scrypt_r, self.scrypt_p
+            digest = self._scrypt(password, salt, n, r, p)
+            return f'scrypt${n}${r}${p}${_b64encode(salt)}${_b64encode(digest)}'
+
+        iterations = self.pbkdf2_iterations
+        digest = self._pbkdf2(password, salt, iterations)
+        return f'pbkdf2_sha256${iterations}${_b64encode(salt)}${_b64encode(digest)}'
+
+    def _check(self, password, encoded):
+        if _is_legacy(encoded):
+            digest = hashlib.sha256(password.encode()).hexdigest()
+            return hmac.compare_digest(digest, encoded)
+
+        algorithm, *params = encoded.split('$')
+        if algorithm == 'scrypt':
+            n, r, p, salt, expected = params
+            digest = self._scrypt(password, _b64decode(salt), int(n), int(r), int(p))
+        elif algorithm == 'pbkdf2_sha256':
+            iterations, salt, expected = params
+            digest = self._pbkdf2(password, _b64decode(salt), int(iterations))
+        else:
+            return False
+        return hmac.compare_digest(digest, _b64decode(expected))
+
+    def _run(self, fn, *args):
+        """Executar a KDF nesta thread, esperando uma vaga por até timeout segundos"""
+        if not self._slots.acquire(timeout=self.timeout):
+            raise HashingBusy()
+        try:
+            return fn(*args)
+        finally:
+            self._slots.release()
+
+    # API pública
+
+    def hash(self, password):
+        """Gerar hash no formato atual"""
+        return self._run(self._encode, password)
+
+    def verify(self, password, encoded):
+        """Verificar senha contra qualquer formato suportado"""
+        try:
+            return self._run(self._check, password, encoded)
+        except ValueError:
+            # Hash malformado
+            return False
+
+    def needs_rehash(self, encoded):
+        """O hash foi gerado com algoritmo ou custo diferente do atual?"""
+        if _is_legacy(encoded):
+            return True
+        algorithm, *params = encoded.split('$')
+        if algorithm != self.algorithm:
+            return True
+        if algorithm == 'scrypt':
+            return params[:3] != [str(self.scrypt_n), str(self.scrypt_r), str(self.scrypt_p)]
+        return params[0] != str(self.pbkdf2_iterations)
+
+password_hasher = PasswordHasher(
+    algorithm=os.environ.get('PASSWORD_HASH_ALGORITHM', 'scrypt'),
+    scrypt_n=int(os.environ.get('SCRYPT_N', 2 ** 14)),
+    scrypt_r=int(os.environ.get('SCRYPT_R', 8)),
+    scrypt_p=int(os.environ.get('SCRYPT_P', 1)),
+    pbkdf2_iterations=int(os.environ.get('PBKDF2_ITERATIONS', 600000)),
+    max_concurrent=config.password_hash_max_concurrent(),
+    timeout=float(os.environ.get('PASSWORD_HASH_TIMEOUT', 10))
+)
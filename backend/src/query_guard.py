@@ -0,0 +1,72 @@
+"""
+Detector de N+1 por requisição
+
+Conta os SELECTs de cada requisição pelo texto SQL (os parâmetros ficam fora
+do texto, então "SELECT ... WHERE users.id = ?" repetido por linha aparece
+como o mesmo comando). Se algum se repetir N_PLUS_ONE_THRESHOLD vezes ou mais:
+
+- QUERY_GUARD=raise: a requisição falha com NPlusOneDetected (padrão quando
+  app.testing, para o teste quebrar em vez de a regressão passar despercebida)
+- QUERY_GUARD=warn: só registra no log
+- QUERY_GUARD=off: desligado (padrão fora de testes)
+"""
+
+import logging
+import os
+from collections import Counter
+
+from flask import current_app, g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+class NPlusOneDetected(AssertionError):
+    """Mesmo SELECT repetido várias vezes numa única requisição"""
+
+class QueryGuard:
+    def __init__(self, mode=None, threshold=5):
+        self.mode = mode
+        self.threshold = threshold
+
+    def init_app(self, app):
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+
+    def active_mode(self):
+        if self.mode:
+            return self.mode
+        return 'raise' if current_app.testing else 'off'
+
+    def _before_request(self):
+        if self.active_mode() != 'off':
+            g.select_statements = Counter()
+
+    def _after_request(self, response):
+        statements = g.pop('select_statements', None)
+        if not statements:
+            return response
+        statement, count = statements.most_common(1)[0]
+        if count < self.threshold:
+            return response
+
+        message = (f'N+1 em {request.method} {request.path}: {count}x '
+                   f'{" ".join(statement.split())[:300]}')
+        if self.active_mode() == 'raise':
+            raise NPlusOneDetected(message)
+        logger.warning(message)
+        return response
+
+    def record(self, statement):
+        statements = g.get('select_statements') if has_request_context() else None
+        if statements is not None and statement.lstrip()[:6].upper() == 'SELECT':
+            statements[statement] += 1
+
+query_guard = QueryGuard(
+    mode=os.environ.get('QUERY_GUARD'),
+    threshold=int(os.environ.get('N_PLUS_ONE_THRESHOLD', 5))
+)
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    query_guard.record(statement)
@@ -1,17 +1,55 @@
-from flask import Blueprint, request, jsonify
-from src.models.betting import db, User, Bet, Transaction, EscrowAccount, PlatformRevenue
+from flask import Blueprint, Response, g, request, jsonify
+from src.auth import require_auth, require_service_token
+from src.models.betting import db, User, Bet, Transaction, EscrowAccount, PlatformRevenue, PlatformStats, MatchReplay
+from src.serialization import compile_serializer
+from src.cache import cached, response_cache
+from src.events import event_bus
+from src.idempotency import idempotent
+from src.passwords import password_hasher, HashingBusy
+from src.services import ledger, matchmaking, rating, replay, revenue, settlement
+from src.services.ledger import InsufficientFunds
+from src.services.matchmaking import match_queue
+from sqlalchemy import insert, update
+from sqlalchemy.orm import joinedload, raiseload, undefer
 from decimal import Decimal
 from datetime import datetime
+import base64
 import json
 
 betting_bp = Blueprint('betting', __name__)
 
+# Limite de itens por página nas listagens
+MAX_PER_PAGE = 100
+
+# Resumo público do jogador exibido junto das apostas
+_player_summary = compile_serializer('id', 'username', 'skill_rating')
+
+def _forbidden():
+    return jsonify({'error': 'Não autorizado'}), 403
+
+def _is_caller(user_id):
+    """O usuário do token é o da requisição?"""
+    return str(g.user_id) == str(user_id)
+
+def _with_players(query):
+    """Jogadores 1 e 2 no mesmo SELECT (JOIN) e nenhum outro carregamento preguiçoso"""
+    player_columns = (User.id, User.username, User.skill_rating)
+    return query.options(
+        joinedload(Bet.player1).load_only(*player_columns),
+        joinedload(Bet.player2).load_only(*player_columns),
+        raiseload('*')
+    )
+
 @betting_bp.route('/users', methods=['POST'])
 def create_user():
     """Criar novo usuário"""
     try:
         data = request.get_json()
         
+        for field in ('username', 'email', 'password'):
+            if not data.get(field):
+                return jsonify({'error': f'Campo {field} é obrigatório'}), 400
+        
         # Verificar se usuário já existe
         existing_user = User.query.filter(
             (User.username == data['username']) | 
@@ -21,11 +59,11 @@ def create_user():
         if existing_user:
             return jsonify({'error': 'Usuário ou email já existe'}), 400
         
+        # Hash feito aqui; saldo começa em zero e só muda por depósito
         user = User(
             username=data['username'],
             email=data['email'],
-            password_hash=data['password_hash'],  # Em produção, usar hash seguro
-            wallet_balance=data.get('initial_balance', 0.00)
+            password_hash=password_hasher.hash(data['password'])
         )
         
         db.session.add(user)
@@ -36,14 +74,20 @@ def create_user():
             'user': user.to_dict()
         }), 201
         
+    except HashingBusy:
+        return jsonify({'error': 'Servidor ocupado, tente novamente em instantes'}), 503
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
 @betting_bp.route('/users/<user_id>/wallet', methods=['GET'])
+@require_auth
 def get_wallet_balance(user_id):
     """Obter saldo da carteira do usuário"""
     try:
+        if not _is_caller(user_id):
+            return _forbidden()
+        
         user = User.query.get_or_404(user_id)
         return jsonify({
             'user_id': user.id,
@@ -55,9 +99,14 @@ def get_wallet_balance(user_id):
         return jsonify({'error': str(e)}), 500
 
 @betting_bp.route('/users/<user_id>/deposit', methods=['POST'])
+@require_auth
+@idempotent
 def deposit_funds(user_id):
     """Depositar fundos na carteira do usuário"""
     try:
+        if not _is_caller(user_id):
+            return _forbidden()
+        
         data = request.get_json()
         amount = Decimal(str(data['amount']))
         payment_method = data.get('payment_method', 'pix')
@@ -67,28 +116,29 @@ def deposit_funds(user_id):
         
         user = User.query.get_or_404(user_id)
         
-        # Criar transação de depósito
-        transaction = Transaction(
-            user_id=user.id,
-            type='deposit',
-            amount=amount,
-            payment_method=payment_method,
-            status='completed',  # Em produção, seria 'pending' até confirmação do pagamento
-            description=f'Depósito via {payment_method}',
-            processed_at=datetime.utcnow()
-        )
-        
-        # Atualizar saldo do usuário
-        user.wallet_balance += amount
-        user.updated_at = datetime.utcnow()
-        
-        db.session.add(transaction)
-        db.session.commit()
+        def work():
+            # Criar transação de depósito
+            transaction = Transaction(
+                user_id=user.id,
+                type='deposit',
+                amount=amount,
+                payment_method=payment_method,
+                status='completed',  # Em produção, seria 'pending' até confirmação do pagamento
+                description=f'Depósito via {payment_method}',
+                processed_at=datetime.utcnow()
+            )
+            db.session.add(transaction)
+            
+            # Atualizar saldo do usuário (UPDATE atômico no banco)
+            new_balance = ledger.credit(user.id, amount)
+            return transaction, new_balance
+        
+        transaction, new_balance = ledger.run_transaction(work)
         
         return jsonify({
             'message': 'Depósito realizado com sucesso',
             'transaction': transaction.to_dict(),
-            'new_balance': float(user.wallet_balance)
+            'new_balance': float(new_balance)
         }), 200
         
     except Exception as e:
@@ -96,11 +146,15 @@ def deposit_funds(user_id):
         return jsonify({'error': str(e)}), 500
 
 @betting_bp.route('/bets', methods=['POST'])
+@require_auth
+@idempotent
 def create_bet():
-    """Criar nova aposta"""
+    """Criar nova aposta (jogador 1 é o usuário do token)"""
     try:
         data = request.get_json()
-        player1_id = data['player1_id']
+        player1_id = data.get('player1_id', g.user_id)
+        if not _is_caller(player1_id):
+            return _forbidden()
         bet_amount = Decimal(str(data['bet_amount']))
         
         if bet_amount <= 0:
@@ -108,54 +162,104 @@ def create_bet():
         
         player1 = User.query.get_or_404(player1_id)
         
-        # Verificar se o jogador tem saldo suficiente
-        if player1.wallet_balance < bet_amount:
-            return jsonify({'error': 'Saldo insuficiente'}), 400
-        
-        # Criar aposta
-        bet = Bet(
-            player1_id=player1_id,
-            bet_amount=bet_amount
-        )
-        
-        # Calcular taxas (assumindo que o oponente apostará o mesmo valor)
-        bet.calculate_fees()
-        
-        db.session.add(bet)
-        db.session.flush()  # Para obter o ID da aposta
-        
-        # Debitar valor da carteira do jogador 1
-        player1.wallet_balance -= bet_amount
-        
-        # Criar transação de débito
-        transaction = Transaction(
-            user_id=player1_id,
-            type='bet_debit',
-            amount=-bet_amount,
-            bet_id=bet.id,
-            status='completed',
-            description=f'Aposta criada - ID: {bet.id}',
-            processed_at=datetime.utcnow()
-        )
-        
-        db.session.add(transaction)
-        db.session.commit()
+        def work():
+            # Criar aposta
+            bet = Bet(
+                player1_id=player1_id,
+                bet_amount=bet_amount
+            )
+            
+            # Calcular taxas (assumindo que o oponente apostará o mesmo valor)
+            bet.calculate_fees()
+            
+            db.session.add(bet)
+            db.session.flush()  # Para obter o ID da aposta
+            
+            # Debitar valor da carteira do jogador 1 (falha se não houver saldo)
+            ledger.debit(player1_id, bet_amount)
+            
+            # Criar transação de débito
+            transaction = Transaction(
+                user_id=player1_id,
+                type='bet_debit',
+                amount=-bet_amount,
+                bet_id=bet.id,
+                status='completed',
+                description=f'Aposta criada - ID: {bet.id}',
+                processed_at=datetime.utcnow()
+            )
+            
+            db.session.add(transaction)
+            return bet
+        
+        bet = ledger.run_transaction(work)
+        
+        # Disponibilizar para pareamento
+        match_queue.add(bet.id, bet.bet_amount, player1_id, player1.skill_rating)
+        
+        bet_data = bet.to_dict()
+        response_cache.invalidate('bets')
+        event_bus.publish('bet.created', bet_data)
         
         return jsonify({
             'message': 'Aposta criada com sucesso',
-            'bet': bet.to_dict()
+            'bet': bet_data
         }), 201
         
+    except InsufficientFunds:
+        return jsonify({'error': 'Saldo insuficiente'}), 400
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
+def _claim_bet(bet, player2_id):
+    """Aceitar a aposta para o jogador 2 dentro da transação atual; None se já foi aceita"""
+    # Atualizar aposta somente se ainda estiver pendente (um único aceite vence)
+    claimed = db.session.execute(
+        update(Bet)
+        .where(Bet.id == bet.id, Bet.status == 'pending')
+        .values(player2_id=player2_id, status='active', started_at=datetime.utcnow())
+    )
+    if claimed.rowcount != 1:
+        return None
+    
+    # Debitar valor da carteira do jogador 2 (falha se não houver saldo)
+    ledger.debit(player2_id, bet.bet_amount)
+    
+    # Criar transação de débito para jogador 2
+    transaction = Transaction(
+        user_id=player2_id,
+        type='bet_debit',
+        amount=-bet.bet_amount,
+        bet_id=bet.id,
+        status='completed',
+        description=f'Aposta aceita - ID: {bet.id}',
+        processed_at=datetime.utcnow()
+    )
+    
+    # Criar conta de escrow
+    escrow = EscrowAccount(
+        bet_id=bet.id,
+        player1_amount=bet.bet_amount,
+        player2_amount=bet.bet_amount,
+        platform_fee=bet.platform_fee,
+        total_amount=bet.bet_amount * 2
+    )
+    
+    db.session.add(transaction)
+    db.session.add(escrow)
+    return escrow
+
 @betting_bp.route('/bets/<bet_id>/accept', methods=['POST'])
+@require_auth
+@idempotent
 def accept_bet(bet_id):
-    """Aceitar uma aposta existente"""
+    """Aceitar uma aposta existente (jogador 2 é o usuário do token)"""
     try:
-        data = request.get_json()
-        player2_id = data['player2_id']
+        data = request.get_json() or {}
+        player2_id = data.get('player2_id', g.user_id)
+        if not _is_caller(player2_id):
+            return _forbidden()
         
         bet = Bet.query.get_or_404(bet_id)
         
@@ -165,61 +269,115 @@ def accept_bet(bet_id):
         if bet.player1_id == player2_id:
             return jsonify({'error': 'Não é possível apostar contra si mesmo'}), 400
         
-        player2 = User.query.get_or_404(player2_id)
-        
-        # Verificar se o jogador 2 tem saldo suficiente
-        if player2.wallet_balance < bet.bet_amount:
-            return jsonify({'error': 'Saldo insuficiente'}), 400
-        
-        # Atualizar aposta
-        bet.player2_id = player2_id
-        bet.status = 'active'
-        bet.started_at = datetime.utcnow()
-        
-        # Debitar valor da carteira do jogador 2
-        player2.wallet_balance -= bet.bet_amount
-        
-        # Criar transação de débito para jogador 2
-        transaction = Transaction(
-            user_id=player2_id,
-            type='bet_debit',
-            amount=-bet.bet_amount,
-            bet_id=bet.id,
-            status='completed',
-            description=f'Aposta aceita - ID: {bet.id}',
-            processed_at=datetime.utcnow()
-        )
+        User.query.get_or_404(player2_id)
         
-        # Criar conta de escrow
-        escrow = EscrowAccount(
-            bet_id=bet.id,
-            player1_amount=bet.bet_amount,
-            player2_amount=bet.bet_amount,
-            platform_fee=bet.platform_fee,
-            total_amount=bet.bet_amount * 2
-        )
+        escrow = ledger.run_transaction(lambda: _claim_bet(bet, player2_id))
+        match_queue.remove(bet.id)
+        if escrow is None:
+            return jsonify({'error': 'Aposta não está disponível'}), 400
         
-        db.session.add(transaction)
-        db.session.add(escrow)
-        db.session.commit()
+        bet_data = bet.to_dict()
+        response_cache.invalidate('bets')
+        event_bus.publish('bet.accepted', bet_data)
         
         return jsonify({
             'message': 'Aposta aceita com sucesso',
-            'bet': bet.to_dict(),
+            'bet': bet_data,
             'escrow': escrow.to_dict()
         }), 200
         
+    except InsufficientFunds:
+        return jsonify({'error': 'Saldo insuficiente'}), 400
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+def _match_number(value):
+    """Número finito e não negativo do corpo de /bets/match; ValueError caso contrário"""
+    if isinstance(value, bool) or not isinstance(value, (int, float, str)):
+        raise ValueError(value)
+    try:
+        number = Decimal(str(value))
+    except ArithmeticError:
+        raise ValueError(value)
+    if not number.is_finite() or number < 0:
+        raise ValueError(value)
+    return number
+
+@betting_bp.route('/bets/match', methods=['POST'])
+@require_auth
+@idempotent
+def match_bet():
+    """Parear o jogador do token com a melhor aposta aberta e aceitá-la"""
+    try:
+        data = request.get_json() or {}
+        player_id = data.get('player_id', g.user_id)
+        if not _is_caller(player_id):
+            return _forbidden()
+        try:
+            min_amount = _match_number(data.get('min_amount', 0))
+            max_amount = _match_number(data.get('max_amount', 999999))
+            target = data.get('bet_amount')
+            if target is not None:
+                target = _match_number(target)
+            max_rating_diff = data.get('max_rating_diff')
+            if max_rating_diff is not None:
+                max_rating_diff = _match_number(max_rating_diff)
+        except ValueError:
+            return jsonify({'error': 'Parâmetros de pareamento inválidos'}), 400
+        
+        player = User.query.get_or_404(player_id)
+        
+        # Lotes na ordem de preferência até um aceite dar certo ou acabarem as candidatas
+        tried = set()
+        while True:
+            candidates = matchmaking.candidates(
+                player_id, min_amount, max_amount,
+                target=target,
+                skill_rating=player.skill_rating,
+                max_rating_diff=max_rating_diff,
+                exclude=tried
+            )
+            if not candidates:
+                return jsonify({'error': 'Nenhuma aposta disponível'}), 404
+            tried.update(candidates)
+            
+            # Lote carregado num único SELECT ... IN; as que já saíram de pending nem vão ao UPDATE
+            loaded = {b.id: b for b in Bet.query.filter(Bet.id.in_(candidates), Bet.status == 'pending')}
+            for bet_id in candidates:
+                bet = loaded.get(bet_id)
+                escrow = ledger.run_transaction(lambda: _claim_bet(bet, player_id)) if bet else None
+                # Aceita por nós ou já aceita por outra requisição: sai da fila nos dois casos
+                match_queue.remove(bet_id)
+                if escrow is not None:
+                    bet_data = bet.to_dict()
+                    response_cache.invalidate('bets')
+                    event_bus.publish('bet.accepted', bet_data)
+                    return jsonify({
+                        'message': 'Aposta pareada com sucesso',
+                        'bet': bet_data,
+                        'escrow': escrow.to_dict()
+                    }), 200
+        
+    except InsufficientFunds:
+        return jsonify({'error': 'Saldo insuficiente'}), 400
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
 @betting_bp.route('/bets/<bet_id>/complete', methods=['POST'])
+@require_service_token
 def complete_bet(bet_id):
-    """Finalizar aposta com resultado"""
+    """Finalizar aposta com resultado (servidor de partidas, SERVICE_API_TOKEN)"""
     try:
         data = request.get_json()
         winner_id = data['winner_id']
-        game_data = data.get('game_data', {})
+        
+        # Tacadas vão para match_replays; em bets fica só o resumo
+        try:
+            game_data, shots = replay.split_game_data(data.get('game_data', {}))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         
         bet = Bet.query.get_or_404(bet_id)
         
@@ -229,60 +387,92 @@ def complete_bet(bet_id):
         if winner_id not in [bet.player1_id, bet.player2_id]:
             return jsonify({'error': 'Vencedor inválido'}), 400
         
-        winner = User.query.get_or_404(winner_id)
         loser_id = bet.player1_id if winner_id == bet.player2_id else bet.player2_id
-        loser = User.query.get_or_404(loser_id)
-        
-        # Atualizar aposta
-        bet.winner_id = winner_id
-        bet.status = 'completed'
-        bet.completed_at = datetime.utcnow()
-        bet.game_data = json.dumps(game_data)
-        
-        # Liberar escrow
-        escrow = EscrowAccount.query.filter_by(bet_id=bet.id).first()
-        if escrow:
-            escrow.status = 'released'
-            escrow.released_at = datetime.utcnow()
-        
-        # Creditar prêmio para o vencedor
-        winner.wallet_balance += bet.total_prize
-        winner.games_won += 1
-        winner.total_games += 1
-        winner.total_earnings += bet.total_prize
-        
-        # Atualizar estatísticas do perdedor
-        loser.total_games += 1
-        
-        # Atualizar ratings (sistema ELO simplificado)
-        rating_change = 20  # Simplificado
-        winner.skill_rating += rating_change
-        loser.skill_rating -= rating_change
-        
-        # Criar transação de crédito para o vencedor
-        win_transaction = Transaction(
-            user_id=winner_id,
-            type='bet_credit',
-            amount=bet.total_prize,
-            bet_id=bet.id,
-            status='completed',
-            description=f'Vitória na aposta - ID: {bet.id}',
-            processed_at=datetime.utcnow()
-        )
         
-        # Registrar receita da plataforma
-        platform_revenue = PlatformRevenue(
-            bet_id=bet.id,
-            amount=bet.platform_fee
-        )
+        def work():
+            # Atualizar aposta somente se ainda estiver ativa (paga uma única vez)
+            completed = db.session.execute(
+                update(Bet)
+                .where(Bet.id == bet_id, Bet.status == 'active')
+                .values(winner_id=winner_id, status='completed',
+                        completed_at=datetime.utcnow(), game_data=game_data)
+            )
+            if completed.rowcount != 1:
+                return False
+            
+            if shots is not None:
+                db.session.execute(insert(MatchReplay), [replay.replay_row(bet_id, shots, datetime.utcnow())])
+            
+            # Liberar escrow
+            db.session.execute(
+                update(EscrowAccount)
+                .where(EscrowAccount.bet_id == bet.id, EscrowAccount.status == 'holding')
+                .values(status='released', released_at=datetime.utcnow())
+            )
+            
+            # Atualizar ratings (Elo com K conforme experiência e nível do jogador)
+            players = {u.id: u for u in User.query.filter(User.id.in_([winner_id, loser_id]))}
+            winner_delta, loser_delta = rating.elo_deltas(
+                players[winner_id].skill_rating, players[loser_id].skill_rating,
+                players[winner_id].total_games, players[loser_id].total_games
+            )
+            
+            # Carteiras atualizadas sempre na mesma ordem para evitar deadlock
+            for user_id in ledger.lock_order(winner_id, loser_id):
+                if user_id == winner_id:
+                    # Creditar prêmio para o vencedor
+                    ledger.credit(
+                        winner_id, bet.total_prize,
+                        games_won=User.games_won + 1,
+                        total_games=User.total_games + 1,
+                        total_earnings=User.total_earnings + bet.total_prize,
+                        skill_rating=User.skill_rating + winner_delta
+                    )
+                else:
+                    # Atualizar estatísticas do perdedor
+                    ledger.update_user(
+                        loser_id,
+                        total_games=User.total_games + 1,
+                        skill_rating=User.skill_rating + loser_delta
+                    )
+            
+            # Criar transação de crédito para o vencedor
+            win_transaction = Transaction(
+                user_id=winner_id,
+                type='bet_credit',
+                amount=bet.total_prize,
+                bet_id=bet.id,
+                status='completed',
+                description=f'Vitória na aposta - ID: {bet.id}',
+                processed_at=datetime.utcnow()
+            )
+            
+            # Registrar receita da plataforma
+            platform_revenue = PlatformRevenue(
+                bet_id=bet.id,
+                amount=bet.platform_fee
+            )
+            
+            db.session.add(win_transaction)
+            db.session.add(platform_revenue)
+            
+            # Somar ao total diário na mesma transação
+            revenue.record_completed_bet(bet)
+            return True
+        
+        if not ledger.run_transaction(work):
+            return jsonify({'error': 'Aposta não está ativa'}), 400
         
-        db.session.add(win_transaction)
-        db.session.add(platform_revenue)
-        db.session.commit()
+        db.session.refresh(bet)
+        winner = db.session.get(User, winner_id)
+        
+        bet_data = bet.to_dict()
+        response_cache.invalidate('revenue', 'ranking')
+        event_bus.publish('bet.completed', bet_data)
         
         return jsonify({
             'message': 'Aposta finalizada com sucesso',
-            'bet': bet.to_dict(),
+            'bet': bet_data,
             'winner': winner.to_dict(),
             'platform_fee_collected': float(bet.platform_fee)
         }), 200
@@ -291,80 +481,228 @@ def complete_bet(bet_id):
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
-@betting_bp.route('/bets/available', methods=['GET'])
-def get_available_bets():
-    """Listar apostas disponíveis"""
+@betting_bp.route('/bets/complete/batch', methods=['POST'])
+@require_service_token
+@idempotent
+def complete_bets_batch():
+    """Finalizar várias apostas numa única transação (noites de torneio)"""
     try:
-        user_id = request.args.get('user_id')
-        min_amount = request.args.get('min_amount', 0)
-        max_amount = request.args.get('max_amount', 999999)
+        data = request.get_json()
+        results = data.get('results') if isinstance(data, dict) else None
         
-        query = Bet.query.filter_by(status='pending')
+        if not isinstance(results, list) or not results:
+            return jsonify({'error': 'Envie results: [{bet_id, winner_id, game_data}]'}), 400
         
-        if user_id:
-            query = query.filter(Bet.player1_id != user_id)
+        try:
+            outcome = settlement.settle_batch(results)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         
-        query = query.filter(
-            Bet.bet_amount >= Decimal(str(min_amount)),
-            Bet.bet_amount <= Decimal(str(max_amount))
-        )
+        # Erros por aposta não falham o lote: vêm listados junto das finalizadas
+        return jsonify({
+            'message': f"{len(outcome['settled'])} aposta(s) finalizada(s)",
+            'settled': settlement.announce(outcome['settled']),
+            'errors': outcome['errors'],
+            'platform_fee_collected': float(outcome['platform_fee'])
+        }), 200
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+@betting_bp.route('/bets/<bet_id>/replay', methods=['GET'])
+def get_bet_replay(bet_id):
+    """Replay da partida em NDJSON (cabeçalho + uma tacada por linha); ?format=raw devolve o binário gravado"""
+    try:
+        match_replay = db.session.get(MatchReplay, bet_id, options=[undefer(MatchReplay.data)])
+        if match_replay is None:
+            return jsonify({'error': 'Replay não encontrado'}), 404
         
-        bets = query.order_by(Bet.created_at.desc()).limit(20).all()
+        # Replay não muda depois de gravado
+        headers = {'Cache-Control': 'public, max-age=86400'}
+        if request.args.get('format') == 'raw':
+            headers['X-Replay-Format'] = str(match_replay.format_version)
+            return Response(match_replay.data, mimetype='application/octet-stream', headers=headers)
+        
+        return Response(replay.stream_ndjson(match_replay), mimetype='application/x-ndjson', headers=headers)
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+def available_bets_query(user_id=None, min_amount=0, max_amount=999999):
+    """Consulta de /bets/available (também verificada por EXPLAIN nos testes)"""
+    # Status renderizado como literal para o planner casar o índice parcial de pendentes
+    # raiseload: serializar um relacionamento aqui falha em vez de virar N+1
+    query = Bet.query.options(raiseload('*'))\
+        .filter(Bet.status == db.literal('pending', literal_execute=True))
+    
+    if user_id:
+        query = query.filter(Bet.player1_id != user_id)
+    
+    query = query.filter(
+        Bet.bet_amount >= Decimal(str(min_amount)),
+        Bet.bet_amount <= Decimal(str(max_amount))
+    )
+    
+    return query.order_by(Bet.created_at.desc()).limit(20)
+
+@betting_bp.route('/bets/available', methods=['GET'])
+@cached('bets', ttl=5)
+def get_available_bets():
+    """Listar apostas disponíveis"""
+    try:
+        bets = available_bets_query(
+            request.args.get('user_id'),
+            request.args.get('min_amount', 0),
+            request.args.get('max_amount', 999999)
+        ).all()
         
         return jsonify({
-            'available_bets': [bet.to_dict() for bet in bets]
+            'available_bets': list(map(Bet.to_dict, bets))
         }), 200
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+def _encode_cursor(transaction):
+    """Cursor opaco com a posição (created_at, id) da última transação da página"""
+    raw = json.dumps([transaction.created_at.isoformat(), transaction.id])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+def _decode_cursor(cursor):
+    """Inverso de _encode_cursor; ValueError para qualquer cursor fora do formato"""
+    raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+    value = json.loads(raw)
+    if not (isinstance(value, list) and len(value) == 2 and all(isinstance(v, str) for v in value)):
+        raise ValueError('Cursor inválido')
+    created_at, transaction_id = value
+    return datetime.fromisoformat(created_at), transaction_id
+
+def transactions_page_query(user_id, per_page, after=None):
+    """Página de /users/<id>/transactions após a posição (created_at, id) do cursor"""
+    query = Transaction.query.options(raiseload('*')).filter_by(user_id=user_id)
+    if after:
+        created_at, transaction_id = after
+        # O "<=" isolado delimita a faixa no índice (user_id, created_at)
+        query = query.filter(
+            Transaction.created_at <= created_at,
+            db.or_(Transaction.created_at < created_at, Transaction.id < transaction_id)
+        )
+    
+    return query\
+        .order_by(Transaction.created_at.desc(), Transaction.id.desc())\
+        .limit(per_page + 1)
+
 @betting_bp.route('/users/<user_id>/transactions', methods=['GET'])
+@require_auth
 def get_user_transactions(user_id):
     """Obter histórico de transações do usuário"""
     try:
-        page = int(request.args.get('page', 1))
-        per_page = int(request.args.get('per_page', 20))
-        
-        transactions = Transaction.query.filter_by(user_id=user_id)\
-            .order_by(Transaction.created_at.desc())\
-            .paginate(page=page, per_page=per_page, error_out=False)
-        
-        return jsonify({
-            'transactions': [t.to_dict() for t in transactions.items],
-            'total': transactions.total,
-            'pages': transactions.pages,
-            'current_page': page
-        }), 200
+        if not _is_caller(user_id):
+            return _forbidden()
+        
+        per_page = min(max(int(request.args.get('per_page', 20)), 1), MAX_PER_PAGE)
+        query = Transaction.query.options(raiseload('*')).filter_by(user_id=user_id)
+        
+        # Modo legado com ?page=N: COUNT(*) + OFFSET
+        if 'page' in request.args:
+            page = int(request.args.get('page', 1))
+            
+            transactions = query\
+                .order_by(Transaction.created_at.desc())\
+                .paginate(page=page, per_page=per_page, error_out=False)
+            
+            return jsonify({
+                'transactions': list(map(Transaction.to_dict, transactions.items)),
+                'total': transactions.total,
+                'pages': transactions.pages,
+                'current_page': page
+            }), 200
+        
+        # Paginação por cursor: continua de (created_at, id) sem OFFSET nem COUNT
+        cursor = request.args.get('cursor')
+        after = None
+        if cursor:
+            try:
+                after = _decode_cursor(cursor)
+            except ValueError:
+                return jsonify({'error': 'Cursor inválido'}), 400
+        
+        rows = transactions_page_query(user_id, per_page, after).all()
+        has_more = len(rows) > per_page
+        rows = rows[:per_page]
+        
+        response = {
+            'transactions': list(map(Transaction.to_dict, rows)),
+            'next_cursor': _encode_cursor(rows[-1]) if has_more else None,
+            'has_more': has_more,
+            'per_page': per_page
+        }
+        if request.args.get('include_total') == 'true':
+            response['total'] = query.count()
+        
+        return jsonify(response), 200
+        
+    except ValueError:
+        return jsonify({'error': 'Parâmetros de paginação inválidos'}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@betting_bp.route('/users/<user_id>/bets', methods=['GET'])
+def get_user_bets(user_id):
+    """Apostas do usuário com nome e rating dos jogadores (uma única consulta)"""
+    try:
+        limit = min(max(int(request.args.get('limit', 20)), 1), MAX_PER_PAGE)
+        status = request.args.get('status')
         
+        query = _with_players(Bet.query).filter(
+            db.or_(Bet.player1_id == user_id, Bet.player2_id == user_id)
+        )
+        if status:
+            query = query.filter(Bet.status == status)
+        
+        bets = []
+        for bet in query.order_by(Bet.created_at.desc()).limit(limit):
+            data = bet.to_dict()
+            data['player1'] = _player_summary(bet.player1)
+            data['player2'] = _player_summary(bet.player2) if bet.player2 else None
+            data['opponent'] = data['player2'] if bet.player1_id == user_id else data['player1']
+            data['won'] = (bet.winner_id == user_id) if bet.status == 'completed' else None
+            bets.append(data)
+        
+        return jsonify({'bets': bets}), 200
+        
+    except ValueError:
+        return jsonify({'error': 'Parâmetros inválidos'}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @betting_bp.route('/platform/revenue', methods=['GET'])
+@require_service_token
+@cached('revenue', ttl=60)
 def get_platform_revenue():
     """Obter estatísticas de receita da plataforma"""
     try:
-        # Receita total
-        total_revenue = db.session.query(db.func.sum(PlatformRevenue.amount)).scalar() or 0
-        
-        # Receita hoje
-        today = datetime.utcnow().date()
-        today_revenue = db.session.query(db.func.sum(PlatformRevenue.amount))\
-            .filter(db.func.date(PlatformRevenue.date_collected) == today).scalar() or 0
-        
-        # Total de apostas processadas
-        total_bets = Bet.query.filter_by(status='completed').count()
+        # Totais lidos da tabela diária mantida por complete_bet
+        totals = revenue.summary()
+        total_revenue = totals['total_revenue']
+        total_bets = totals['total_bets']
         
-        # Volume total apostado
-        total_volume = db.session.query(db.func.sum(Bet.bet_amount * 2))\
-            .filter_by(status='completed').scalar() or 0
-        
-        return jsonify({
+        response = {
             'total_revenue': float(total_revenue),
-            'today_revenue': float(today_revenue),
+            'today_revenue': float(totals['today_revenue']),
             'total_bets_completed': total_bets,
-            'total_volume': float(total_volume),
+            'total_volume': float(totals['total_volume']),
             'average_fee_per_bet': float(total_revenue / total_bets) if total_bets > 0 else 0
-        }), 200
+        }
+        
+        # Série diária opcional (?days=30)
+        days = request.args.get('days', type=int)
+        if days:
+            rows = PlatformStats.query.order_by(PlatformStats.date.desc()).limit(min(days, 366)).all()
+            response['daily'] = list(map(PlatformStats.to_dict, rows))
+        
+        return jsonify(response), 200
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -0,0 +1,62 @@
+from flask import Blueprint, Response, request, jsonify
+from src.auth import bearer_token, verify_token
+from src.events import event_bus, TooManySubscribers
+
+events_bp = Blueprint('events', __name__)
+
+# Comentário enviado quando não há eventos, para proxies não fecharem a conexão
+HEARTBEAT_SECONDS = 15
+
+HEADERS = {
+    'Cache-Control': 'no-cache',
+    'X-Accel-Buffering': 'no'
+}
+
+def format_event(event):
+    lines = [f'event: {event.type}', f'data: {event.data}']
+    if event.id is not None:
+        lines.insert(0, f'id: {event.id}')
+    return '\n'.join(lines) + '\n\n'
+
+def parse_types(value):
+    return [t for t in (value or '').split(',') if t]
+
+@events_bp.route('/events', methods=['GET'])
+def stream_events():
+    """
+    Eventos em tempo real (Server-Sent Events)
+
+    Eventos: bet.created, bet.accepted, bet.completed, bet.cancelled (aposta
+    expirada e reembolsada), game.finished (só do próprio jogador) e resync
+    (eventos perdidos; recarregar pelas rotas REST).
+    EventSource não envia cabeçalhos, então o token também vale em ?token=.
+    Filtro opcional: ?types=bet.created,bet.accepted
+
+    Em produção quem responde é src/asgi.py (SERVER_MODE=asgi). Esta rota
+    atende o servidor de desenvolvimento, que abre uma thread por conexão;
+    nos workers gthread do gunicorn cada conexão prenderia uma thread do
+    pool da API, então lá ela responde 503.
+    """
+    if 'gunicorn' in request.environ.get('SERVER_SOFTWARE', ''):
+        return jsonify({'error': 'Eventos em tempo real exigem SERVER_MODE=asgi'}), 503
+    
+    user_id = verify_token(bearer_token() or request.args.get('token'))
+    if not user_id:
+        return jsonify({'error': 'Token inválido'}), 401
+    
+    try:
+        subscription = event_bus.subscribe(user_id, parse_types(request.args.get('types')))
+    except TooManySubscribers:
+        return jsonify({'error': 'Muitas conexões de eventos, tente novamente'}), 503, {'Retry-After': '5'}
+    
+    def generate():
+        try:
+            yield 'retry: 3000\n\n'
+            while True:
+                event = subscription.get(timeout=HEARTBEAT_SECONDS)
+                yield format_event(event) if event is not None else ': keepalive\n\n'
+        finally:
+            # Cliente desconectou (ou o worker está encerrando)
+            subscription.close()
+    
+    return Response(generate(), mimetype='text/event-stream', headers=HEADERS)
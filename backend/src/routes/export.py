@@ -0,0 +1,39 @@
+from flask import Blueprint, Response, request, jsonify, stream_with_context
+from src.auth import require_service_token
+from src.services import export
+from src.utils import parse_date
+
+export_bp = Blueprint('export', __name__)
+
+MIMETYPES = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv'
+}
+
+@export_bp.route('/export/<kind>', methods=['GET'])
+@require_service_token
+def export_data(kind):
+    """Exportar apostas, transações ou receita em NDJSON/CSV (streaming; só com o token de serviço)"""
+    try:
+        if kind not in export.EXPORTS:
+            return jsonify({'error': f'Tipo de exportação inválido: {kind}'}), 404
+        
+        fmt = request.args.get('format', 'ndjson')
+        if fmt not in MIMETYPES:
+            return jsonify({'error': 'Formato deve ser ndjson ou csv'}), 400
+        
+        try:
+            start = parse_date(request.args.get('from'))
+            end = parse_date(request.args.get('to'))
+        except ValueError:
+            return jsonify({'error': 'Datas devem estar no formato ISO (AAAA-MM-DD)'}), 400
+        
+        filename = f"{kind}-{request.args.get('from', 'inicio')}-{request.args.get('to', 'hoje')}.{fmt}"
+        return Response(
+            stream_with_context(export.stream(kind, fmt, start, end)),
+            mimetype=MIMETYPES[fmt],
+            headers={'Content-Disposition': f'attachment; filename="{filename}"'}
+        )
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
@@ -0,0 +1,102 @@
+"""
+Serialização JSON das respostas
+
+- FastJSONProvider: usa orjson quando instalado (datetime nativo em C) e cai
+  para o json da biblioteca padrão; Decimal vira número e datetime vira ISO 8601
+  nos dois casos
+- dumps: mesma conversão para quem serializa fora de uma requisição
+- compile_serializer: monta o dict de uma linha com um único itemgetter, sem
+  float()/isoformat() por campo; a conversão fica com o provider
+"""
+
+import json
+from datetime import date, datetime
+from decimal import Decimal
+from operator import attrgetter, itemgetter
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # orjson é opcional
+    orjson = None
+
+def _default(value):
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f'Objeto do tipo {type(value).__name__} não é serializável em JSON')
+
+def dumps(obj):
+    """JSON compacto fora do contexto de requisição (eventos, cache)"""
+    if orjson is not None:
+        return orjson.dumps(obj, default=_default, option=orjson.OPT_NON_STR_KEYS).decode()
+    return json.dumps(obj, default=_default, separators=(',', ':'))
+
+class FastJSONProvider(DefaultJSONProvider):
+    """Provider JSON do Flask com orjson opcional e suporte a Decimal/datetime"""
+
+    sort_keys = True
+
+    def dumps(self, obj, **kwargs):
+        if orjson is not None and not kwargs.get('indent'):
+            return self._orjson_dumps(obj).decode()
+        kwargs.setdefault('default', _default)
+        kwargs.setdefault('sort_keys', self.sort_keys)
+        kwargs.setdefault('ensure_ascii', self.ensure_ascii)
+        return json.dumps(obj, **kwargs)
+
+    def loads(self, s, **kwargs):
+        if orjson is not None and not kwargs:
+            return orjson.loads(s)
+        return json.loads(s, **kwargs)
+
+    def _orjson_dumps(self, obj):
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_SUBCLASS
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        return orjson.dumps(obj, default=_default, option=option)
+
+    def response(self, *args, **kwargs):
+        pretty = (self.compact is None and self._app.debug) or self.compact is False
+        if orjson is None or pretty:
+            return super().response(*args, **kwargs)
+
+        # Bytes direto do orjson, sem passar por str
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(self._orjson_dumps(obj) + b'\n', mimetype=self.mimetype)
+
+def compile_serializer(*fields, **computed):
+    """
+    Serializador de linha: compile_serializer('id', 'status', win_rate=fn)
+
+    Pode ser usado como método do modelo (to_dict = compile_serializer(...))
+    ou direto em listas: list(map(Bet.to_dict, bets)). Lê os valores já
+    carregados direto do __dict__ da instância, sem passar pelos descritores
+    do ORM; atributos expirados ou não carregados caem no getattr normal.
+    """
+    from_state = itemgetter(*fields)
+    from_attrs = attrgetter(*fields)
+    if len(fields) == 1:
+        single_state, single_attrs = from_state, from_attrs
+        from_state = lambda d: (single_state(d),)
+        from_attrs = lambda obj: (single_attrs(obj),)
+
+    def values(obj):
+        try:
+            return from_state(obj.__dict__)
+        except KeyError:
+            return from_attrs(obj)
+
+    if not computed:
+        def serialize(obj):
+            return dict(zip(fields, values(obj)))
+        return serialize
+
+    names = fields + tuple(computed)
+    functions = tuple(computed.values())
+
+    def serialize(obj):
+        return dict(zip(names, values(obj) + tuple(fn(obj) for fn in functions)))
+    return serialize
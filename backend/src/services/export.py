@@ -0,0 +1,80 @@
+"""
+Exportação em streaming de apostas, transações e receita
+
+As linhas vêm de um cursor no servidor (yield_per) como tuplas simples, sem
+passar pelo identity map do ORM, então o uso de memória não cresce com o
+tamanho do período exportado.
+"""
+
+import csv
+import io
+import json
+from datetime import date, datetime
+from decimal import Decimal
+
+from sqlalchemy import select
+
+from src.models.betting import db, Bet, Transaction, PlatformRevenue
+
+BATCH_SIZE = 1000
+
+# tipo -> (modelo, coluna de data usada no filtro, colunas omitidas)
+EXPORTS = {
+    'bets': (Bet, Bet.created_at, {'game_data'}),
+    'transactions': (Transaction, Transaction.created_at, set()),
+    'revenue': (PlatformRevenue, PlatformRevenue.date_collected, set()),
+}
+
+def columns_for(kind):
+    model, _, omitted = EXPORTS[kind]
+    return [c for c in model.__table__.columns if c.name not in omitted]
+
+def _plain(value):
+    if isinstance(value, Decimal):
+        # Valores monetários exatos para a contabilidade
+        return str(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+def iter_rows(kind, start=None, end=None, batch_size=BATCH_SIZE):
+    """Linhas do tipo pedido em ordem cronológica; start inclusivo, end exclusivo"""
+    model, date_column, _ = EXPORTS[kind]
+    columns = columns_for(kind)
+
+    stmt = select(*columns).order_by(date_column, model.id)
+    if start:
+        stmt = stmt.where(date_column >= start)
+    if end:
+        stmt = stmt.where(date_column < end)
+
+    names = [c.name for c in columns]
+    result = db.session.execute(stmt, execution_options={'yield_per': batch_size})
+    try:
+        for row in result:
+            yield dict(zip(names, map(_plain, row)))
+    finally:
+        result.close()
+
+def ndjson_lines(rows):
+    for row in rows:
+        yield json.dumps(row, ensure_ascii=False) + '\n'
+
+def csv_lines(rows, fieldnames):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=fieldnames)
+    writer.writeheader()
+    for row in rows:
+        writer.writerow(row)
+        # Esvaziar o buffer a cada linha mantém a memória constante
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue()
+
+def stream(kind, fmt, start=None, end=None):
+    """Gerador de texto no formato pedido (ndjson ou csv)"""
+    rows = iter_rows(kind, start, end)
+    if fmt == 'csv':
+        return csv_lines(rows, [c.name for c in columns_for(kind)])
+    return ndjson_lines(rows)
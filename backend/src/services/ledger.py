@@ -0,0 +1,97 @@
+"""
+Ledger das carteiras: débitos e créditos como UPDATEs condicionais no banco
+
+Nada de ler o saldo no Python e gravar de volta: cada alteração é um único
+"UPDATE users SET wallet_balance = wallet_balance - x WHERE wallet_balance >= x",
+então acessos simultâneos à mesma carteira nunca deixam o saldo negativo.
+"""
+
+import random
+import time
+from datetime import datetime
+
+from sqlalchemy import update
+from sqlalchemy.exc import DBAPIError
+
+from src.models.betting import db, User
+
+# SQLSTATE de falha de serialização e deadlock no PostgreSQL
+RETRYABLE_SQLSTATES = {'40001', '40P01'}
+MAX_ATTEMPTS = 5
+
+class InsufficientFunds(Exception):
+    """Saldo insuficiente para o débito"""
+
+class UserNotFound(Exception):
+    """Usuário da carteira não existe"""
+
+def _is_retryable(error):
+    orig = getattr(error, 'orig', None)
+    if getattr(orig, 'pgcode', None) in RETRYABLE_SQLSTATES:
+        return True
+    # SQLite serializa escritas com lock do arquivo inteiro
+    return 'database is locked' in str(orig)
+
+def run_transaction(work, max_attempts=MAX_ATTEMPTS):
+    """
+    Executar work() e fazer commit, repetindo em falha de serialização/deadlock
+
+    work deve ser idempotente até o commit: em caso de nova tentativa a sessão
+    passa por rollback e tudo é executado de novo.
+    """
+    for attempt in range(1, max_attempts + 1):
+        try:
+            result = work()
+            db.session.commit()
+            return result
+        except DBAPIError as e:
+            db.session.rollback()
+            if attempt == max_attempts or not _is_retryable(e):
+                raise
+            # Backoff exponencial com jitter
+            time.sleep(random.uniform(0, 0.01 * 2 ** attempt))
+        except Exception:
+            db.session.rollback()
+            raise
+
+def debit(user_id, amount, **values):
+    """Debitar amount se houver saldo; retorna o novo saldo"""
+    result = db.session.execute(
+        update(User)
+        .where(User.id == user_id, User.wallet_balance >= amount)
+        .values(wallet_balance=User.wallet_balance - amount, updated_at=datetime.utcnow(), **values)
+        .returning(User.wallet_balance)
+    ).first()
+
+    if result is None:
+        if db.session.get(User, user_id) is None:
+            raise UserNotFound(user_id)
+        raise InsufficientFunds(user_id)
+    return result.wallet_balance
+
+def credit(user_id, amount, **values):
+    """Creditar amount (e demais colunas em values); retorna o novo saldo"""
+    result = db.session.execute(
+        update(User)
+        .where(User.id == user_id)
+        .values(wallet_balance=User.wallet_balance + amount, updated_at=datetime.utcnow(), **values)
+        .returning(User.wallet_balance)
+    ).first()
+
+    if result is None:
+        raise UserNotFound(user_id)
+    return result.wallet_balance
+
+def update_user(user_id, **values):
+    """Atualizar colunas do usuário sem mexer no saldo (ex.: estatísticas)"""
+    result = db.session.execute(
+        update(User)
+        .where(User.id == user_id)
+        .values(updated_at=datetime.utcnow(), **values)
+    )
+    if result.rowcount != 1:
+        raise UserNotFound(user_id)
+
+def lock_order(*user_ids):
+    """Ordem fixa de atualização das carteiras, evitando deadlock entre transações"""
+    return sorted(user_ids)
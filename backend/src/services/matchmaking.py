@@ -0,0 +1,223 @@
+"""
+Pareamento de apostas pendentes
+
+Em vez de cada cliente consultar /bets/available e disputar o mesmo aceite,
+POST /bets/match escolhe a melhor aposta aberta: valor mais próximo do alvo e,
+no mesmo valor, a mais antiga. Quem decide o aceite é sempre o UPDATE
+condicional no banco (status='pending'); candidatas já aceitas por outra
+requisição são puladas e a busca continua nas seguintes.
+
+As candidatas vêm do banco (find_candidates, padrão) ou da MatchQueue, um
+índice em memória do processo (MATCHMAKING_SOURCE=queue). A fila só vê as
+apostas criadas no próprio processo e recarrega o resto a cada
+refresh_interval, então só vale com um único worker: com vários, apostas de
+outros workers ficam invisíveis até a recarga.
+
+A recarga do banco roda fora do lock e uma por vez: enquanto uma thread
+recarrega as outras usam o índice atual, e add/remove feitos nesse meio
+tempo são reaplicados sobre o resultado da consulta.
+"""
+
+import logging
+import threading
+import time
+from bisect import bisect_left, insort
+from collections import OrderedDict
+from decimal import Decimal
+
+from src import config
+from src.models.betting import db, User, Bet
+
+logger = logging.getLogger(__name__)
+
+CENTS = Decimal('0.01')
+
+def _amount_key(amount):
+    return Decimal(str(amount)).quantize(CENTS)
+
+def find_candidates(player_id, min_amount, max_amount, target=None,
+                    skill_rating=None, max_rating_diff=None, limit=10, exclude=()):
+    """Mesma ordem de MatchQueue.candidates, consultando as pendentes no banco"""
+    min_amount, max_amount = _amount_key(min_amount), _amount_key(max_amount)
+    target = _amount_key(target) if target is not None else min_amount
+
+    query = db.session.query(Bet.id)\
+        .filter(Bet.status == db.literal('pending', literal_execute=True))\
+        .filter(Bet.player1_id != player_id)\
+        .filter(Bet.bet_amount >= min_amount, Bet.bet_amount <= max_amount)
+    if max_rating_diff is not None and skill_rating is not None:
+        query = query.join(User, User.id == Bet.player1_id)\
+            .filter(User.skill_rating.between(skill_rating - max_rating_diff, skill_rating + max_rating_diff))
+    if exclude:
+        query = query.filter(Bet.id.notin_(exclude))
+
+    # Empate de distância: o valor menor primeiro, como na fila
+    rows = query.order_by(db.func.abs(Bet.bet_amount - target), Bet.bet_amount, Bet.created_at)\
+        .limit(limit).all()
+    return [row.id for row in rows]
+
+class MatchQueue:
+    """
+    Apostas pendentes agrupadas por valor (valores ordenados + FIFO por valor)
+
+    Índice local do processo: só é usado com MATCHMAKING_SOURCE=queue e um worker.
+    """
+
+    def __init__(self, refresh_interval=30):
+        self.refresh_interval = refresh_interval
+        self._amounts = []
+        self._buckets = {}
+        self._amount_of = {}
+        self._loaded_at = None
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        # Durante a recarga: alterações a reaplicar sobre o resultado da consulta
+        self._reloading = False
+        self._added = {}
+        self._removed = set()
+
+    def __len__(self):
+        return len(self._amount_of)
+
+    def add(self, bet_id, amount, player1_id, skill_rating):
+        key = _amount_key(amount)
+        with self._lock:
+            if self._reloading:
+                self._added[bet_id] = (key, player1_id, skill_rating)
+                self._removed.discard(bet_id)
+            self._insert(bet_id, key, player1_id, skill_rating)
+
+    def remove(self, bet_id):
+        with self._lock:
+            if self._reloading:
+                self._added.pop(bet_id, None)
+                self._removed.add(bet_id)
+            self._discard(bet_id)
+
+    def _insert(self, bet_id, key, player1_id, skill_rating):
+        # Chamado com self._lock
+        if bet_id in self._amount_of:
+            return
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = OrderedDict()
+            insort(self._amounts, key)
+        bucket[bet_id] = (player1_id, skill_rating)
+        self._amount_of[bet_id] = key
+
+    def _discard(self, bet_id):
+        # Chamado com self._lock
+        key = self._amount_of.pop(bet_id, None)
+        if key is None:
+            return
+        bucket = self._buckets[key]
+        del bucket[bet_id]
+        if not bucket:
+            del self._buckets[key]
+            del self._amounts[bisect_left(self._amounts, key)]
+
+    def _amounts_by_distance(self, target, min_amount, max_amount):
+        """Valores dentro de [min, max], do mais próximo ao mais distante do alvo"""
+        lo = bisect_left(self._amounts, min_amount)
+        hi = bisect_left(self._amounts, max_amount + CENTS)
+        right = max(lo, min(bisect_left(self._amounts, target), hi))
+        left = right - 1
+        while left >= lo or right < hi:
+            if right >= hi or (left >= lo and target - self._amounts[left] <= self._amounts[right] - target):
+                yield self._amounts[left]
+                left -= 1
+            else:
+                yield self._amounts[right]
+                right += 1
+
+    def candidates(self, player_id, min_amount, max_amount, target=None,
+                   skill_rating=None, max_rating_diff=None, limit=10, exclude=()):
+        """
+        Melhores apostas para o jogador: valor mais próximo do alvo e, no mesmo
+        valor, a mais antiga; ignora as próprias apostas, ratings fora da faixa
+        e as já tentadas (exclude)
+        """
+        min_amount, max_amount = _amount_key(min_amount), _amount_key(max_amount)
+        target = _amount_key(target) if target is not None else min_amount
+
+        found = []
+        with self._lock:
+            for key in self._amounts_by_distance(target, min_amount, max_amount):
+                for bet_id, (player1_id, rating) in self._buckets[key].items():
+                    if player1_id == player_id or bet_id in exclude:
+                        continue
+                    if max_rating_diff is not None and skill_rating is not None \
+                            and abs(rating - skill_rating) > max_rating_diff:
+                        continue
+                    found.append(bet_id)
+                    if len(found) >= limit:
+                        return found
+        return found
+
+    def _stale(self):
+        return self._loaded_at is None or time.monotonic() - self._loaded_at >= self.refresh_interval
+
+    def refresh_if_stale(self):
+        """Recarregar as pendentes do banco (inclui apostas criadas em outros nós)"""
+        if not self._stale():
+            return
+        # Uma recarga por vez; só a primeira carga faz as outras threads esperarem
+        if not self._refresh_lock.acquire(blocking=self._loaded_at is None):
+            return
+        try:
+            if self._stale():
+                self._reload()
+        finally:
+            self._refresh_lock.release()
+
+    def _reload(self):
+        with self._lock:
+            self._reloading = True
+            self._added, self._removed = {}, set()
+        try:
+            rows = db.session.query(Bet.id, Bet.bet_amount, Bet.player1_id, User.skill_rating)\
+                .join(User, User.id == Bet.player1_id)\
+                .filter(Bet.status == 'pending')\
+                .order_by(Bet.created_at)\
+                .all()
+        except Exception:
+            with self._lock:
+                self._reloading = False
+            raise
+
+        amounts, buckets, amount_of = [], {}, {}
+        for bet_id, amount, player1_id, rating in rows:
+            key = _amount_key(amount)
+            if key not in buckets:
+                buckets[key] = OrderedDict()
+                amounts.append(key)
+            buckets[key][bet_id] = (player1_id, rating)
+            amount_of[bet_id] = key
+        amounts.sort()
+
+        with self._lock:
+            self._amounts, self._buckets, self._amount_of = amounts, buckets, amount_of
+            # A consulta pode ter lido antes de um aceite ou de uma aposta nova
+            for bet_id in self._removed:
+                self._discard(bet_id)
+            for bet_id, entry in self._added.items():
+                self._insert(bet_id, *entry)
+            self._reloading = False
+            self._added, self._removed = {}, set()
+            self._loaded_at = time.monotonic()
+
+match_queue = MatchQueue()
+
+if config.matchmaking_source() == 'queue' and config.web_workers() > 1:
+    logger.warning('MATCHMAKING_SOURCE=queue com %d workers: cada worker só vê as próprias apostas '
+                   'até a recarga; use db', config.web_workers())
+
+def candidates(player_id, min_amount, max_amount, target=None,
+               skill_rating=None, max_rating_diff=None, limit=10, exclude=()):
+    """Próximo lote de candidatas da origem configurada (MATCHMAKING_SOURCE)"""
+    if config.matchmaking_source() == 'queue':
+        match_queue.refresh_if_stale()
+        return match_queue.candidates(player_id, min_amount, max_amount, target,
+                                      skill_rating, max_rating_diff, limit, exclude)
+    return find_candidates(player_id, min_amount, max_amount, target,
+                           skill_rating, max_rating_diff, limit, exclude)
@@ -0,0 +1,171 @@
+"""
+Rating Elo dos jogadores
+
+- Incremental: complete_bet aplica elo_deltas() a cada aposta finalizada
+- Em lote: replay() reprocessa o histórico inteiro com NumPy, agrupando as
+  partidas em "ondas" sem jogadores repetidos para atualizar cada onda de
+  uma vez só, mantendo a mesma ordem cronológica do modo incremental
+
+Nos dois modos o K provisório usa User.total_games (apostas finalizadas): o
+replay parte de total_games menos as partidas reprocessadas, então um replay
+completo começa em zero e reproduz os ratings gravados pelo modo incremental
+(verify_ratings / flask recalc-ratings --check).
+"""
+
+from datetime import datetime
+
+from sqlalchemy import update
+
+from src.models.betting import db, User, Bet
+
+DEFAULT_RATING = 1000
+
+# Tabela de K: jogadores novos mudam rápido, os do topo mudam devagar
+PROVISIONAL_GAMES = 30
+K_PROVISIONAL = 40
+K_DEFAULT = 20
+K_TOP = 10
+TOP_RATING = 2400
+
+def k_factor(rating, games_played):
+    if games_played < PROVISIONAL_GAMES:
+        return K_PROVISIONAL
+    if rating >= TOP_RATING:
+        return K_TOP
+    return K_DEFAULT
+
+def expected_score(rating, opponent_rating):
+    return 1 / (1 + 10 ** ((opponent_rating - rating) / 400))
+
+def elo_deltas(winner_rating, loser_rating, winner_games, loser_games):
+    """Variação (inteira) do rating do vencedor e do perdedor"""
+    surprise = 1 - expected_score(winner_rating, loser_rating)
+    winner_delta = round(k_factor(winner_rating, winner_games) * surprise)
+    loser_delta = -round(k_factor(loser_rating, loser_games) * surprise)
+    return winner_delta, loser_delta
+
+def schedule_waves(winners, losers, num_players):
+    """
+    Onda de cada partida: 1 + maior onda anterior de qualquer um dos dois
+    jogadores. Partidas da mesma onda não compartilham jogadores e cada
+    jogador passa pelas suas partidas na ordem original.
+    """
+    import numpy as np
+
+    last = [-1] * num_players
+    waves = []
+    append = waves.append
+    for w, l in zip(winners.tolist(), losers.tolist()):
+        lw, ll = last[w], last[l]
+        wave = (lw if lw > ll else ll) + 1
+        last[w] = last[l] = wave
+        append(wave)
+    return np.array(waves, dtype=np.int64)
+
+def replay(winners, losers, num_players, initial_rating=DEFAULT_RATING, initial_games=None):
+    """
+    Reprocessar partidas (índices de vencedor/perdedor em ordem cronológica)
+
+    initial_games: partidas já jogadas antes da primeira do replay, por índice
+    (padrão zero). Retorna (ratings, partidas jogadas) por índice de jogador,
+    com o mesmo arredondamento do modo incremental.
+    """
+    import numpy as np
+
+    winners = np.asarray(winners, dtype=np.int64)
+    losers = np.asarray(losers, dtype=np.int64)
+    ratings = np.full(num_players, initial_rating, dtype=np.float64)
+    if initial_games is None:
+        games = np.zeros(num_players, dtype=np.int64)
+    else:
+        games = np.array(initial_games, dtype=np.int64)
+    if len(winners) == 0:
+        return ratings.astype(np.int64), games
+
+    waves = schedule_waves(winners, losers, num_players)
+    order = np.argsort(waves, kind='stable')
+    boundaries = np.flatnonzero(np.diff(waves[order])) + 1
+
+    def k(idx):
+        r, g = ratings[idx], games[idx]
+        return np.where(g < PROVISIONAL_GAMES, K_PROVISIONAL,
+                        np.where(r >= TOP_RATING, K_TOP, K_DEFAULT))
+
+    for chunk in np.split(order, boundaries):
+        w, l = winners[chunk], losers[chunk]
+        surprise = 1 - 1 / (1 + 10 ** ((ratings[l] - ratings[w]) / 400))
+        winner_delta = np.round(k(w) * surprise)
+        loser_delta = np.round(k(l) * surprise)
+        ratings[w] += winner_delta
+        ratings[l] -= loser_delta
+        games[w] += 1
+        games[l] += 1
+
+    return ratings.astype(np.int64), games
+
+def _replay_history(since, batch_size):
+    """Replay das apostas finalizadas: {user_id: rating} e número de apostas"""
+    import numpy as np
+
+    query = db.session.query(Bet.winner_id, Bet.player1_id, Bet.player2_id)\
+        .filter(Bet.status == 'completed', Bet.winner_id.isnot(None))
+    if since:
+        query = query.filter(Bet.completed_at >= since)
+    # Mesmo desempate do lote (settlement aplica o Elo na ordem de id)
+    query = query.order_by(Bet.completed_at, Bet.id).execution_options(yield_per=batch_size)
+
+    index = {}
+    winners, losers = [], []
+    for winner_id, player1_id, player2_id in query:
+        loser_id = player2_id if winner_id == player1_id else player1_id
+        winners.append(index.setdefault(winner_id, len(index)))
+        losers.append(index.setdefault(loser_id, len(index)))
+
+    # Partidas anteriores ao replay, pela mesma contagem do modo incremental
+    replayed = np.bincount(np.asarray(winners + losers, dtype=np.int64), minlength=len(index))
+    total_games = np.zeros(len(index), dtype=np.int64)
+    for user_id, games in db.session.query(User.id, User.total_games)\
+            .filter(User.total_games > 0).execution_options(yield_per=batch_size):
+        if user_id in index:
+            total_games[index[user_id]] = games
+    initial_games = np.maximum(total_games - replayed, 0)
+
+    ratings, _ = replay(winners, losers, len(index), initial_games=initial_games)
+    return {user_id: int(ratings[i]) for user_id, i in index.items()}, len(winners)
+
+def recalculate_ratings(since=None, dry_run=False, batch_size=10000):
+    """
+    Recalcular skill_rating de todos os jogadores a partir das apostas finalizadas
+
+    since: considera só apostas finalizadas a partir desta data (nova temporada);
+    quem não jogou no período volta ao rating inicial.
+    """
+    new_ratings, bets = _replay_history(since, batch_size)
+
+    if not dry_run:
+        db.session.execute(update(User).values(skill_rating=DEFAULT_RATING, updated_at=datetime.utcnow()))
+        if new_ratings:
+            db.session.execute(update(User), [
+                {'id': user_id, 'skill_rating': rating} for user_id, rating in new_ratings.items()
+            ])
+        db.session.commit()
+
+    return {'bets': bets, 'players': len(new_ratings)}
+
+def verify_ratings(since=None, batch_size=10000, limit=20):
+    """
+    Conferir se o replay reproduz o skill_rating gravado (sem gravar nada)
+
+    since: início da temporada atual, o mesmo passado ao último recálculo.
+    Retorna contagens e até limit divergências {'user_id', 'stored', 'replayed'}.
+    """
+    expected, bets = _replay_history(since, batch_size)
+    mismatches = []
+    checked = 0
+    for user_id, stored in db.session.query(User.id, User.skill_rating).execution_options(yield_per=batch_size):
+        checked += 1
+        replayed = expected.get(user_id, DEFAULT_RATING)
+        if stored != replayed:
+            mismatches.append({'user_id': user_id, 'stored': stored, 'replayed': replayed})
+
+    return {'bets': bets, 'players': checked, 'mismatched': len(mismatches), 'mismatches': mismatches[:limit]}
@@ -0,0 +1,171 @@
+"""
+Expiração de apostas paradas
+
+- pendentes há mais de PENDING_BET_TTL_HOURS: jogador 1 recebe o valor de volta
+- ativas há mais de ACTIVE_BET_TTL_HOURS sem resultado: os dois jogadores
+  recebem o valor de volta e o escrow fica 'refunded'
+
+As duas viram 'cancelled' com uma transação 'bet_refund' por jogador.
+Cada lote (REAPER_BATCH_SIZE) é uma transação: SELECT pelo índice
+(status, created_at) com SKIP LOCKED no Postgres e UPDATE condicional no
+status, então vários nós podem rodar o reaper ao mesmo tempo sem reembolsar
+duas vezes.
+
+Roda como thread no processo da API (REAPER_ENABLED=true) ou como worker
+separado: flask reap-bets [--loop].
+"""
+
+import logging
+import os
+import threading
+from collections import defaultdict
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from sqlalchemy import bindparam, insert, update
+
+from src import idempotency
+from src.cache import response_cache
+from src.events import event_bus
+from src.models.betting import db, User, Bet, Transaction, EscrowAccount
+from src.services import ledger
+from src.services.matchmaking import match_queue
+
+logger = logging.getLogger(__name__)
+
+PENDING_TTL = timedelta(hours=float(os.environ.get('PENDING_BET_TTL_HOURS', 24)))
+ACTIVE_TTL = timedelta(hours=float(os.environ.get('ACTIVE_BET_TTL_HOURS', 6)))
+BATCH_SIZE = int(os.environ.get('REAPER_BATCH_SIZE', 100))
+INTERVAL_SECONDS = float(os.environ.get('REAPER_INTERVAL_SECONDS', 60))
+
+def _expired_ids(status, age_column, cutoff, batch_size):
+    query = db.session.query(Bet.id)\
+        .filter(Bet.status == status, age_column < cutoff)\
+        .order_by(age_column)\
+        .limit(batch_size)
+    # Outro nó já processando essas linhas: pula em vez de esperar (ignorado no SQLite)
+    return [row.id for row in query.with_for_update(skip_locked=True)]
+
+def _refund(refunds, description, now):
+    """Creditar e registrar os reembolsos {user_id: [(bet_id, valor), ...]}"""
+    totals = {user_id: sum((amount for _, amount in items), Decimal('0')) for user_id, items in refunds.items()}
+    users = User.__table__
+    db.session.execute(
+        update(users)
+        .where(users.c.id == bindparam('u_id'))
+        .values(wallet_balance=users.c.wallet_balance + bindparam('u_amount'), updated_at=now),
+        [{'u_id': user_id, 'u_amount': totals[user_id]} for user_id in ledger.lock_order(*totals)]
+    )
+    db.session.execute(insert(Transaction), [
+        {
+            'user_id': user_id,
+            'type': 'bet_refund',
+            'amount': amount,
+            'bet_id': bet_id,
+            'status': 'completed',
+            'description': f'{description} - ID: {bet_id}',
+            'created_at': now,
+            'processed_at': now
+        }
+        for user_id, items in refunds.items() for bet_id, amount in items
+    ])
+
+def _reap_pending(cutoff, batch_size):
+    def work():
+        ids = _expired_ids('pending', Bet.created_at, cutoff, batch_size)
+        if not ids:
+            return []
+        now = datetime.utcnow()
+        rows = db.session.execute(
+            update(Bet)
+            .where(Bet.id.in_(ids), Bet.status == 'pending')
+            .values(status='cancelled', completed_at=now)
+            .returning(Bet.id, Bet.player1_id, Bet.bet_amount)
+        ).all()
+        refunds = defaultdict(list)
+        for bet_id, player1_id, amount in rows:
+            refunds[player1_id].append((bet_id, amount))
+        if refunds:
+            _refund(refunds, 'Aposta expirada sem adversário', now)
+        return [row.id for row in rows]
+    return ledger.run_transaction(work)
+
+def _reap_active(cutoff, batch_size):
+    def work():
+        ids = _expired_ids('active', Bet.started_at, cutoff, batch_size)
+        if not ids:
+            return []
+        now = datetime.utcnow()
+        rows = db.session.execute(
+            update(Bet)
+            .where(Bet.id.in_(ids), Bet.status == 'active')
+            .values(status='cancelled', completed_at=now)
+            .returning(Bet.id, Bet.player1_id, Bet.player2_id, Bet.bet_amount)
+        ).all()
+        if not rows:
+            return []
+        refunds = defaultdict(list)
+        for bet_id, player1_id, player2_id, amount in rows:
+            refunds[player1_id].append((bet_id, amount))
+            refunds[player2_id].append((bet_id, amount))
+        cancelled = [row.id for row in rows]
+        db.session.execute(
+            update(EscrowAccount)
+            .where(EscrowAccount.bet_id.in_(cancelled), EscrowAccount.status == 'holding')
+            .values(status='refunded', released_at=now)
+        )
+        _refund(refunds, 'Aposta ativa expirada sem resultado', now)
+        return cancelled
+    return ledger.run_transaction(work)
+
+def reap_once(now=None, batch_size=BATCH_SIZE, max_batches=50):
+    """Processar apostas vencidas em lotes; retorna {'pending': n, 'active': n}"""
+    now = now or datetime.utcnow()
+    counts = {}
+    for kind, reap, cutoff in (('pending', _reap_pending, now - PENDING_TTL),
+                               ('active', _reap_active, now - ACTIVE_TTL)):
+        counts[kind] = 0
+        for _ in range(max_batches):
+            cancelled = reap(cutoff, batch_size)
+            for bet_id in cancelled:
+                match_queue.remove(bet_id)
+                event_bus.publish('bet.cancelled', {'id': bet_id, 'reason': f'{kind}_expired'})
+            counts[kind] += len(cancelled)
+            if len(cancelled) < batch_size:
+                break
+
+    if counts['pending'] or counts['active']:
+        response_cache.invalidate('bets')
+    counts['idempotency_keys'] = idempotency.purge_expired()
+    return counts
+
+class Reaper:
+    """Thread que chama reap_once a cada INTERVAL_SECONDS"""
+
+    def __init__(self, app, interval=INTERVAL_SECONDS):
+        self.app = app
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self.run, name='bet-reaper', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def run(self):
+        while not self._stop.wait(self.interval):
+            with self.app.app_context():
+                try:
+                    counts = reap_once()
+                    if counts['pending'] or counts['active']:
+                        logger.info('Apostas expiradas canceladas: %s', counts)
+                except Exception:
+                    logger.exception('Falha ao expirar apostas')
+                finally:
+                    db.session.remove()
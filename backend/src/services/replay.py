@@ -0,0 +1,168 @@
+"""
+Replays de partida: tacadas em colunas compactadas, fora da tabela bets
+
+game_data.shots (lista de tacadas enviada pelo cliente ao finalizar a aposta)
+vai para match_replays; em bets fica só o resto do game_data, limitado a
+GAME_DATA_MAX_BYTES. Cada tacada:
+
+    {'t': ms desde o início, 'player': 1|2, 'ball': 0-15, 'x': mm, 'y': mm,
+     'angle': graus, 'power': 0-1, 'potted': [bolas], 'foul': bool}
+
+Codificação (versão 1): cabeçalho fixo + zlib das colunas, uma array por
+campo, little-endian; t guardado como diferença para a tacada anterior.
+Posições com resolução de 0,1 mm, ângulo de 0,01 grau e força de 1/10000.
+Valores em colunas ficam lado a lado com os parecidos e comprimem bem melhor
+que o JSON das tacadas (~17 bytes por tacada antes do zlib).
+"""
+
+import os
+import struct
+import sys
+import zlib
+from array import array
+
+from src.serialization import dumps
+
+FORMAT_VERSION = 1
+MAGIC = b'SRP'
+HEADER = struct.Struct('<3sBI')  # magic, versão, número de tacadas
+
+MAX_SHOTS = int(os.environ.get('REPLAY_MAX_SHOTS', 5000))
+GAME_DATA_MAX_BYTES = int(os.environ.get('GAME_DATA_MAX_BYTES', 4096))
+COMPRESSION_LEVEL = 6
+
+# campo -> (typecode, escala, máximo aceito antes da escala)
+COLUMNS = (
+    ('t', 'I', 1, 2 ** 32 - 1),
+    ('player', 'B', 1, 2),
+    ('ball', 'B', 1, 15),
+    ('x', 'H', 10, 6000),
+    ('y', 'H', 10, 6000),
+    ('angle', 'H', 100, 360),
+    ('power', 'H', 10000, 1),
+    ('potted', 'H', 1, None),
+    ('foul', 'B', 1, None),
+)
+
+def _number(shot, field, index, maximum):
+    value = shot.get(field, 0)
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or not 0 <= value <= maximum:
+        raise ValueError(f'shots[{index}].{field} deve ser um número entre 0 e {maximum}')
+    return value
+
+def parse_shots(shots):
+    """Validar a lista de tacadas e devolver as colunas já quantizadas"""
+    if not isinstance(shots, list):
+        raise ValueError('game_data.shots deve ser uma lista')
+    if len(shots) > MAX_SHOTS:
+        raise ValueError(f'Replay deve ter no máximo {MAX_SHOTS} tacadas')
+
+    columns = {name: array(typecode) for name, typecode, _, _ in COLUMNS}
+    previous = 0
+    for index, shot in enumerate(shots):
+        if not isinstance(shot, dict) or 't' not in shot:
+            raise ValueError(f'shots[{index}] deve ser um objeto com o campo t')
+        for name, _, scale, maximum in COLUMNS:
+            if name == 'potted':
+                potted = shot.get('potted', [])
+                if not isinstance(potted, list) or not all(
+                        isinstance(b, int) and not isinstance(b, bool) and 0 <= b <= 15 for b in potted):
+                    raise ValueError(f'shots[{index}].potted deve ser uma lista de bolas (0-15)')
+                columns['potted'].append(sum(1 << ball for ball in set(potted)))
+            elif name == 'foul':
+                columns['foul'].append(1 if shot.get('foul') else 0)
+            elif name == 't':
+                t = int(_number(shot, 't', index, maximum))
+                if t < previous:
+                    raise ValueError(f'shots[{index}].t deve ser crescente')
+                columns['t'].append(t - previous)
+                previous = t
+            else:
+                columns[name].append(round(_number(shot, name, index, maximum) * scale))
+    return columns
+
+def encode(columns):
+    """Colunas de parse_shots -> bytes gravados em match_replays.data"""
+    count = len(columns['t'])
+    body = []
+    for name, _, _, _ in COLUMNS:
+        column = columns[name]
+        if sys.byteorder == 'big':
+            column = array(column.typecode, column)
+            column.byteswap()
+        body.append(column.tobytes())
+    return HEADER.pack(MAGIC, FORMAT_VERSION, count) + zlib.compress(b''.join(body), COMPRESSION_LEVEL)
+
+def decode(blob):
+    """Bytes gravados -> tacadas (gerador, na ordem da partida)"""
+    magic, version, count = HEADER.unpack_from(blob)
+    if magic != MAGIC or version != FORMAT_VERSION:
+        raise ValueError(f'Formato de replay desconhecido: {magic!r} v{version}')
+    body = memoryview(zlib.decompress(blob[HEADER.size:]))
+
+    columns = {}
+    offset = 0
+    for name, typecode, _, _ in COLUMNS:
+        column = array(typecode)
+        size = column.itemsize * count
+        column.frombytes(body[offset:offset + size])
+        if sys.byteorder == 'big':
+            column.byteswap()
+        columns[name] = column
+        offset += size
+
+    t = 0
+    for i in range(count):
+        t += columns['t'][i]
+        potted = columns['potted'][i]
+        yield {
+            't': t,
+            'player': columns['player'][i],
+            'ball': columns['ball'][i],
+            'x': columns['x'][i] / 10,
+            'y': columns['y'][i] / 10,
+            'angle': columns['angle'][i] / 100,
+            'power': columns['power'][i] / 10000,
+            'potted': [ball for ball in range(16) if potted >> ball & 1],
+            'foul': bool(columns['foul'][i])
+        }
+
+def split_game_data(game_data):
+    """
+    Separar as tacadas do resto do game_data
+
+    Retorna (JSON do game_data sem shots, colunas das tacadas ou None).
+    Levanta ValueError para tacadas inválidas ou game_data grande demais.
+    """
+    if not isinstance(game_data, dict):
+        raise ValueError('game_data deve ser um objeto')
+    game_data = dict(game_data)
+    shots = game_data.pop('shots', None)
+    text = dumps(game_data)
+    if len(text.encode()) > GAME_DATA_MAX_BYTES:
+        raise ValueError(f'game_data deve ter no máximo {GAME_DATA_MAX_BYTES} bytes (tacadas vão em shots)')
+    return text, (parse_shots(shots) if shots is not None else None)
+
+def replay_row(bet_id, columns, now):
+    """Valores para inserir em match_replays"""
+    data = encode(columns)
+    return {
+        'bet_id': bet_id,
+        'format_version': FORMAT_VERSION,
+        'shot_count': len(columns['t']),
+        'stored_size': len(data),
+        'data': data,
+        'created_at': now
+    }
+
+def stream_ndjson(replay, chunk_size=256):
+    """Cabeçalho e depois uma tacada por linha, em blocos de chunk_size linhas"""
+    yield dumps(replay.to_dict()) + '\n'
+    lines = []
+    for shot in decode(replay.data):
+        lines.append(dumps(shot))
+        if len(lines) == chunk_size:
+            yield '\n'.join(lines) + '\n'
+            lines = []
+    if lines:
+        yield '\n'.join(lines) + '\n'
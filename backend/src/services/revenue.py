@@ -0,0 +1,93 @@
+"""
+Totais de receita pré-agregados por dia (tabela platform_stats)
+
+complete_bet soma a aposta no dia corrente dentro da mesma transação, então
+/platform/revenue lê uma linha por dia em vez de varrer platform_revenue e bets.
+"""
+
+from datetime import datetime
+
+from sqlalchemy.dialects import postgresql, sqlite
+
+from src.models.betting import db, Bet, PlatformRevenue, PlatformStats
+
+_UPSERT_DIALECTS = {'postgresql': postgresql, 'sqlite': sqlite}
+
+def record_completed_bet(bet, completed_at=None):
+    """Somar uma aposta finalizada ao total do dia (upsert, uma ida ao banco)"""
+    record_completed_bets(1, bet.bet_amount * 2, bet.platform_fee, completed_at)
+
+def record_completed_bets(count, volume, fee, completed_at=None):
+    """Somar count apostas (volume e taxas já totalizados) ao dia; usado pelo lote de finalização"""
+    day = (completed_at or datetime.utcnow()).date()
+
+    dialect = _UPSERT_DIALECTS.get(db.engine.dialect.name)
+    if dialect is not None:
+        stmt = dialect.insert(PlatformStats).values(
+            date=day, total_bets=count, total_volume=volume, platform_revenue=fee
+        )
+        db.session.execute(stmt.on_conflict_do_update(
+            index_elements=[PlatformStats.date],
+            set_={
+                'total_bets': PlatformStats.total_bets + count,
+                'total_volume': PlatformStats.total_volume + volume,
+                'platform_revenue': PlatformStats.platform_revenue + fee
+            }
+        ))
+        return
+
+    # Outros bancos: UPDATE e, se o dia ainda não existe, INSERT
+    updated = db.session.execute(
+        db.update(PlatformStats)
+        .where(PlatformStats.date == day)
+        .values(total_bets=PlatformStats.total_bets + count,
+                total_volume=PlatformStats.total_volume + volume,
+                platform_revenue=PlatformStats.platform_revenue + fee)
+    )
+    if updated.rowcount == 0:
+        db.session.add(PlatformStats(date=day, total_bets=count, total_volume=volume, platform_revenue=fee))
+
+def summary(today=None):
+    """Totais gerais e do dia a partir da tabela diária"""
+    today = today or datetime.utcnow().date()
+    total_revenue, total_bets, total_volume = db.session.query(
+        db.func.coalesce(db.func.sum(PlatformStats.platform_revenue), 0),
+        db.func.coalesce(db.func.sum(PlatformStats.total_bets), 0),
+        db.func.coalesce(db.func.sum(PlatformStats.total_volume), 0)
+    ).one()
+    today_row = db.session.get(PlatformStats, today)
+
+    return {
+        'total_revenue': total_revenue,
+        'today_revenue': today_row.platform_revenue if today_row else 0,
+        'total_bets': total_bets,
+        'total_volume': total_volume
+    }
+
+def backfill():
+    """Recalcular platform_stats a partir de platform_revenue e bets; retorna os dias gravados"""
+    revenue_day = db.func.date(PlatformRevenue.date_collected)
+    revenue = dict(
+        db.session.query(revenue_day, db.func.sum(PlatformRevenue.amount)).group_by(revenue_day).all()
+    )
+
+    bet_day = db.func.date(Bet.completed_at)
+    bets = db.session.query(bet_day, db.func.count(Bet.id), db.func.sum(Bet.bet_amount * 2))\
+        .filter(Bet.status == 'completed')\
+        .group_by(bet_day).all()
+    counts = {day: (count, volume) for day, count, volume in bets}
+
+    db.session.query(PlatformStats).delete()
+    days = sorted({d for d in revenue if d is not None} | {d for d in counts if d is not None})
+    for day in days:
+        count, volume = counts.get(day, (0, 0))
+        # SQLite devolve date() como texto
+        parsed = datetime.strptime(day, '%Y-%m-%d').date() if isinstance(day, str) else day
+        db.session.add(PlatformStats(
+            date=parsed,
+            total_bets=count,
+            total_volume=volume or 0,
+            platform_revenue=revenue.get(day) or 0
+        ))
+    db.session.commit()
+    return len(days)
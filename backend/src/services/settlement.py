@@ -0,0 +1,200 @@
+"""
+Finalização de apostas em lote (noites de torneio)
+
+settle_batch() recebe N resultados e faz tudo numa transação com um número
+fixo de comandos, independente de N:
+
+- um SELECT ... IN para validar apostas e outro para os jogadores
+- um UPDATE ... WHERE id IN (...) AND status = 'active' RETURNING id que
+  reivindica as apostas (mesma garantia do complete_bet: paga uma única vez)
+- executemany para vencedor/dados da partida e para carteiras/estatísticas
+- INSERTs em lote de transações e receita e um upsert do total diário
+
+Ratings são aplicados em memória na ordem de id das apostas (todas têm o
+mesmo completed_at; é o desempate do recálculo em rating.py), então um
+jogador com várias partidas no mesmo lote tem o Elo encadeado como se fossem
+chamadas separadas. Erros de validação de uma aposta não derrubam as demais; apostas
+finalizadas e erros voltam na ordem em que vieram no lote.
+As tacadas de game_data.shots vão para match_replays num INSERT em lote.
+"""
+
+from collections import defaultdict
+from datetime import datetime
+from decimal import Decimal
+
+from sqlalchemy import bindparam, insert, update
+
+from src.cache import response_cache
+from src.events import event_bus
+from src.models.betting import db, User, Bet, Transaction, EscrowAccount, PlatformRevenue, MatchReplay
+from src.services import ledger, rating, replay, revenue
+
+MAX_BATCH_SIZE = 500
+
+def _validate(results):
+    """Separar resultados bem formados dos inválidos; devolve (válidos, [(posição, erro)])"""
+    valid, errors, seen = [], [], set()
+    for index, item in enumerate(results):
+        bet_id = item.get('bet_id') if isinstance(item, dict) else None
+        if not bet_id or not item.get('winner_id'):
+            errors.append((index, {'bet_id': bet_id, 'error': 'bet_id e winner_id são obrigatórios'}))
+        elif bet_id in seen:
+            errors.append((index, {'bet_id': bet_id, 'error': 'Aposta repetida no lote'}))
+        else:
+            try:
+                game_data, shots = replay.split_game_data(item.get('game_data', {}))
+            except ValueError as e:
+                errors.append((index, {'bet_id': bet_id, 'error': str(e)}))
+                continue
+            seen.add(bet_id)
+            valid.append({**item, 'game_data': game_data, 'shots': shots, 'index': index})
+    return valid, errors
+
+def _in_order(errors):
+    return [error for _, error in sorted(errors, key=lambda e: e[0])]
+
+def settle_batch(results):
+    """
+    Finalizar várias apostas: results = [{'bet_id', 'winner_id', 'game_data'}, ...]
+
+    Retorna {'settled': [ids], 'errors': [{'bet_id', 'error'}], 'platform_fee': Decimal},
+    as duas listas na ordem de results. Levanta ValueError se o lote passar de MAX_BATCH_SIZE.
+    """
+    if len(results) > MAX_BATCH_SIZE:
+        raise ValueError(f'Lote deve ter no máximo {MAX_BATCH_SIZE} apostas')
+
+    items, input_errors = _validate(results)
+
+    def work():
+        errors = list(input_errors)
+        now = datetime.utcnow()
+
+        bets = {b.id: b for b in Bet.query.filter(Bet.id.in_([i['bet_id'] for i in items]))}
+        candidates = []
+        for item in items:
+            bet = bets.get(item['bet_id'])
+            if bet is None:
+                errors.append((item['index'], {'bet_id': item['bet_id'], 'error': 'Aposta não encontrada'}))
+            elif bet.status != 'active':
+                errors.append((item['index'], {'bet_id': item['bet_id'], 'error': 'Aposta não está ativa'}))
+            elif item['winner_id'] not in (bet.player1_id, bet.player2_id):
+                errors.append((item['index'], {'bet_id': item['bet_id'], 'error': 'Vencedor inválido'}))
+            else:
+                candidates.append(item)
+
+        # Reivindicar de uma vez; quem foi finalizado por outra requisição fica de fora
+        claimed = set()
+        if candidates:
+            claimed = set(db.session.execute(
+                update(Bet)
+                .where(Bet.id.in_([i['bet_id'] for i in candidates]), Bet.status == 'active')
+                .values(status='completed', completed_at=now)
+                .returning(Bet.id)
+            ).scalars())
+        settled = []
+        for item in candidates:
+            if item['bet_id'] in claimed:
+                settled.append(item)
+            else:
+                errors.append((item['index'], {'bet_id': item['bet_id'], 'error': 'Aposta não está ativa'}))
+
+        if not settled:
+            return {'settled': [], 'errors': _in_order(errors), 'platform_fee': Decimal('0')}
+
+        settled_ids = [i['bet_id'] for i in settled]
+        db.session.execute(
+            update(Bet.__table__)
+            .where(Bet.__table__.c.id == bindparam('b_id'))
+            .values(winner_id=bindparam('b_winner'), game_data=bindparam('b_game_data')),
+            [{'b_id': i['bet_id'], 'b_winner': i['winner_id'],
+              'b_game_data': i['game_data']} for i in settled]
+        )
+        replays = [replay.replay_row(i['bet_id'], i['shots'], now) for i in settled if i['shots'] is not None]
+        if replays:
+            db.session.execute(insert(MatchReplay), replays)
+        db.session.execute(
+            update(EscrowAccount)
+            .where(EscrowAccount.bet_id.in_(settled_ids), EscrowAccount.status == 'holding')
+            .values(status='released', released_at=now)
+        )
+
+        # Ratings e estatísticas acumulados em memória, na ordem de id (a do replay)
+        player_ids = set()
+        for item in settled:
+            player_ids.update((bets[item['bet_id']].player1_id, bets[item['bet_id']].player2_id))
+        players = {u.id: [u.skill_rating, u.total_games]
+                   for u in db.session.query(User.id, User.skill_rating, User.total_games)
+                   .filter(User.id.in_(player_ids))}
+        changes = defaultdict(lambda: {'prize': Decimal('0'), 'won': 0, 'games': 0, 'rating': 0})
+        transactions, revenues = [], []
+        volume = fee = Decimal('0')
+
+        for item in sorted(settled, key=lambda i: i['bet_id']):
+            bet = bets[item['bet_id']]
+            winner_id = item['winner_id']
+            loser_id = bet.player1_id if winner_id == bet.player2_id else bet.player2_id
+            winner, loser = players[winner_id], players[loser_id]
+            winner_delta, loser_delta = rating.elo_deltas(winner[0], loser[0], winner[1], loser[1])
+            winner[0] += winner_delta
+            loser[0] += loser_delta
+            winner[1] += 1
+            loser[1] += 1
+
+            changes[winner_id]['prize'] += bet.total_prize
+            changes[winner_id]['won'] += 1
+            changes[winner_id]['games'] += 1
+            changes[winner_id]['rating'] += winner_delta
+            changes[loser_id]['games'] += 1
+            changes[loser_id]['rating'] += loser_delta
+
+            transactions.append({
+                'user_id': winner_id,
+                'type': 'bet_credit',
+                'amount': bet.total_prize,
+                'bet_id': bet.id,
+                'status': 'completed',
+                'description': f'Vitória na aposta - ID: {bet.id}',
+                'created_at': now,
+                'processed_at': now
+            })
+            revenues.append({'bet_id': bet.id, 'amount': bet.platform_fee, 'date_collected': now})
+            volume += bet.bet_amount * 2
+            fee += bet.platform_fee
+
+        # Incrementos relativos (concorrem com depósitos), na ordem fixa contra deadlock
+        users = User.__table__
+        db.session.execute(
+            update(users)
+            .where(users.c.id == bindparam('u_id'))
+            .values(
+                wallet_balance=users.c.wallet_balance + bindparam('u_prize'),
+                total_earnings=users.c.total_earnings + bindparam('u_prize'),
+                games_won=users.c.games_won + bindparam('u_won'),
+                total_games=users.c.total_games + bindparam('u_games'),
+                skill_rating=users.c.skill_rating + bindparam('u_rating'),
+                updated_at=now
+            ),
+            [{'u_id': user_id, 'u_prize': changes[user_id]['prize'], 'u_won': changes[user_id]['won'],
+              'u_games': changes[user_id]['games'], 'u_rating': changes[user_id]['rating']}
+             for user_id in ledger.lock_order(*changes)]
+        )
+        db.session.execute(insert(Transaction), transactions)
+        db.session.execute(insert(PlatformRevenue), revenues)
+        revenue.record_completed_bets(len(settled), volume, fee, now)
+
+        return {'settled': settled_ids, 'errors': _in_order(errors), 'platform_fee': fee}
+
+    return ledger.run_transaction(work)
+
+def announce(bet_ids):
+    """Depois do commit: invalidar caches e publicar bet.completed; devolve as apostas serializadas"""
+    if not bet_ids:
+        return []
+    order = {bet_id: position for position, bet_id in enumerate(bet_ids)}
+    bets = sorted(Bet.query.filter(Bet.id.in_(bet_ids)), key=lambda b: order[b.id])
+    bet_data = list(map(Bet.to_dict, bets))
+
+    response_cache.invalidate('revenue', 'ranking')
+    for data in bet_data:
+        event_bus.publish('bet.completed', data)
+    return bet_data
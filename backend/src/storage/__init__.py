@@ -0,0 +1,31 @@
+"""
+Armazenamento das rotas /api (usuários, jogos e ranking)
+
+- memory: dicionários no processo, para desenvolvimento com um único worker;
+  com STORE_DATA_DIR as mutações vão para um WAL e sobrevivem a restarts
+- sql: modelos SQLAlchemy de src.models.betting, compartilhado entre workers
+"""
+
+import atexit
+import os
+
+from src.storage.errors import DuplicateUser, GameAlreadyFinished
+from src.storage.memory import MemoryStore
+from src.storage.sql import SQLStore
+from src.storage.wal import WriteAheadLog
+
+def create_store(backend):
+    """Instanciar o armazenamento configurado"""
+    if backend == 'memory':
+        journal = None
+        if os.environ.get('STORE_DATA_DIR'):
+            journal = WriteAheadLog(
+                os.environ['STORE_DATA_DIR'],
+                sync=os.environ.get('WAL_SYNC', 'group'),
+                snapshot_every=int(os.environ.get('WAL_SNAPSHOT_EVERY', 10000))
+            )
+            atexit.register(journal.close)
+        return MemoryStore(journal, ranking_history=int(os.environ.get('RANKING_HISTORY_LIMIT', 10000)))
+    if backend == 'sql':
+        return SQLStore()
+    raise ValueError(f'STORE_BACKEND inválido: {backend}')
@@ -0,0 +1,5 @@
+class DuplicateUser(Exception):
+    """Email ou nome de usuário já cadastrado"""
+
+class GameAlreadyFinished(Exception):
+    """Partida já foi finalizada"""
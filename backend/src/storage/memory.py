@@ -0,0 +1,364 @@
+import threading
+from array import array
+from collections import deque
+from bisect import bisect_left
+from datetime import datetime, timezone
+
+from sortedcontainers import SortedList
+
+from src.storage.errors import DuplicateUser, GameAlreadyFinished
+
+class UserRepository:
+    """Usuários em memória com índices por email, id e nome de usuário"""
+
+    def __init__(self):
+        self._by_email = {}
+        self._by_id = {}
+        self._by_username = {}
+
+    def __len__(self):
+        return len(self._by_email)
+
+    def __iter__(self):
+        return iter(self._by_id.values())
+
+    def add(self, user):
+        """Registrar usuário em todos os índices"""
+        self._by_email[user['email']] = user
+        self._by_id[user['id']] = user
+        self._by_username[user['nome_usuario']] = user
+
+    def get_by_email(self, email):
+        return self._by_email.get(email)
+
+    def get_by_id(self, user_id):
+        return self._by_id.get(user_id)
+
+    def get_by_username(self, nome_usuario):
+        return self._by_username.get(nome_usuario)
+
+class RankingIndex:
+    """
+    Índice do ranking ordenado por total_score, atualizado a cada partida
+
+    SortedList (listas ordenadas em blocos): reposicionar, achar a posição e
+    abrir uma página custam O(log n), sem o memmove de O(n) de uma lista única.
+    """
+
+    def __init__(self):
+        # Chaves ordenadas (-total_score, user_id): maior pontuação primeiro e,
+        # no empate, quem se cadastrou antes
+        self._keys = SortedList()
+        self._scores = {}
+        self._users = {}
+
+    def __len__(self):
+        return len(self._keys)
+
+    def update(self, user):
+        """Inserir ou reposicionar o jogador após mudança de pontuação"""
+        user_id = user['id']
+        old_score = self._scores.get(user_id)
+        if old_score is not None:
+            self._keys.remove((-old_score, user_id))
+        self._keys.add((-user['total_score'], user_id))
+        self._scores[user_id] = user['total_score']
+        self._users[user_id] = user
+
+    def page(self, offset, limit):
+        """Jogadores da fatia [offset, offset + limit) do ranking"""
+        keys = self._keys.islice(offset, offset + limit)
+        return [self._users[user_id] for _, user_id in keys]
+
+    def position(self, user_id):
+        """Posição (1-based) do jogador, ou None se ainda não jogou"""
+        score = self._scores.get(user_id)
+        if score is None:
+            return None
+        return self._keys.index((-score, user_id)) + 1
+
+# Agregados mantidos a cada partida (perfil em O(1)); também completa usuários de logs antigos
+NEW_USER_AGGREGATES = {'best_score': 0, 'current_win_streak': 0, 'best_win_streak': 0}
+
+def _timestamp(value):
+    """datetime ou ISO -> segundos desde a época (sem fuso = UTC; com fuso, convertido)"""
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc).timestamp()
+
+class PlayerHistory:
+    """
+    Partidas finalizadas de um jogador, em arrays na ordem de término
+
+    ~24 bytes por partida: horário, id e soma acumulada das pontuações (a média
+    das últimas N sai de duas leituras; o período, de duas buscas binárias).
+    """
+
+    __slots__ = ('finished', 'game_ids', 'score_sums')
+
+    def __init__(self):
+        self.finished = array('d')
+        self.game_ids = array('q')
+        self.score_sums = array('q', [0])
+
+    def __len__(self):
+        return len(self.game_ids)
+
+    def append(self, game_id, score, finished_at):
+        # Converter tudo antes: se algo falhar, nenhum array fica com uma partida a menos
+        finished = array('d', [_timestamp(finished_at)])
+        game_ids = array('q', [game_id])
+        score_sums = array('q', [self.score_sums[-1] + score])
+        self.finished.extend(finished)
+        self.game_ids.extend(game_ids)
+        self.score_sums.extend(score_sums)
+
+    def rolling_average(self, window):
+        """Média das últimas window partidas (None sem partidas)"""
+        count = len(self)
+        window = min(window, count)
+        if not window:
+            return None
+        return (self.score_sums[count] - self.score_sums[count - window]) / window
+
+    def select(self, limit, start=None, end=None):
+        """Ids das partidas em [start, end), da mais recente para a mais antiga"""
+        low = bisect_left(self.finished, _timestamp(start)) if start else 0
+        high = bisect_left(self.finished, _timestamp(end)) if end else len(self)
+        return [self.game_ids[i] for i in range(high - 1, max(low, high - limit) - 1, -1)]
+
+class MemoryStore:
+    """
+    Armazenamento em memória do processo (um único worker)
+
+    Com journal (WriteAheadLog) cada mutação é registrada antes de retornar e
+    o estado é reconstruído na subida; sem journal nada sobrevive a um restart.
+    O histórico por partida (rankings) guarda só as ranking_history mais recentes;
+    o histórico por jogador (history) guarda todas as partidas finalizadas.
+    """
+
+    def __init__(self, journal=None, ranking_history=10000):
+        self.users = UserRepository()
+        self.games = {}
+        self.rankings = deque(maxlen=ranking_history)
+        self.ranking = RankingIndex()
+        self.history = {}
+        self._lock = threading.Lock()
+        self.journal = journal
+        if journal is not None:
+            self._restore(*journal.recover())
+            journal.start()
+
+    # Persistência
+
+    def _restore(self, snapshot, records):
+        if snapshot:
+            for user in snapshot['users']:
+                user = {**NEW_USER_AGGREGATES, **user}
+                self.users.add(user)
+                if user['games_played']:
+                    self.ranking.update(user)
+            self.games = {game['id']: game for game in snapshot['games']}
+            finished = sorted((g for g in self.games.values() if g['status'] == 'finished'),
+                              key=lambda g: g['finished_at'])
+            for game in finished:
+                self._history(game['player_id']).append(game['id'], game['score'], game['finished_at'])
+            self.rankings.extend(snapshot['rankings'])
+        for record in records:
+            self._apply(record)
+
+    def _state(self):
+        # Cópias rasas: o JSON é gerado depois, fora do lock, e usuários/jogos
+        # continuam sendo alterados; as entradas de rankings não mudam mais
+        return {
+            'users': [dict(user) for user in self.users],
+            'games': [dict(game) for game in self.games.values()],
+            'rankings': list(self.rankings)
+        }
+
+    def _commit(self, record):
+        """
+        Registrar e aplicar a mutação (com o lock); retorna o ticket do journal
+
+        O registro entra no journal antes de mudar a memória: se o append falhar
+        (WAL indisponível, valor que não vira JSON) nada foi alterado. Quem chama
+        confere as pré-condições antes, então _apply não falha depois do append.
+        """
+        if self.journal is None:
+            return self._apply(record), None
+        ticket = self.journal.append(record)
+        result = self._apply(record)
+        if self.journal.needs_snapshot():
+            self.journal.snapshot(self._state())
+        return result, ticket
+
+    def _durable(self, ticket):
+        # Fora do lock: várias requisições esperam pelo mesmo fsync
+        if ticket is not None:
+            self.journal.wait(ticket)
+
+    def _apply(self, record):
+        op = record['op']
+        if op == 'user':
+            user = {**NEW_USER_AGGREGATES, **record['user']}
+            self.users.add(user)
+            return user
+        if op == 'password':
+            self.users.get_by_id(record['user_id'])['senha'] = record['senha']
+            return None
+        if op == 'game':
+            game = dict(record['game'])
+            self.games[game['id']] = game
+            return game
+        if op == 'finish':
+            return self._apply_finish(record)
+        raise ValueError(f'Registro desconhecido no journal: {op}')
+
+    def _history(self, user_id):
+        history = self.history.get(user_id)
+        if history is None:
+            history = self.history[user_id] = PlayerHistory()
+        return history
+
+    def _apply_finish(self, record):
+        game_id = record['game_id']
+        game = self.games[game_id]
+        # Única etapa que pode falhar (conversões); vem antes de qualquer outra mudança
+        self._history(game['player_id']).append(game_id, record['score'], record['finished_at'])
+
+        game['status'] = 'finished'
+        game['score'] = record['score']
+        game['balls_potted'] = record['balls_potted']
+        game['won'] = record['won']
+        game['finished_at'] = record['finished_at']
+
+        # Atualizar estatísticas do usuário
+        user = self.users.get_by_id(game['player_id'])
+        if user:
+            user['games_played'] += 1
+            user['total_score'] += record['score']
+            user['best_score'] = max(user['best_score'], record['score'])
+            if record['won']:
+                user['games_won'] += 1
+                user['current_win_streak'] += 1
+                user['best_win_streak'] = max(user['best_win_streak'], user['current_win_streak'])
+            else:
+                user['current_win_streak'] = 0
+            self.ranking.update(user)
+
+        # Adicionar ao histórico de ranking (limitado; as mais antigas saem primeiro)
+        self.rankings.append({
+            'user_id': game['player_id'],
+            'game_id': game_id,
+            'score': record['score'],
+            'balls_potted': record['balls_potted'],
+            'won': record['won'],
+            'date': record['finished_at']
+        })
+        return game
+
+    # Usuários
+
+    def create_user(self, nome_completo, nome_usuario, email, password_hash):
+        with self._lock:
+            if self.users.get_by_email(email) or self.users.get_by_username(nome_usuario):
+                raise DuplicateUser(email)
+
+            user, ticket = self._commit({'op': 'user', 'user': {
+                'id': len(self.users) + 1,
+                'nome_completo': nome_completo,
+                'nome_usuario': nome_usuario,
+                'email': email,
+                'senha': password_hash,
+                'created_at': datetime.utcnow().isoformat(),
+                'games_played': 0,
+                'games_won': 0,
+                'total_score': 0,
+                **NEW_USER_AGGREGATES
+            }})
+        self._durable(ticket)
+        return user
+
+    def get_user_by_email(self, email):
+        return self.users.get_by_email(email)
+
+    def get_user_by_id(self, user_id):
+        return self.users.get_by_id(user_id)
+
+    def get_user_by_username(self, nome_usuario):
+        return self.users.get_by_username(nome_usuario)
+
+    def update_password(self, user_id, password_hash):
+        with self._lock:
+            if self.users.get_by_id(user_id) is None:
+                return
+            _, ticket = self._commit({'op': 'password', 'user_id': user_id, 'senha': password_hash})
+        self._durable(ticket)
+
+    # Jogos
+
+    def create_game(self, player_id, game_type):
+        with self._lock:
+            game, ticket = self._commit({'op': 'game', 'game': {
+                'id': len(self.games) + 1,
+                'type': game_type,
+                'player_id': player_id,
+                'status': 'waiting',
+                'created_at': datetime.utcnow().isoformat(),
+                'score': 0,
+                'balls_potted': 0
+            }})
+        self._durable(ticket)
+        return game
+
+    def get_game(self, game_id):
+        return self.games.get(game_id)
+
+    def finish_game(self, game_id, score, balls_potted, won):
+        with self._lock:
+            if self.games[game_id]['status'] == 'finished':
+                raise GameAlreadyFinished(game_id)
+
+            game, ticket = self._commit({
+                'op': 'finish',
+                'game_id': game_id,
+                'score': score,
+                'balls_potted': balls_potted,
+                'won': won,
+                'finished_at': datetime.utcnow().isoformat()
+            })
+        self._durable(ticket)
+        return game
+
+    def game_history(self, user_id, limit, start=None, end=None):
+        history = self.history.get(user_id)
+        if history is None:
+            return []
+        return [self.games[game_id] for game_id in history.select(limit, start, end)]
+
+    def rolling_average(self, user_id, window):
+        history = self.history.get(user_id)
+        return history.rolling_average(window) if history else None
+
+    # Ranking
+
+    def ranking_page(self, offset, limit):
+        return self.ranking.page(offset, limit)
+
+    def ranking_count(self):
+        return len(self.ranking)
+
+    def ranking_position(self, user_id):
+        return self.ranking.position(user_id)
+
+    def stats(self):
+        stats = {
+            'users_count': len(self.users),
+            'games_count': len(self.games),
+            'rankings_count': len(self.rankings)
+        }
+        if self.journal is not None:
+            stats['journal'] = self.journal.stats()
+        return stats
@@ -0,0 +1,176 @@
+from datetime import datetime
+
+from sqlalchemy import and_, case, func, or_, update
+from sqlalchemy.exc import IntegrityError
+
+from src.models.betting import db, User, Game
+from src.storage.errors import DuplicateUser, GameAlreadyFinished
+
+def _user_dict(user):
+    """Converter User para o formato usado pelas rotas /api"""
+    return {
+        'id': user.id,
+        'nome_completo': user.full_name,
+        'nome_usuario': user.username,
+        'email': user.email,
+        'senha': user.password_hash,
+        'created_at': user.created_at.isoformat(),
+        'games_played': user.pool_games_played,
+        'games_won': user.pool_games_won,
+        'total_score': user.total_score,
+        'best_score': user.best_score,
+        'current_win_streak': user.current_win_streak,
+        'best_win_streak': user.best_win_streak
+    }
+
+class SQLStore:
+    """
+    Armazenamento nos modelos SQLAlchemy (PostgreSQL em produção, SQLite local)
+
+    As atualizações de estatísticas são UPDATEs relativos no banco, então vários
+    workers e réplicas podem atender as mesmas rotas ao mesmo tempo.
+    """
+
+    # Usuários
+
+    def create_user(self, nome_completo, nome_usuario, email, password_hash):
+        user = User(
+            full_name=nome_completo,
+            username=nome_usuario,
+            email=email,
+            password_hash=password_hash
+        )
+        db.session.add(user)
+        try:
+            db.session.commit()
+        except IntegrityError:
+            # Cadastro concorrente com o mesmo email/nome de usuário
+            db.session.rollback()
+            raise DuplicateUser(email)
+        return _user_dict(user)
+
+    def get_user_by_email(self, email):
+        user = User.query.filter_by(email=email).first()
+        return _user_dict(user) if user else None
+
+    def get_user_by_id(self, user_id):
+        user = db.session.get(User, user_id)
+        return _user_dict(user) if user else None
+
+    def get_user_by_username(self, nome_usuario):
+        user = User.query.filter_by(username=nome_usuario).first()
+        return _user_dict(user) if user else None
+
+    def update_password(self, user_id, password_hash):
+        db.session.execute(
+            update(User).where(User.id == user_id).values(password_hash=password_hash)
+        )
+        db.session.commit()
+
+    # Jogos
+
+    def create_game(self, player_id, game_type):
+        game = Game(player_id=player_id, type=game_type)
+        db.session.add(game)
+        db.session.commit()
+        return game.to_dict()
+
+    def get_game(self, game_id):
+        game = db.session.get(Game, game_id)
+        return game.to_dict() if game else None
+
+    def finish_game(self, game_id, score, balls_potted, won):
+        now = datetime.utcnow()
+        try:
+            # Só finaliza uma vez, mesmo com requisições simultâneas
+            result = db.session.execute(
+                update(Game)
+                .where(Game.id == game_id, Game.status != 'finished')
+                .values(status='finished', score=score, balls_potted=balls_potted,
+                        won=bool(won), finished_at=now)
+            )
+            if result.rowcount != 1:
+                raise GameAlreadyFinished(game_id)
+
+            game = db.session.get(Game, game_id)
+            # O lado direito do SET vê os valores antigos da linha
+            if won:
+                streaks = {
+                    'current_win_streak': User.current_win_streak + 1,
+                    'best_win_streak': case((User.best_win_streak > User.current_win_streak, User.best_win_streak),
+                                            else_=User.current_win_streak + 1)
+                }
+            else:
+                streaks = {'current_win_streak': 0}
+            db.session.execute(
+                update(User)
+                .where(User.id == game.player_id)
+                .values(pool_games_played=User.pool_games_played + 1,
+                        pool_games_won=User.pool_games_won + (1 if won else 0),
+                        total_score=User.total_score + score,
+                        best_score=case((User.best_score > score, User.best_score), else_=score),
+                        updated_at=now,
+                        **streaks)
+            )
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+        db.session.refresh(game)
+        return game.to_dict()
+
+    def _finished_games(self, user_id):
+        return Game.query.filter(Game.player_id == user_id, Game.finished_at.isnot(None))
+
+    def game_history(self, user_id, limit, start=None, end=None):
+        query = self._finished_games(user_id)
+        if start:
+            query = query.filter(Game.finished_at >= start)
+        if end:
+            query = query.filter(Game.finished_at < end)
+        games = query.order_by(Game.finished_at.desc(), Game.id.desc()).limit(limit)
+        return [game.to_dict() for game in games]
+
+    def rolling_average(self, user_id, window):
+        recent = self._finished_games(user_id)\
+            .with_entities(Game.score)\
+            .order_by(Game.finished_at.desc(), Game.id.desc())\
+            .limit(window).subquery()
+        average = db.session.query(func.avg(recent.c.score)).scalar()
+        return float(average) if average is not None else None
+
+    # Ranking
+
+    def _ranked(self):
+        return User.query.filter(User.pool_games_played > 0)
+
+    def ranking_page(self, offset, limit):
+        users = self._ranked()\
+            .order_by(User.total_score.desc(), User.created_at, User.id)\
+            .offset(offset).limit(limit).all()
+        return [_user_dict(user) for user in users]
+
+    def ranking_count(self):
+        return self._ranked().count()
+
+    def ranking_position(self, user_id):
+        user = db.session.get(User, user_id)
+        if not user or not user.pool_games_played:
+            return None
+
+        ahead = self._ranked().filter(or_(
+            User.total_score > user.total_score,
+            and_(User.total_score == user.total_score, or_(
+                User.created_at < user.created_at,
+                and_(User.created_at == user.created_at, User.id < user.id)
+            ))
+        )).count()
+        return ahead + 1
+
+    def stats(self):
+        return {
+            'users_count': User.query.count(),
+            'games_count': Game.query.count(),
+            'rankings_count': Game.query.filter_by(status='finished').count()
+        }
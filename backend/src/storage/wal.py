@@ -0,0 +1,275 @@
+"""
+Log de escrita antecipada (WAL) e snapshots do MemoryStore
+
+Cada mutação vira uma linha NDJSON compacta, acrescentada em segmentos
+wal-<n>.log dentro de STORE_DATA_DIR. Uma thread grava e faz fsync em grupo:
+enquanto um fsync está em andamento as novas linhas se acumulam e entram
+todas no próximo, então N escritas concorrentes custam bem menos que N fsyncs.
+
+- WAL_SYNC=group: a mutação só retorna depois do fsync que a cobre (padrão)
+- WAL_SYNC=async: retorna na hora; o que não passou pelo fsync (poucos ms)
+  pode se perder numa queda do processo
+
+A cada WAL_SNAPSHOT_EVERY registros o estado completo vai para snapshot.json
+(copiado com o lock do store, serializado pela thread de gravação) e um novo
+segmento começa; os segmentos anteriores são apagados depois que o
+snapshot está no disco. Na subida: snapshot + segmentos a partir do que ele
+indica, lidos com mmap. Uma linha final cortada (queda no meio da escrita) é
+descartada e truncada.
+"""
+
+import fcntl
+import json
+import logging
+import mmap
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_FILE = 'snapshot.json'
+LOCK_FILE = 'store.lock'
+LOCK_TIMEOUT_SECONDS = 10
+
+def _segment_name(number):
+    return f'wal-{number:06d}.log'
+
+def _fsync_dir(directory):
+    fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+def _read_records(path):
+    """Registros válidos do segmento e o offset do fim da última linha completa"""
+    records = []
+    with open(path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if size == 0:
+            return records, 0
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            start = 0
+            while start < size:
+                end = data.find(b'\n', start)
+                if end == -1:
+                    break
+                try:
+                    records.append(json.loads(data[start:end]))
+                except ValueError:
+                    break
+                start = end + 1
+    return records, start
+
+class _Rotate:
+    """Marcador na fila de escrita: fechar o segmento e gravar o snapshot"""
+
+    __slots__ = ('segment', 'state')
+
+    def __init__(self, segment, state):
+        self.segment = segment
+        self.state = state
+
+class WriteAheadLog:
+    def __init__(self, directory, sync='group', snapshot_every=10000):
+        if sync not in ('group', 'async'):
+            raise ValueError(f'WAL_SYNC inválido: {sync}')
+        self.directory = directory
+        self.sync = sync
+        self.snapshot_every = snapshot_every
+
+        self._cond = threading.Condition()
+        self._pending = []
+        self._appended = 0
+        self._synced = 0
+        self._since_snapshot = 0
+        self._closed = False
+        self._error = None
+        self._file = None
+        self._segment = 1
+        self._thread = None
+        self._lock_file = None
+        self._counters = {'records': 0, 'fsyncs': 0, 'snapshots': 0}
+
+    # Subida
+
+    def recover(self):
+        """
+        Travar o diretório e ler o estado salvo: (snapshot ou None, registros)
+
+        Deve ser chamado uma vez, antes de start(). Só um processo pode usar
+        o diretório; um segundo worker falha aqui em vez de corromper o log.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        self._lock_file = open(os.path.join(self.directory, LOCK_FILE), 'a')
+        # Espera curta: num reload o worker antigo ainda está gravando o que falta
+        deadline = time.monotonic() + LOCK_TIMEOUT_SECONDS
+        while True:
+            try:
+                fcntl.flock(self._lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                break
+            except OSError:
+                if time.monotonic() >= deadline:
+                    raise RuntimeError(f'STORE_DATA_DIR {self.directory} já está em uso por outro processo')
+                time.sleep(0.1)
+
+        snapshot = None
+        snapshot_path = os.path.join(self.directory, SNAPSHOT_FILE)
+        if os.path.exists(snapshot_path):
+            with open(snapshot_path, 'rb') as f:
+                snapshot = json.load(f)
+        first = snapshot['segment'] if snapshot else 1
+
+        segments = sorted(
+            int(name[4:-4]) for name in os.listdir(self.directory)
+            if name.startswith('wal-') and name.endswith('.log')
+        )
+        records = []
+        for number in segments:
+            if number < first:
+                continue
+            path = os.path.join(self.directory, _segment_name(number))
+            segment_records, valid_size = _read_records(path)
+            records.extend(segment_records)
+            if valid_size < os.path.getsize(path):
+                logger.warning('WAL %s: descartando registro incompleto no fim do arquivo', path)
+                os.truncate(path, valid_size)
+
+        self._segment = max(segments[-1] if segments else 1, first)
+        self._since_snapshot = len(records)
+        return snapshot, records
+
+    def start(self):
+        """Abrir o segmento atual para escrita e iniciar a thread de fsync"""
+        self._file = open(os.path.join(self.directory, _segment_name(self._segment)), 'ab')
+        _fsync_dir(self.directory)
+        self._thread = threading.Thread(target=self._run, name='store-wal', daemon=True)
+        self._thread.start()
+        return self
+
+    # Escrita
+
+    def append(self, record):
+        """Enfileirar um registro; retorna o número a passar para wait()"""
+        line = json.dumps(record, separators=(',', ':'), ensure_ascii=False).encode() + b'\n'
+        with self._cond:
+            if self._error is not None:
+                raise RuntimeError('WAL indisponível') from self._error
+            self._pending.append(line)
+            self._appended += 1
+            self._since_snapshot += 1
+            self._cond.notify_all()
+            return self._appended
+
+    def wait(self, ticket):
+        """Bloquear até o registro estar no disco (só em WAL_SYNC=group)"""
+        if self.sync != 'group':
+            return
+        with self._cond:
+            while self._synced < ticket and self._error is None:
+                self._cond.wait()
+            if self._synced < ticket:
+                raise RuntimeError('WAL indisponível') from self._error
+
+    def needs_snapshot(self):
+        return self._since_snapshot >= self.snapshot_every
+
+    def snapshot(self, state):
+        """
+        Agendar snapshot do estado atual e começar um novo segmento
+
+        Chamado com o lock do store, logo depois do último append incluído
+        no estado: tudo que vier depois cai no segmento novo. state deve ser
+        uma cópia que o store não altera mais; o JSON é gerado pela thread de
+        gravação, sem segurar o lock do store.
+        """
+        segment = self._segment + 1
+        state['segment'] = segment
+        with self._cond:
+            self._segment = segment
+            self._pending.append(_Rotate(segment, state))
+            self._since_snapshot = 0
+            self._cond.notify_all()
+
+    def close(self):
+        """Gravar o que estiver pendente e parar a thread"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+        if self._lock_file is not None:
+            self._lock_file.close()
+
+    def stats(self):
+        with self._cond:
+            return {
+                **self._counters,
+                'segment': self._segment,
+                'pending': self._appended - self._synced,
+                'sync': self.sync
+            }
+
+    # Thread de gravação
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending and not self._closed:
+                    self._cond.wait()
+                batch, self._pending = self._pending, []
+                target = self._appended
+                if not batch and self._closed:
+                    self._file.close()
+                    return
+            try:
+                self._write(batch)
+            except Exception as e:
+                logger.exception('Falha ao gravar o WAL do store')
+                with self._cond:
+                    self._error = e
+                    self._cond.notify_all()
+                return
+            with self._cond:
+                self._synced = target
+                self._counters['records'] += sum(1 for item in batch if not isinstance(item, _Rotate))
+                self._cond.notify_all()
+
+    def _write(self, batch):
+        lines = []
+        for item in batch:
+            if isinstance(item, _Rotate):
+                self._flush(lines)
+                lines = []
+                self._rotate(item)
+            else:
+                lines.append(item)
+        self._flush(lines)
+
+    def _flush(self, lines):
+        if not lines:
+            return
+        self._file.write(b''.join(lines))
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._counters['fsyncs'] += 1
+
+    def _rotate(self, rotate):
+        self._file.close()
+        self._file = open(os.path.join(self.directory, _segment_name(rotate.segment)), 'ab')
+
+        data = json.dumps(rotate.state, separators=(',', ':'), ensure_ascii=False).encode()
+        path = os.path.join(self.directory, SNAPSHOT_FILE)
+        with open(path + '.tmp', 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(path + '.tmp', path)
+        _fsync_dir(self.directory)
+
+        # Só depois do snapshot no disco os segmentos antigos deixam de ser necessários
+        for name in os.listdir(self.directory):
+            if name.startswith('wal-') and name.endswith('.log') and int(name[4:-4]) < rotate.segment:
+                os.remove(os.path.join(self.directory, name))
+        self._counters['snapshots'] += 1
@@ -0,0 +1,15 @@
+"""Utilitários compartilhados entre rotas, serviços e stores"""
+
+from datetime import datetime, timezone
+
+def parse_date(value):
+    """
+    Aceita AAAA-MM-DD ou data/hora ISO; com fuso, converte para UTC sem fuso,
+    o mesmo formato das colunas e dos stores
+    """
+    if not value:
+        return None
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
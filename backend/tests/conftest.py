@@ -0,0 +1,80 @@
+"""
+Fixtures dos testes: app contra um SQLite temporário, com detector de N+1 em
+modo raise, KDF de senha barata e backends locais de cache/eventos
+
+Uso: python -m pytest (a partir de backend/)
+"""
+
+import os
+import sys
+import tempfile
+import uuid
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Antes de importar a aplicação: src.main lê o ambiente na importação
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'tests.db')
+os.environ['QUERY_GUARD'] = 'raise'
+os.environ['CACHE_BACKEND'] = 'memory'
+os.environ['EVENTS_BACKEND'] = 'memory'
+os.environ['SERVICE_API_TOKEN'] = 'token-de-servico-dos-testes'
+os.environ['PASSWORD_HASH_ALGORITHM'] = 'pbkdf2_sha256'
+os.environ['PBKDF2_ITERATIONS'] = '1000'
+os.environ.pop('REDIS_URL', None)
+
+from flask import Blueprint, jsonify
+
+from src.auth import generate_token
+from src.main import app as flask_app
+from src.models.betting import db, User, Bet
+
+# Rota que serializa os jogadores sem eager loading: um SELECT por aposta (N+1 proposital)
+lazy_bp = Blueprint('lazy', __name__)
+
+@lazy_bp.route('/lazy-bets', methods=['GET'])
+def lazy_bets():
+    bets = Bet.query.order_by(Bet.created_at.desc()).limit(20).all()
+    return jsonify([{'id': bet.id, 'player1': bet.player1.username} for bet in bets])
+
+flask_app.register_blueprint(lazy_bp, url_prefix='/test')
+
+@pytest.fixture(scope='session')
+def app():
+    flask_app.testing = True
+    return flask_app
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+@pytest.fixture
+def make_user(app):
+    """Criar um usuário direto no banco; devolve o id"""
+    def make(balance='0'):
+        with app.app_context():
+            user = User(username=f'teste-{uuid.uuid4().hex[:12]}', email=f'{uuid.uuid4().hex}@exemplo.com',
+                        password_hash='-', wallet_balance=Decimal(balance))
+            db.session.add(user)
+            db.session.commit()
+            return user.id
+    return make
+
+@pytest.fixture
+def make_bet(app):
+    """Criar uma aposta direto no banco (sem mexer em carteiras); devolve o id"""
+    def make(player1_id, player2_id=None, amount='10', status='pending', age=timedelta(0)):
+        with app.app_context():
+            bet = Bet(player1_id=player1_id, player2_id=player2_id, bet_amount=Decimal(amount),
+                      status=status, created_at=datetime.utcnow() - age)
+            bet.calculate_fees()
+            db.session.add(bet)
+            db.session.commit()
+            return bet.id
+    return make
+
+def auth_headers(user_id):
+    return {'Authorization': f'Bearer {generate_token(user_id)}'}
@@ -0,0 +1,19 @@
+"""Datas com e sem fuso: parse_date das rotas e o histórico do store em memória"""
+
+from datetime import datetime, timedelta, timezone
+
+from src.storage.memory import _timestamp
+from src.utils import parse_date
+
+def test_parse_date_keeps_naive_values():
+    assert parse_date('2024-03-01') == datetime(2024, 3, 1)
+    assert parse_date(None) is None
+
+def test_parse_date_converts_offsets_to_utc():
+    assert parse_date('2024-03-01T10:00:00-03:00') == datetime(2024, 3, 1, 13)
+
+def test_timestamp_respects_offsets():
+    naive = datetime(2024, 3, 1, 13)
+    aware = datetime(2024, 3, 1, 10, tzinfo=timezone(timedelta(hours=-3)))
+
+    assert _timestamp(naive) == _timestamp(aware) == _timestamp('2024-03-01T10:00:00-03:00')
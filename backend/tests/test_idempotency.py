@@ -0,0 +1,66 @@
+"""Idempotency-Key: escopo por usuário e retomada de chaves presas em processamento"""
+
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from sqlalchemy import update
+
+from src import idempotency
+from src.models.betting import db, User, IdempotencyKey
+
+from conftest import auth_headers
+
+def _deposit(client, user_id, key, amount='10'):
+    headers = {**auth_headers(user_id), idempotency.HEADER: key}
+    return client.post(f'/api/users/{user_id}/deposit', json={'amount': amount}, headers=headers)
+
+def _balance(app, user_id):
+    with app.app_context():
+        return db.session.get(User, user_id).wallet_balance
+
+def _set_claim(app, key, **values):
+    with app.app_context():
+        db.session.execute(update(IdempotencyKey).where(IdempotencyKey.key == key).values(**values))
+        db.session.commit()
+
+def test_retry_replays_without_charging_twice(app, client, make_user):
+    user_id = make_user()
+
+    first = _deposit(client, user_id, 'deposito-replay')
+    second = _deposit(client, user_id, 'deposito-replay')
+
+    assert first.status_code == second.status_code == 200
+    assert second.headers['Idempotent-Replayed'] == 'true'
+    assert _balance(app, user_id) == Decimal('10')
+
+def test_same_key_from_different_users_does_not_collide(app, client, make_user):
+    alice, bob = make_user(), make_user()
+
+    assert _deposit(client, alice, 'chave-comum').status_code == 200
+    response = _deposit(client, bob, 'chave-comum')
+
+    assert response.status_code == 200
+    assert 'Idempotent-Replayed' not in response.headers
+    assert _balance(app, alice) == _balance(app, bob) == Decimal('10')
+
+def test_processing_key_within_lease_is_409(app, client, make_user):
+    user_id = make_user()
+    _deposit(client, user_id, 'deposito-em-andamento')
+    _set_claim(app, 'deposito-em-andamento', status='processing', claimed_at=datetime.utcnow())
+
+    response = _deposit(client, user_id, 'deposito-em-andamento')
+
+    assert response.status_code == 409
+
+def test_stale_processing_key_is_taken_over(app, client, make_user):
+    # Requisição que morreu depois de reivindicar a chave (sem resposta gravada)
+    user_id = make_user()
+    _deposit(client, user_id, 'deposito-abandonado')
+    _set_claim(app, 'deposito-abandonado', status='processing', response_status=None, response_body=None,
+               claimed_at=datetime.utcnow() - idempotency.LEASE - timedelta(seconds=1))
+
+    response = _deposit(client, user_id, 'deposito-abandonado')
+
+    assert response.status_code == 200
+    assert 'Idempotent-Replayed' not in response.headers
+    assert _deposit(client, user_id, 'deposito-abandonado').headers['Idempotent-Replayed'] == 'true'
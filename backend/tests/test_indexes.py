@@ -0,0 +1,22 @@
+"""Planos das consultas quentes: as rotas não podem cair em varredura completa"""
+
+import pytest
+
+from benchmarks.explain_indexes import explain, hot_queries
+from src.models.betting import db
+
+QUERIES = ['bets_available', 'bets_available_for_user', 'user_transactions', 'user_transactions_cursor']
+
+@pytest.mark.parametrize('name', QUERIES)
+def test_route_query_uses_index(app, name):
+    with app.app_context():
+        try:
+            plan, ok = explain(hot_queries()[name])
+        finally:
+            db.session.rollback()
+
+    assert ok, plan
+
+def test_every_hot_query_is_covered(app):
+    with app.app_context():
+        assert sorted(hot_queries()) == sorted(QUERIES)
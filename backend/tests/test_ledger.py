@@ -0,0 +1,62 @@
+"""Débitos simultâneos na mesma carteira: saldo nunca negativo e ledger fechando"""
+
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+
+from src.models.betting import db, User, Transaction
+from src.services import ledger
+
+from conftest import auth_headers
+
+THREADS = 16
+ATTEMPTS = 80
+BALANCE = Decimal('100.00')
+AMOUNT = Decimal('7.00')
+
+def _debit_transactions(user_id):
+    return Transaction.query.filter_by(user_id=user_id, type='bet_debit').all()
+
+def _assert_ledger_balances(app, user_id, accepted):
+    with app.app_context():
+        balance = db.session.get(User, user_id).wallet_balance
+        debits = _debit_transactions(user_id)
+
+    assert balance >= 0
+    assert accepted == int(BALANCE // AMOUNT)
+    assert balance == BALANCE - accepted * AMOUNT
+    assert len(debits) == accepted
+    assert BALANCE + sum(t.amount for t in debits) == balance
+
+def test_concurrent_ledger_debits(app, make_user):
+    user_id = make_user(BALANCE)
+
+    def debit(_):
+        def work():
+            ledger.debit(user_id, AMOUNT)
+            db.session.add(Transaction(user_id=user_id, type='bet_debit', amount=-AMOUNT, status='completed'))
+
+        with app.app_context():
+            try:
+                ledger.run_transaction(work)
+                return 'ok'
+            except ledger.InsufficientFunds:
+                return 'insufficient'
+
+    with ThreadPoolExecutor(max_workers=THREADS) as executor:
+        results = list(executor.map(debit, range(ATTEMPTS)))
+
+    assert results.count('ok') + results.count('insufficient') == ATTEMPTS
+    _assert_ledger_balances(app, user_id, results.count('ok'))
+
+def test_concurrent_bet_creation(app, make_user):
+    user_id = make_user(BALANCE)
+    headers = auth_headers(user_id)
+
+    def create_bet(_):
+        return app.test_client().post('/api/bets', json={'bet_amount': str(AMOUNT)}, headers=headers).status_code
+
+    with ThreadPoolExecutor(max_workers=THREADS) as executor:
+        statuses = list(executor.map(create_bet, range(ATTEMPTS)))
+
+    assert statuses.count(201) + statuses.count(400) == ATTEMPTS
+    _assert_ledger_balances(app, user_id, statuses.count(201))
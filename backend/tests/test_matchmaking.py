@@ -0,0 +1,50 @@
+"""POST /bets/match: candidatas do banco ou da fila, sem limite fixo de tentativas"""
+
+from datetime import timedelta
+
+from src.services.matchmaking import match_queue
+
+from conftest import auth_headers
+
+def _match(client, user_id, **body):
+    return client.post('/api/bets/match', json=body, headers=auth_headers(user_id))
+
+def test_match_picks_closest_amount_then_oldest(client, make_user, make_bet):
+    player_id = make_user('100')
+    make_bet(make_user(), amount='80')
+    make_bet(player_id, amount='20')  # a própria aposta nunca é candidata
+    newer = make_bet(make_user(), amount='25')
+    older = make_bet(make_user(), amount='25', age=timedelta(minutes=5))
+
+    response = _match(client, player_id, bet_amount='20', min_amount='20', max_amount='100')
+
+    assert response.status_code == 200
+    assert response.json['bet']['id'] == older
+    assert _match(client, player_id, bet_amount='20', min_amount='20', max_amount='100').json['bet']['id'] == newer
+
+def test_match_skips_bets_taken_elsewhere_past_first_batch(app, client, make_user, make_bet, monkeypatch):
+    # Fila com mais de um lote de entradas velhas (aceitas fora deste processo)
+    monkeypatch.setenv('MATCHMAKING_SOURCE', 'queue')
+    monkeypatch.setattr(match_queue, 'refresh_interval', 3600)
+    with app.app_context():
+        match_queue.refresh_if_stale()
+    for _ in range(15):
+        owner = make_user()
+        match_queue.add(make_bet(owner, make_user(), amount='901', status='active'), '901', owner, 1000)
+    owner = make_user()
+    pending = make_bet(owner, amount='950')
+    match_queue.add(pending, '950', owner, 1000)
+    player_id = make_user('1000')
+
+    response = _match(client, player_id, bet_amount='901', min_amount='900', max_amount='1000')
+
+    assert response.status_code == 200
+    assert response.json['bet']['id'] == pending
+    assert pending not in match_queue.candidates(player_id, 900, 1000, limit=100)
+
+def test_match_without_candidates_is_404(client, make_user):
+    player_id = make_user('100')
+
+    response = _match(client, player_id, min_amount='5000', max_amount='6000')
+
+    assert response.status_code == 404
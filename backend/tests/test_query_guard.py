@@ -0,0 +1,40 @@
+"""Detector de N+1 (QUERY_GUARD=raise) nas rotas de listagem de apostas"""
+
+import pytest
+
+from src.query_guard import NPlusOneDetected, query_guard
+
+BETS = query_guard.threshold + 3
+
+def test_guard_is_raising(app):
+    with app.test_request_context():
+        assert query_guard.active_mode() == 'raise'
+
+def test_user_bets_loads_players_in_one_query(client, make_user, make_bet):
+    user_id = make_user()
+    for _ in range(BETS):
+        make_bet(user_id, make_user(), status='active')
+        make_bet(make_user(), user_id, status='active')
+
+    response = client.get(f'/api/users/{user_id}/bets?limit=100')
+
+    assert response.status_code == 200
+    bets = response.json['bets']
+    assert len(bets) == BETS * 2
+    assert all(bet['opponent'] and bet['player1'] and bet['player2'] for bet in bets)
+
+def test_available_bets_without_lazy_loads(client, make_user, make_bet):
+    for _ in range(BETS):
+        make_bet(make_user())
+
+    response = client.get('/api/bets/available')
+
+    assert response.status_code == 200
+    assert len(response.json['available_bets']) >= BETS
+
+def test_lazy_loading_route_is_detected(client, make_user, make_bet):
+    for _ in range(BETS):
+        make_bet(make_user())
+
+    with pytest.raises(NPlusOneDetected):
+        client.get('/test/lazy-bets')
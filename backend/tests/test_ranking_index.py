@@ -0,0 +1,28 @@
+"""RankingIndex do store em memória: ordem, reposicionamento e páginas"""
+
+from src.storage.memory import RankingIndex
+
+def _user(user_id, total_score):
+    return {'id': user_id, 'total_score': total_score}
+
+def test_orders_by_score_then_user_id():
+    ranking = RankingIndex()
+    for user in (_user(3, 50), _user(1, 80), _user(2, 50)):
+        ranking.update(user)
+
+    assert [u['id'] for u in ranking.page(0, 10)] == [1, 2, 3]
+    assert ranking.position(2) == 2
+    assert ranking.position(99) is None
+
+def test_update_repositions_without_duplicates():
+    ranking = RankingIndex()
+    for user_id in range(100):
+        ranking.update(_user(user_id, user_id))
+    ranking.update(_user(0, 1000))
+    ranking.update(_user(99, 0))
+
+    assert len(ranking) == 100
+    assert ranking.position(0) == 1
+    assert ranking.position(99) == 100
+    assert [u['id'] for u in ranking.page(1, 3)] == [98, 97, 96]
+    assert ranking.page(100, 10) == []